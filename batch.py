@@ -0,0 +1,605 @@
+# -*- coding: <UTF-8> -*-
+"""Your Anxiety During COVID-19: batch
+
+Module Description
+==================
+This file scores many people at once. A table of identities, in the same format as the input of the
+User class, is encoded into the index of every identity in the options of its identity group, and
+the anxiety scores and the percentages of all the people are then calculated as array operations.
+The results are exactly the same as scoring every person with the User class and the functions of
+the user module.
+
+Files of any size can be scored in chunks of a fixed number of records, reading the records and
+writing the results as they go, so the memory used does not grow with the file. RUNNING THIS FILE
+SCORES THE JSON LINES OR CSV FILE GIVEN AS THE FIRST ARGUMENT, OR THE STANDARD INPUT, AND WRITES THE
+RESULTS TO THE STANDARD OUTPUT. Run it with --help for the options.
+
+Copyright and Usage Information
+===============================
+This project is licensed under the GNU General Public License v3.0.
+    Permissions of this strong copyleft license are conditioned on making available complete source
+    code of licensed works and modifications, which include larger works using a licensed work,
+    under the same license. Copyright and license notices must be preserved. Contributors provide an
+    express grant of patent rights.
+
+Authors (by alphabetical order):
+  - Faruk, Fardin   https://github.com/Fard-Faru
+  - Hsieh, Sharon   https://github.com/SharonHsieh22
+  - Li, Sinan       https://github.com/LanceLi1416/
+  - Zhan, Jeffery   https://github.com/jeffzhan
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, Iterable, Iterator, List, TextIO, Tuple, Union
+
+import numpy as np
+
+import constants
+from cube import IdentityCube, get_cube_file_name, load_identity_cube
+from data import get_model_file_name, load_binary_data, load_json_data
+from distribution import PopulationDistribution, ScoreDistribution, get_distribution_file_name, \
+    load_score_distribution
+from user import ScoreModel
+
+# The index of every identity in the options of its identity group, for every identity group
+_OPTION_INDICES = [{option: i for i, option in enumerate(options)}
+                   for options in constants.IDENTITY_GROUP_OPTIONS_LIST]
+# The identity groups whose identities are given as numbers, and converted into ranges
+_AGE_INDEX = 0
+_ISOLATION_INDICES = (9, 10)
+# The number of records scored together when scoring a file
+DEFAULT_CHUNK_SIZE = 4096
+
+
+def encode_identity_table(table: List[List[Union[int, str]]]) -> np.ndarray:
+    """Return the index of every identity of every person in the table in the options of its
+    identity group, as an array with a row for every person.
+
+    Every row of the table is in the same format as the input of the User class: the age and the
+    numbers of adults and children in isolation are numbers, and the other identities are options
+    of their identity groups.
+
+    Raise ValueError if an identity is not an option of its identity group.
+
+    Preconditions:
+      - all(len(row) == constants.NUMBER_OF_IDENTITIES for row in table)
+      - all(18 <= row[0] <= 110 and 0 <= row[9] <= 110 and 0 <= row[10] <= 110 for row in table)
+
+    >>> encode_identity_table([[18, 'Female', 'None', 'Student', 'Canada', 'No', 'Single', 'No', \
+                                'Isolated', 3, 30]])[0].tolist()
+    [0, 1, 0, 1, 31, 1, 0, 1, 2, 3, 12]
+    """
+    codes = np.empty((len(table), constants.NUMBER_OF_IDENTITIES), dtype=np.int64)
+    for i in range(constants.NUMBER_OF_IDENTITIES):
+        column = [row[i] for row in table]
+        if i == _AGE_INDEX:
+            ages = np.array(column, dtype=np.int64)
+            codes[:, i] = np.where(ages < 65, (ages - 15) // 10, len(constants.DEM_AGE) - 1)
+        elif i in _ISOLATION_INDICES:
+            people = np.array(column, dtype=np.int64)
+            codes[:, i] = np.where(people <= 10, people, (people - 11) // 10 + 11)
+        else:
+            codes[:, i] = [_encode_option(i, identity) for identity in column]
+    return codes
+
+
+def get_identity_averages(codes: np.ndarray, data: List[Dict[str, float]]) -> np.ndarray:
+    """Return the average score in the data of every identity of every person, given the encoded
+    identities of the people.
+
+    Preconditions:
+      - codes.shape == (len(codes), constants.NUMBER_OF_IDENTITIES)
+      - all(set(data[i]) == set(constants.IDENTITY_GROUP_OPTIONS_LIST[i]) for i in range(len(data)))
+    """
+    averages = np.empty(codes.shape)
+    for i in range(constants.NUMBER_OF_IDENTITIES):
+        group_averages = np.array([data[i][option]
+                                   for option in constants.IDENTITY_GROUP_OPTIONS_LIST[i]])
+        averages[:, i] = group_averages[codes[:, i]]
+    return averages
+
+
+def estimate_anxiety_scores(codes: np.ndarray, model: ScoreModel,
+                            cube: Union[IdentityCube, None] = None) -> np.ndarray:
+    """Return the anxiety score of every person, given the encoded identities of the people, the
+    same as User.estimate_anxiety_score calculates for every person on their own with the data of
+    the model.
+
+    Preconditions:
+      - codes.shape == (len(codes), constants.NUMBER_OF_IDENTITIES)
+
+    >>> model = ScoreModel([{option: float(i) for option in options} \
+                            for i, options in enumerate(constants.IDENTITY_GROUP_OPTIONS_LIST)])
+    >>> estimate_anxiety_scores(np.zeros((2, constants.NUMBER_OF_IDENTITIES), dtype=int), \
+                                model).tolist()
+    [5.0, 5.0]
+    """
+    averages = get_identity_averages(codes, model.data)
+    if cube is not None:
+        return cube.estimate_anxiety_scores(codes, averages)
+
+    # ACCUMULATOR anxiety: the anxiety score of every person
+    anxiety = 0
+    for i in range(constants.NUMBER_OF_IDENTITIES):
+        anxiety = anxiety + averages[:, i]
+
+    return anxiety / 11
+
+
+def get_percentages(scores: np.ndarray, model: ScoreModel) -> np.ndarray:
+    """Return the position of every anxiety score between the extrema of the model, as a
+    percentage, the same as ScoreModel.percentage calculates for every score on its own.
+
+    >>> model = ScoreModel([{'18-24': -5.0, '25-34': 5.0}])
+    >>> get_percentages(np.array([0.0, 2.5]), model).tolist()
+    [50.0, 75.0]
+    """
+    return (scores - model.extrema[0]) / (model.extrema[1] - model.extrema[0]) * 100
+
+
+def get_group_percentages(codes: np.ndarray, scores: np.ndarray, id_group: str,
+                          model: ScoreModel) -> np.ndarray:
+    """Return the ranking of every person in the population with the selected identity group, the
+    same as user.get_user_percentage calculates for every person on their own.
+
+    Preconditions:
+      - id_group in constants.IDENTITY_NAMES
+      - codes.shape == (len(scores), constants.NUMBER_OF_IDENTITIES)
+    """
+    id_index = constants.IDENTITY_NAMES.index(id_group)
+    id_averages = get_identity_averages(codes, model.data)[:, id_index]
+
+    lowest_score = (model.minimum_total - model.minimums[id_index] + id_averages) / 11
+    highest_score = (model.maximum_total - model.maximums[id_index] + id_averages) / 11
+
+    delta_score = highest_score - lowest_score
+    delta_user = scores - lowest_score
+
+    return delta_user / delta_score * 100
+
+
+def get_percentiles(codes: np.ndarray, scores: np.ndarray, id_group: Union[str, None],
+                    distribution: Union[ScoreDistribution, PopulationDistribution]) -> np.ndarray:
+    """Return the percentage of the real respondents whose anxiety score is at most the anxiety
+    score of every person, the same as user.get_user_percentile calculates for every person on
+    their own.
+
+    Preconditions:
+      - id_group is None or id_group in constants.IDENTITY_NAMES
+      - codes.shape == (len(scores), constants.NUMBER_OF_IDENTITIES)
+    """
+    if id_group is None:
+        return distribution.percentiles(scores)
+    else:
+        return distribution.identity_percentiles(
+            scores, id_group, codes[:, constants.IDENTITY_NAMES.index(id_group)])
+
+
+def score_identity_table(table: List[List[Union[int, str]]], model: ScoreModel,
+                         cube: Union[IdentityCube, None] = None) -> \
+        Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return the anxiety score of every person in the table, their position between the extrema
+    of the model as a percentage, and their ranking in the population with every identity group,
+    with a column for every identity group in the order of constants.IDENTITY_NAMES.
+
+    See encode_identity_table for the format of the table.
+
+    >>> data = [{option: 0.0 for option in options} \
+                for options in constants.IDENTITY_GROUP_OPTIONS_LIST]
+    >>> for i in range(constants.NUMBER_OF_IDENTITIES):
+    ...     data[i][constants.IDENTITY_GROUP_OPTIONS_LIST[i][1]] = 11.0
+    >>> scores, percentages, group_percentages = score_identity_table( \
+            [[18, 'Male', 'None', 'Student', 'Canada', 'No', 'Single', 'No', 'Isolated', 0, 0], \
+             [30, 'Male', 'None', 'Student', 'Canada', 'No', 'Single', 'No', 'Isolated', 0, 0]], \
+            ScoreModel(data))
+    >>> scores.tolist(), percentages.tolist(), group_percentages[:, 0].tolist()
+    ([3.0, 4.0], [27.27272727272727, 36.36363636363637], [30.0, 30.0])
+    """
+    codes = encode_identity_table(table)
+    scores = estimate_anxiety_scores(codes, model, cube)
+    percentages = get_percentages(scores, model)
+    group_percentages = np.column_stack([get_group_percentages(codes, scores, id_group, model)
+                                         for id_group in constants.IDENTITY_NAMES])
+    return scores, percentages, group_percentages
+
+
+def score_codes(codes: np.ndarray, model: ScoreModel, cube: Union[IdentityCube, None] = None,
+                distribution: Union[ScoreDistribution, None] = None) -> List[Dict[str, Any]]:
+    """Return the results of every person given their encoded identities: the anxiety score, its
+    position between the extrema of the model as a percentage, the ranking of the person in the
+    population with every identity group, and the real percentiles of the score if a distribution
+    is given.
+
+    Preconditions:
+      - codes.shape == (len(codes), constants.NUMBER_OF_IDENTITIES)
+
+    >>> data = [{option: 0.0 for option in options} \
+                for options in constants.IDENTITY_GROUP_OPTIONS_LIST]
+    >>> for i in range(constants.NUMBER_OF_IDENTITIES):
+    ...     data[i][constants.IDENTITY_GROUP_OPTIONS_LIST[i][1]] = 11.0
+    >>> codes = encode_identity_table([[30, 'Female', 'None', 'Student', 'Canada', 'No', \
+                                        'Single', 'No', 'Isolated', 0, 0]])
+    >>> results = score_codes(codes, ScoreModel(data))
+    >>> results[0]['anxiety_score'], round(results[0]['percentage'], 2)
+    (5.0, 45.45)
+    """
+    scores = estimate_anxiety_scores(codes, model, cube)
+    percentages = get_percentages(scores, model)
+    group_percentages = [get_group_percentages(codes, scores, id_group, model)
+                         for id_group in constants.IDENTITY_NAMES]
+    if distribution is not None:
+        percentiles = get_percentiles(codes, scores, None, distribution)
+        group_percentiles = [get_percentiles(codes, scores, id_group, distribution)
+                             for id_group in constants.IDENTITY_NAMES]
+
+    results = []
+    for k in range(len(codes)):
+        result = {
+            'anxiety_score': float(scores[k]),
+            'percentage': float(percentages[k]),
+            'group_percentages': {constants.IDENTITY_NAMES[i]: float(group_percentages[i][k])
+                                  for i in range(constants.NUMBER_OF_IDENTITIES)}
+        }
+        if distribution is not None:
+            result['percentile'] = float(percentiles[k])
+            result['group_percentiles'] = {
+                constants.IDENTITY_NAMES[i]: float(group_percentiles[i][k])
+                for i in range(constants.NUMBER_OF_IDENTITIES)}
+        results.append(result)
+    return results
+
+
+class SensitivitySweep:
+    """The anxiety score and percentages of a person if one of their identities were different,
+    for every other option of every identity group, with the person's own results.
+
+    Instance Attributes:
+      - id_indices: the index of the identity group changed in every variant
+      - codes: the index of the option the identity is changed into in every variant
+      - scores: the anxiety score of every variant
+      - percentages: the percentage of every variant in the population
+      - group_percentages: the percentage of every variant in the population with the compared
+                           identity group
+      - base: the anxiety score, percentage and group percentage of the person as they are
+
+    Representation Invariants:
+      - len(self.id_indices) == len(self.codes) == len(self.scores) == len(self.percentages)
+      - len(self.scores) == len(self.group_percentages)
+    """
+    id_indices: np.ndarray
+    codes: np.ndarray
+    scores: np.ndarray
+    percentages: np.ndarray
+    group_percentages: np.ndarray
+    base: Tuple[float, float, float]
+
+    def __init__(self, id_indices: np.ndarray, codes: np.ndarray, scores: np.ndarray,
+                 percentages: np.ndarray, group_percentages: np.ndarray,
+                 base: Tuple[float, float, float]) -> None:
+        """Initialize the sweep with the results of every variant"""
+        self.id_indices = id_indices
+        self.codes = codes
+        self.scores = scores
+        self.percentages = percentages
+        self.group_percentages = group_percentages
+        self.base = base
+
+    def levers(self, count: int) -> List[Tuple[str, str, float, float]]:
+        """Return the count variants changing the anxiety score the most, from the largest change:
+        the name of the identity group, the identity it is changed into, and the change of the
+        anxiety score and of the percentage.
+
+        Preconditions:
+          - count >= 0
+        """
+        changes = self.scores - self.base[0]
+        order = np.argsort(-np.abs(changes), kind='stable')[:count]
+        return [(constants.IDENTITY_NAMES[self.id_indices[k]],
+                 constants.IDENTITY_GROUP_OPTIONS_LIST[self.id_indices[k]][self.codes[k]],
+                 float(changes[k]), float(self.percentages[k] - self.base[1])) for k in order]
+
+
+def sweep_identities(codes: List[int], id_group: str, model: ScoreModel,
+                     cube: Union[IdentityCube, None] = None,
+                     distribution: Union[ScoreDistribution, PopulationDistribution, None] = None) \
+        -> SensitivitySweep:
+    """Return the results of the person with the encoded identities if one of their identities were
+    changed into every other option of its identity group, all scored together in one batch. The
+    percentages are the real percentiles if a distribution is given, and the group percentages are
+    in the population with the compared identity group.
+
+    Preconditions:
+      - len(codes) == constants.NUMBER_OF_IDENTITIES
+      - id_group in constants.IDENTITY_NAMES
+
+    >>> data = [{option: 0.0 for option in options} \
+                for options in constants.IDENTITY_GROUP_OPTIONS_LIST]
+    >>> for i in range(constants.NUMBER_OF_IDENTITIES):
+    ...     data[i][constants.IDENTITY_GROUP_OPTIONS_LIST[i][1]] = 11.0
+    >>> sweep = sweep_identities([0] * constants.NUMBER_OF_IDENTITIES, 'Age', ScoreModel(data))
+    >>> len(sweep.scores), sweep.base
+    (261, (0.0, 0.0, 0.0))
+    >>> sweep.levers(2)
+    [('Age', '25-34', 1.0, 9.090909090909092), ('Gender', 'Female', 1.0, 9.090909090909092)]
+    """
+    id_indices = np.concatenate(
+        [[-1]] + [np.full(len(constants.IDENTITY_GROUP_OPTIONS_LIST[i]) - 1, i)
+                  for i in range(constants.NUMBER_OF_IDENTITIES)]).astype(np.int64)
+    variant_codes = np.tile(np.array(codes, dtype=np.int64), (len(id_indices), 1))
+    for i in range(constants.NUMBER_OF_IDENTITIES):
+        options = np.arange(len(constants.IDENTITY_GROUP_OPTIONS_LIST[i]))
+        variant_codes[id_indices == i, i] = options[options != codes[i]]
+
+    scores = estimate_anxiety_scores(variant_codes, model, cube)
+    if distribution is not None:
+        percentages = get_percentiles(variant_codes, scores, None, distribution)
+        group_percentages = get_percentiles(variant_codes, scores, id_group, distribution)
+    else:
+        percentages = get_percentages(scores, model)
+        group_percentages = get_group_percentages(variant_codes, scores, id_group, model)
+
+    variants = id_indices >= 0
+    return SensitivitySweep(id_indices[variants], variant_codes[variants, id_indices[variants]],
+                            scores[variants], percentages[variants], group_percentages[variants],
+                            (float(scores[0]), float(percentages[0]), float(group_percentages[0])))
+
+
+def validate_identity(identity: Any) -> None:
+    """Raise ValueError if the identity is not a list of identities in the same format as the input
+    of the User class.
+
+    >>> validate_identity([18, 'Female', 'None', 'Student', 'Canada', 'No', 'Single', 'No', \
+                           'Isolated', 3, 30])
+    >>> validate_identity([17, 'Female', 'None', 'Student', 'Canada', 'No', 'Single', 'No', \
+                           'Isolated', 3, 30])
+    Traceback (most recent call last):
+    ValueError: Age must be a whole number from 18 to 110
+    """
+    if not isinstance(identity, list) or len(identity) != constants.NUMBER_OF_IDENTITIES:
+        raise ValueError(f'Expected {constants.NUMBER_OF_IDENTITIES} identities')
+    for i, lowest in [(_AGE_INDEX, 18), (_ISOLATION_INDICES[0], 0), (_ISOLATION_INDICES[1], 0)]:
+        if not isinstance(identity[i], int) or isinstance(identity[i], bool) or \
+                not lowest <= identity[i] <= 110:
+            raise ValueError(f'{constants.IDENTITY_NAMES[i]} must be a whole number from '
+                             f'{lowest} to 110')
+    for i in range(1, 9):
+        if not isinstance(identity[i], str):
+            raise ValueError(f'{constants.IDENTITY_NAMES[i]} must be a string')
+        _encode_option(i, identity[i])
+
+
+def load_scoring_data(json_file: str = constants.REAL_DATA_JSON_FILE) -> \
+        Tuple[ScoreModel, Union[IdentityCube, None], Union[ScoreDistribution, None]]:
+    """Return the model of the data processed into the json file, the identity cube, or None if it
+    has not been processed, and the distribution of the scores, or None if it has not been
+    processed.
+
+    Preconditions:
+      - os.path.isfile(json_file) or os.path.isfile(get_model_file_name(json_file))
+    """
+    if os.path.isfile(get_model_file_name(json_file)):
+        anxiety_data = load_binary_data(get_model_file_name(json_file))
+    else:
+        anxiety_data = load_json_data(json_file)
+    cube_file_name = get_cube_file_name(json_file)
+    cube = load_identity_cube(cube_file_name) if os.path.isfile(cube_file_name) else None
+    distribution_file_name = get_distribution_file_name(json_file)
+    if os.path.isfile(distribution_file_name):
+        distribution = load_score_distribution(distribution_file_name)
+    else:
+        distribution = None
+    return ScoreModel(anxiety_data), cube, distribution
+
+
+def read_jsonl_records(file: TextIO) -> Iterator[Any]:
+    """Yield the identities of every line of the JSON lines file, given either as a list in the
+    same format as the input of the User class, or as an object with the list as "identity". The
+    lines that are not valid JSON are yielded as they are, and the empty lines are skipped.
+
+    >>> import io
+    >>> list(read_jsonl_records(io.StringIO('[18, "Male"]\\n\\n{"identity": [30]}\\n{')))
+    [[18, 'Male'], [30], '{']
+    """
+    for line in file:
+        if line.strip() == '':
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            yield line.rstrip('\n')
+            continue
+        if isinstance(record, dict):
+            yield record.get('identity')
+        else:
+            yield record
+
+
+def read_csv_records(file: TextIO) -> Iterator[Any]:
+    """Yield the identities of every row of the csv file, with a column for every identity group
+    in the order of constants.IDENTITY_NAMES. The age and the numbers of adults and children in
+    isolation are converted into numbers when they are whole numbers. The first row is skipped if it
+    is a header, whose first column is not a number.
+
+    >>> import io
+    >>> list(read_csv_records(io.StringIO('Age,Gender\\n18,Male\\nNA,Female\\n')))
+    [[18, 'Male'], ['NA', 'Female']]
+    """
+    reader = csv.reader(file)
+    for row in reader:
+        if reader.line_num == 1 and len(row) > 0 and not row[0].strip().isdigit():
+            continue
+        yield [int(row[i]) if i in (_AGE_INDEX,) + _ISOLATION_INDICES and row[i].strip().isdigit()
+               else row[i] for i in range(len(row))]
+
+
+def score_records(records: Iterable[Any], model: ScoreModel,
+                  cube: Union[IdentityCube, None] = None,
+                  distribution: Union[ScoreDistribution, None] = None,
+                  chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    """Yield the results of every record, in order, scoring chunk_size records together at a time
+    and reading the next chunk only when the results of the last one have all been taken. The
+    result of an invalid record is {'error': message}, see validate_identity.
+
+    Preconditions:
+      - chunk_size > 0
+
+    >>> data = [{option: 0.0 for option in options} \
+                for options in constants.IDENTITY_GROUP_OPTIONS_LIST]
+    >>> for i in range(constants.NUMBER_OF_IDENTITIES):
+    ...     data[i][constants.IDENTITY_GROUP_OPTIONS_LIST[i][1]] = 11.0
+    >>> identity = [30, 'Male', 'None', 'Student', 'Canada', 'No', 'Single', 'No', 'Isolated', 0, 0]
+    >>> results = score_records([identity, [18], identity], ScoreModel(data), chunk_size=2)
+    >>> [result.get('anxiety_score', result.get('error')) for result in results]
+    [4.0, 'Expected 11 identities', 4.0]
+    """
+    iterator = iter(records)
+    chunk = list(itertools.islice(iterator, chunk_size))
+    while len(chunk) > 0:
+        # ACCUMULATOR errors: the error of every invalid record of the chunk, by position
+        errors = {}
+        # ACCUMULATOR valid: the valid records of the chunk
+        valid = []
+        for position in range(len(chunk)):
+            try:
+                validate_identity(chunk[position])
+                valid.append(chunk[position])
+            except ValueError as error:
+                errors[position] = {'error': str(error)}
+
+        results = iter(score_codes(encode_identity_table(valid), model, cube, distribution)
+                       if len(valid) > 0 else [])
+        for position in range(len(chunk)):
+            yield errors[position] if position in errors else next(results)
+        chunk = list(itertools.islice(iterator, chunk_size))
+
+
+def write_jsonl_results(results: Iterable[Dict[str, Any]], file: TextIO) -> int:
+    """Write every result as a line of JSON to the file, and return the number of results"""
+    # ACCUMULATOR count: the number of results written so far
+    count = 0
+    for result in results:
+        file.write(json.dumps(result) + '\n')
+        count = count + 1
+    return count
+
+
+def write_csv_results(results: Iterable[Dict[str, Any]], file: TextIO) -> int:
+    """Write every result as a row of the csv file, after a header, and return the number of
+    results. The percentages and percentiles of every identity group have a column each, and the
+    error of an invalid record is in the last column.
+    """
+    columns = ['anxiety_score', 'percentage'] + \
+        [f'percentage: {id_group}' for id_group in constants.IDENTITY_NAMES] + ['percentile'] + \
+        [f'percentile: {id_group}' for id_group in constants.IDENTITY_NAMES] + ['error']
+    writer = csv.writer(file)
+    writer.writerow(columns)
+    # ACCUMULATOR count: the number of results written so far
+    count = 0
+    for result in results:
+        row = {'anxiety_score': result.get('anxiety_score', ''),
+               'percentage': result.get('percentage', ''),
+               'percentile': result.get('percentile', ''), 'error': result.get('error', '')}
+        for id_group, value in result.get('group_percentages', {}).items():
+            row[f'percentage: {id_group}'] = value
+        for id_group, value in result.get('group_percentiles', {}).items():
+            row[f'percentile: {id_group}'] = value
+        writer.writerow([row.get(column, '') for column in columns])
+        count = count + 1
+    return count
+
+
+def score_file(input_file: TextIO, output_file: TextIO, file_format: str, model: ScoreModel,
+               cube: Union[IdentityCube, None] = None,
+               distribution: Union[ScoreDistribution, None] = None,
+               chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """Score every record of the input file, in the given format, writing the results to the output
+    file in the same format as they are scored, and return the number of records.
+
+    Preconditions:
+      - file_format in ('jsonl', 'csv')
+      - chunk_size > 0
+    """
+    if file_format == 'csv':
+        results = score_records(read_csv_records(input_file), model, cube, distribution,
+                                chunk_size)
+        return write_csv_results(results, output_file)
+    else:
+        results = score_records(read_jsonl_records(input_file), model, cube, distribution,
+                                chunk_size)
+        return write_jsonl_results(results, output_file)
+
+
+def _encode_option(id_index: int, identity: str) -> int:
+    """Return the index of the identity in the options of the identity group
+
+    >>> _encode_option(1, 'Female')
+    1
+    """
+    if identity not in _OPTION_INDICES[id_index]:
+        raise ValueError(f'{identity!r} is not an option of {constants.IDENTITY_NAMES[id_index]}')
+    return _OPTION_INDICES[id_index][identity]
+
+
+def main() -> None:
+    """Score the identities in the file given on the command line, or in the standard input,
+    and write the results to the standard output.
+
+    Run this file with --self-test alone to check it with python_ta and run its doctests instead.
+    """
+    parser = argparse.ArgumentParser(
+        description='Score the identities in a JSON lines or csv file.')
+    parser.add_argument('input', nargs='?', default='-',
+                        help='the file to score, or - for the standard input (default)')
+    parser.add_argument('--format', choices=['jsonl', 'csv'],
+                        help='the format of the input and the results (default: from the extension '
+                             'of the input, or jsonl)')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help='the number of records scored together')
+    parser.add_argument('--data', default=constants.REAL_DATA_JSON_FILE,
+                        help='the processed data to score with')
+    arguments = parser.parse_args()
+
+    input_format = arguments.format or ('csv' if arguments.input.lower().endswith('.csv')
+                                        else 'jsonl')
+    scoring_data = load_scoring_data(arguments.data)
+    start = time.perf_counter()
+    if arguments.input == '-':
+        record_count = score_file(sys.stdin, sys.stdout, input_format, *scoring_data,
+                                  chunk_size=arguments.chunk_size)
+    else:
+        with open(arguments.input, encoding='utf-8', newline='') as input_stream:
+            record_count = score_file(input_stream, sys.stdout, input_format, *scoring_data,
+                                      chunk_size=arguments.chunk_size)
+    sys.stdout.flush()
+    elapsed = time.perf_counter() - start
+    sys.stderr.write(f'Scored {record_count} records in {elapsed:.2f}s '
+                     f'({record_count / max(elapsed, 1e-9):.0f} records/s)\n')
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] == ['--self-test']:
+        import python_ta
+
+        python_ta.check_all(config={
+            'extra-imports': ['python_ta.contracts', 'argparse', 'csv', 'itertools', 'json', 'os',
+                              'sys', 'time', 'numpy', 'constants', 'cube', 'data', 'distribution',
+                              'user'],
+            'allowed-io': ['main'],
+            'max-line-length': 100,
+            'disable': ['R1705', 'C0200']
+        })
+
+        import python_ta.contracts
+
+        python_ta.contracts.check_all_contracts()
+
+        import doctest
+
+        doctest.testmod()
+    else:
+        main()
@@ -0,0 +1,167 @@
+# -*- coding: <UTF-8> -*-
+"""Your Anxiety During COVID-19: benchmark
+
+Module Description
+==================
+This file measures how fast the dataset is read and scored. It compares the way the dataset used to
+be read, keeping every column of every row and scoring every row on its own, with data.read_csv_file
+scoring the rows in blocks, which is where the time is saved.
+
+data.read_csv_file only keeps the identity columns and the answer columns used for calculations,
+but the csv module still splits every field of every row before they are dropped, so keeping fewer
+columns is not faster on its own. It is also timed scoring every row on its own, which takes about
+as long as the old way.
+
+RUNNING THIS FILE PRINTS THE RESULTS FOR THE DATASET GIVEN AS THE FIRST ARGUMENT, OR FOR THE FULL
+DATASET. Run it with --self-test alone to check it with python_ta and run its doctests instead.
+
+Copyright and Usage Information
+===============================
+This project is licensed under the GNU General Public License v3.0.
+    Permissions of this strong copyleft license are conditioned on making available complete source
+    code of licensed works and modifications, which include larger works using a licensed work,
+    under the same license. Copyright and license notices must be preserved. Contributors provide an
+    express grant of patent rights.
+
+Authors (by alphabetical order):
+  - Faruk, Fardin   https://github.com/Fard-Faru
+  - Hsieh, Sharon   https://github.com/SharonHsieh22
+  - Li, Sinan       https://github.com/LanceLi1416/
+  - Zhan, Jeffery   https://github.com/jeffzhan
+"""
+import csv
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+import constants
+import data
+
+# The positions of the identity columns and of the answer columns used for calculations in the rows
+# of the dataset, which the rows used to be read by
+_IDENTITY_POSITIONS = [4, 5, 6, 8, 9, 10, 12, 14, 15, 16, 17]
+_ANSWER_SLICES = [slice(21, 54), slice(70, 109), slice(110, 136), slice(137, 144)]
+
+
+def read_every_column(file_name: str, file_encoding: str = 'ISO-8859-1') -> \
+        List[Dict[str, Tuple[int, float]]]:
+    """Return the population and the total stress score of every value of every identity column
+    of the csv file, read the way data.read_csv_file used to read it: every column of every row is
+    kept, every row is scored on its own, and the scores are added up in dictionaries.
+
+    Preconditions:
+      - os.path.isfile(file_name)
+      - the columns of the csv file are in the order of the full dataset
+    """
+    # ACCUMULATOR data_so_far: the population and the total stress score of every value of every
+    # identity column so far
+    data_so_far = [{} for _ in _IDENTITY_POSITIONS]
+    with open(file_name, encoding=file_encoding, newline='') as file:
+        reader = csv.reader(file)
+        next(reader)
+        for row in reader:
+            stress_score = score_row([answer for part in _ANSWER_SLICES for answer in row[part]])
+            for id_index in range(len(_IDENTITY_POSITIONS)):
+                value = row[_IDENTITY_POSITIONS[id_index]]
+                population, total = data_so_far[id_index].get(value, (0, 0.0))
+                data_so_far[id_index][value] = (population + 1, total + stress_score)
+    return data_so_far
+
+
+def score_row(answers: List[str]) -> float:
+    """Return the stress score of a row of the dataset, given its answers to the items of
+    data.STRESS_INSTRUMENT in order.
+
+    >>> answers = ['NA'] * len(data.STRESS_INSTRUMENT)
+    >>> answers[0], answers[3] = '5', '3'
+    >>> score_row(answers)
+    2.0
+    """
+    # ACCUMULATOR stress_so_far: running sum of stress score
+    stress_so_far = 0.0
+    for answer, (_, scale, weight) in zip(answers, data.STRESS_INSTRUMENT):
+        if answer != 'NA' and int(answer) <= scale:
+            stress_so_far += (int(answer) - 1) * (4 / (scale - 1)) * weight
+    return stress_so_far
+
+
+def time_every_column(file_name: str, file_encoding: str = 'ISO-8859-1') -> float:
+    """Return the time in seconds taken by read_every_column to read and score the csv file.
+
+    Preconditions:
+      - os.path.isfile(file_name)
+    """
+    start = time.perf_counter()
+    read_every_column(file_name, file_encoding)
+    return time.perf_counter() - start
+
+
+def time_projected_rows(file_name: str, file_encoding: str = 'ISO-8859-1') -> float:
+    """Return the time in seconds taken by data.read_csv_file to read the csv file keeping only
+    the columns used for calculations, and to score every row on its own. Compared with
+    time_every_column, this only measures keeping fewer columns, which saves no time as every field
+    is still split.
+
+    Preconditions:
+      - os.path.isfile(file_name)
+    """
+    start = time.perf_counter()
+    data.read_csv_file(file_name, file_encoding, vectorized=False)
+    return time.perf_counter() - start
+
+
+def time_read_csv_file(file_name: str, file_encoding: str = 'ISO-8859-1') -> float:
+    """Return the time in seconds taken by data.read_csv_file to read the csv file keeping only
+    the columns used for calculations, and to score the rows in blocks.
+
+    Preconditions:
+      - os.path.isfile(file_name)
+    """
+    start = time.perf_counter()
+    data.read_csv_file(file_name, file_encoding)
+    return time.perf_counter() - start
+
+
+def best_of(timer: Callable[[str], float], file_name: str, repeat: int = 3) -> float:
+    """Return the shortest of repeat timings of timer on the csv file.
+
+    Preconditions:
+      - repeat > 0
+    """
+    return min(timer(file_name) for _ in range(repeat))
+
+
+def main() -> None:
+    """Print the time taken to read and score the dataset given on the command line, or the full
+    dataset, in every way."""
+    dataset = sys.argv[1] if len(sys.argv) > 1 else constants.REAL_DATA_CSV_FILE
+    baseline_time = best_of(time_every_column, dataset)
+    projected_time = best_of(time_projected_rows, dataset)
+    vectorized_time = best_of(time_read_csv_file, dataset)
+    print(f'Every column, row by row:      {baseline_time:.2f}s')
+    print(f'Used columns, row by row:      {projected_time:.2f}s '
+          f'({baseline_time / projected_time:.2f}x)')
+    print(f'Used columns, blocks of rows:  {vectorized_time:.2f}s '
+          f'({baseline_time / vectorized_time:.2f}x)')
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] == ['--self-test']:
+        import python_ta
+
+        python_ta.check_all(config={
+            'extra-imports': ['python_ta.contracts', 'csv', 'sys', 'time', 'constants', 'data'],
+            'allowed-io': ['read_every_column', 'main'],
+            'max-line-length': 100,
+            'disable': ['R1705', 'C0200']
+        })
+
+        import python_ta.contracts
+
+        python_ta.contracts.check_all_contracts()
+
+        import doctest
+
+        doctest.testmod()
+    else:
+        main()
@@ -0,0 +1,162 @@
+# -*- coding: <UTF-8> -*-
+"""Your Anxiety During COVID-19: bootstrap
+
+Module Description
+==================
+This module calculates the reproducible bootstrap confidence intervals of the average scores of the
+identities, and stores them in the confidence interval file drawn as error bars by the user
+interface. The scores of the identities are collected from the dataset by the data module.
+RUNNING THIS FILE TAKES NO EFFECT. IT SHOULD ONLY BE IMPORTED.
+
+Copyright and Usage Information
+===============================
+This project is licensed under the GNU General Public License v3.0.
+    Permissions of this strong copyleft license are conditioned on making available complete source
+    code of licensed works and modifications, which include larger works using a licensed work,
+    under the same license. Copyright and license notices must be preserved. Contributors provide an
+    express grant of patent rights.
+
+Authors (by alphabetical order):
+  - Faruk, Fardin   https://github.com/Fard-Faru
+  - Hsieh, Sharon   https://github.com/SharonHsieh22
+  - Li, Sinan       https://github.com/LanceLi1416/
+  - Zhan, Jeffery   https://github.com/jeffzhan
+"""
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# The seed of the random resampling of the bootstrap confidence intervals, so they are reproducible
+BOOTSTRAP_SEED = 110
+# The confidence level of the bootstrap confidence intervals
+BOOTSTRAP_CONFIDENCE = 0.95
+# Resampling the number of times every distinct score is drawn is faster than resampling the
+# respondents when there are at least this many respondents for every distinct score
+_MULTINOMIAL_RATIO = 10
+# Number of scores resampled at a time when resampling the respondents
+_CHUNK_SIZE = 1 << 22
+
+
+def bootstrap_confidence_intervals(bucket_scores: List[np.ndarray], resamples: int,
+                                   confidence: float = BOOTSTRAP_CONFIDENCE,
+                                   seed: int = BOOTSTRAP_SEED, workers: int = 1) -> np.ndarray:
+    """Return the bootstrap confidence interval of the average of every array of scores, as an
+    array with the lower and upper bound of every interval.
+
+    The scores are resampled with replacement resamples times, and the bounds are the quantiles of
+    the averages of the resamples that leave out (1 - confidence) / 2 of them on either side. Every
+    array is resampled with its own random generator spawned from the seed, so the intervals are
+    identical for any number of workers. If workers is greater than 1, the arrays are resampled by a
+    pool of that many processes. The interval of an empty array is [0.0, 0.0].
+
+    Preconditions:
+      - resamples > 0
+      - 0 < confidence < 1
+      - workers >= 1
+
+    >>> scores = [np.array([1.0, 2.0, 3.0, 4.0] * 50), np.array([2.0]), np.array([])]
+    >>> intervals = bootstrap_confidence_intervals(scores, 1000)
+    >>> bool(2.3 < intervals[0][0] < 2.5 < intervals[0][1] < 2.7), intervals[1:].tolist()
+    (True, [[2.0, 2.0], [0.0, 0.0]])
+    >>> bool((bootstrap_confidence_intervals(scores, 1000, workers=2) == intervals).all())
+    True
+    """
+    seed_sequences = np.random.SeedSequence(seed).spawn(len(bucket_scores))
+    arguments = (bucket_scores, [resamples] * len(bucket_scores),
+                 [confidence] * len(bucket_scores), seed_sequences)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            intervals = list(executor.map(_bootstrap_bucket, *arguments))
+    else:
+        intervals = list(map(_bootstrap_bucket, *arguments))
+    return np.array(intervals, dtype=np.float64).reshape(len(bucket_scores), 2)
+
+
+def _bootstrap_bucket(scores: np.ndarray, resamples: int, confidence: float,
+                      seed_sequence: np.random.SeedSequence) -> Tuple[float, float]:
+    """Return the bootstrap confidence interval of the average of the scores, see
+    bootstrap_confidence_intervals. This is the task run by every worker process.
+    """
+    if len(scores) == 0:
+        return 0.0, 0.0
+
+    generator = np.random.default_rng(seed_sequence)
+    values, counts = np.unique(scores, return_counts=True)
+    values = values.astype(np.float64)
+    if len(values) * _MULTINOMIAL_RATIO <= len(scores):
+        # Draw how many times every distinct score is resampled, which gives the same averages as
+        # drawing the respondents
+        resampled_counts = generator.multinomial(len(scores), counts / len(scores), size=resamples)
+        averages = resampled_counts @ values / len(scores)
+    else:
+        resampled_scores = np.repeat(values, counts)
+        chunk_size = max(1, _CHUNK_SIZE // len(scores))
+        averages = np.concatenate([
+            resampled_scores[generator.integers(0, len(scores),
+                                                (min(chunk_size, resamples - start),
+                                                 len(scores)))].mean(axis=1)
+            for start in range(0, resamples, chunk_size)])
+
+    low, high = np.quantile(averages, [(1 - confidence) / 2, (1 + confidence) / 2])
+    return float(low), float(high)
+
+
+def get_interval_file_name(json_file_name: str) -> str:
+    """Return the name of the confidence interval file stored next to the given processed data
+    file.
+
+    >>> get_interval_file_name('data/real_data.json')
+    'data/real_data_intervals.json'
+    """
+    return os.path.splitext(json_file_name)[0] + '_intervals.json'
+
+
+def load_confidence_intervals(file_name: str, file_encoding: str = 'UTF-8') -> \
+        List[Dict[str, List[float]]]:
+    """Load the previously stored confidence interval file, holding the lower and upper bound of
+    the confidence interval of the average score of every identity, in the same format as the
+    processed data.
+
+    Preconditions:
+      - os.path.isfile(file_name)
+    """
+    with open(file_name, 'r', encoding=file_encoding) as json_file:
+        return json.load(json_file)
+
+
+def save_confidence_intervals(file_name: str, intervals: List[Dict[str, List[float]]],
+                              file_encoding: str = 'UTF-8') -> None:
+    """Store the lower and upper bound of the confidence interval of the average score of every
+    identity in a confidence interval file, in the same format as the processed data.
+
+    >>> import tempfile
+    >>> with tempfile.TemporaryDirectory() as directory:
+    ...     save_confidence_intervals(os.path.join(directory, 'sample_intervals.json'), \
+                                      [{'18-24': [1.5, 2.5]}])
+    ...     load_confidence_intervals(os.path.join(directory, 'sample_intervals.json'))
+    [{'18-24': [1.5, 2.5]}]
+    """
+    with open(file_name, 'w', encoding=file_encoding) as json_file:
+        json.dump(intervals, json_file)
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['python_ta.contracts', 'json', 'os', 'concurrent.futures', 'numpy'],
+        'allowed-io': ['load_confidence_intervals', 'save_confidence_intervals'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
+
+    import python_ta.contracts
+
+    python_ta.contracts.check_all_contracts()
+
+    import doctest
+
+    doctest.testmod()
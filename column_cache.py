@@ -0,0 +1,208 @@
+# -*- coding: <UTF-8> -*-
+"""Your Anxiety During COVID-19: column_cache
+
+Module Description
+==================
+This module defines the columnar cache file of the dataset, which holds the columns used for
+calculations as typed arrays so they are scanned without parsing the csv file again, and records
+the csv file it was converted from. The cache is built from the dataset and scored by the data
+module. RUNNING THIS FILE TAKES NO EFFECT. IT SHOULD ONLY BE IMPORTED.
+
+Copyright and Usage Information
+===============================
+This project is licensed under the GNU General Public License v3.0.
+    Permissions of this strong copyleft license are conditioned on making available complete source
+    code of licensed works and modifications, which include larger works using a licensed work,
+    under the same license. Copyright and license notices must be preserved. Contributors provide an
+    express grant of patent rights.
+
+Authors (by alphabetical order):
+  - Faruk, Fardin   https://github.com/Fard-Faru
+  - Hsieh, Sharon   https://github.com/SharonHsieh22
+  - Li, Sinan       https://github.com/LanceLi1416/
+  - Zhan, Jeffery   https://github.com/jeffzhan
+"""
+import mmap
+import os
+import struct
+from typing import Any, Tuple
+
+import numpy as np
+
+import constants
+
+# The header of the columnar cache file: magic, version, number of answer columns, number of rows,
+# and the size, modification time, hash and encoding of the dataset it was converted from
+_COLUMN_CACHE_MAGIC = b'ANXC'
+_COLUMN_CACHE_VERSION = 2
+_COLUMN_CACHE_HEADER_FORMAT = '<4sHHqqq128s32s'
+# The answer stored in the columnar cache for NA, and the range of the other answers it can store
+_CACHED_NA_ANSWER = np.iinfo(np.int8).min
+_CACHED_ANSWER_MIN, _CACHED_ANSWER_MAX = _CACHED_NA_ANSWER + 1, np.iinfo(np.int8).max
+
+
+def get_column_cache_file_name(csv_file_name: str) -> str:
+    """Return the name of the columnar cache file stored next to the given dataset.
+
+    >>> get_column_cache_file_name('data/COVIDiSTRESS June 17.csv')
+    'data/COVIDiSTRESS June 17.columns'
+    """
+    return os.path.splitext(csv_file_name)[0] + '.columns'
+
+
+def compact_answers(answer_matrix: np.ndarray, na_mask: np.ndarray) -> np.ndarray:
+    """Return the answer matrix as small integers, as stored in the columnar cache, where the
+    answers that are NA in na_mask are _CACHED_NA_ANSWER. Answers above _CACHED_ANSWER_MAX are above
+    the scale of every answer, so they are stored as _CACHED_ANSWER_MAX without changing any score.
+
+    Raise ValueError if an answer is below _CACHED_ANSWER_MIN.
+
+    Preconditions:
+      - answer_matrix.shape == na_mask.shape
+
+    >>> compact_answers(np.array([[1, 0, 999]]), np.array([[False, True, False]])).tolist()
+    [[1, -128, 127]]
+    """
+    if (answer_matrix[~na_mask] < _CACHED_ANSWER_MIN).any():
+        raise ValueError(f'Answers below {_CACHED_ANSWER_MIN} cannot be stored in the cache')
+    compact_matrix = np.minimum(answer_matrix, _CACHED_ANSWER_MAX).astype(np.int8)
+    compact_matrix[na_mask] = _CACHED_NA_ANSWER
+    return compact_matrix
+
+
+def expand_answers(compact_matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the answers stored in the columnar cache as int64, and the mask of the answers that
+    are NA.
+
+    >>> answer_matrix, na_mask = expand_answers(np.array([[1, -128, 127]], dtype=np.int8))
+    >>> answer_matrix.dtype.name, na_mask.tolist()
+    ('int64', [[False, True, False]])
+    """
+    return compact_matrix.astype(np.int64), compact_matrix == _CACHED_NA_ANSWER
+
+
+def save_column_cache(file_name: str, codes: np.ndarray, compact_matrix: np.ndarray,
+                      source: Tuple[int, int, str, str]) -> None:
+    """Store the codes of the identities and the compacted answers of every row of the dataset in
+    a columnar cache file, together with the source it was converted from: the size, modification
+    time, hash and encoding of the csv file.
+
+    The file starts with a header, followed by the columns of the codes (int16) and then the
+    columns of the answers (int8), every column after another, starting at an offset that is a
+    multiple of 8. The file is written under a temporary name and then renamed, so an interrupted
+    conversion never leaves a partial cache behind.
+
+    Preconditions:
+      - codes.shape == (len(codes), constants.NUMBER_OF_IDENTITIES)
+      - len(compact_matrix) == len(codes)
+    """
+    header = struct.pack(_COLUMN_CACHE_HEADER_FORMAT, _COLUMN_CACHE_MAGIC, _COLUMN_CACHE_VERSION,
+                         compact_matrix.shape[1], len(codes), source[0], source[1],
+                         source[2].encode('ascii'), source[3].encode('ascii'))
+    with open(file_name + '.tmp', 'wb') as cache_file:
+        cache_file.write(header)
+        cache_file.write(bytes(_align_offset(len(header)) - len(header)))
+        cache_file.write(codes.T.astype('<i2').tobytes())
+        cache_file.write(compact_matrix.T.astype(np.int8).tobytes())
+    os.replace(file_name + '.tmp', file_name)
+
+
+def load_column_cache(file_name: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Load the columnar cache file, and return the matrix of the codes of the identities and the
+    matrix of the compacted answers, with one row for every row of the dataset.
+
+    The file is memory mapped and the returned matrices are views of it, where every column is
+    contiguous, so nothing is parsed or copied.
+
+    Raise ValueError if the file is not a columnar cache file of the current version.
+
+    Preconditions:
+      - os.path.isfile(file_name)
+
+    >>> import tempfile
+    >>> codes = np.arange(2 * constants.NUMBER_OF_IDENTITIES).reshape(2, -1)
+    >>> with tempfile.TemporaryDirectory() as directory:
+    ...     save_column_cache(os.path.join(directory, 'sample.columns'), codes, \
+                              np.array([[1, 2, 3], [4, 5, -128]], dtype=np.int8), \
+                              (10, 20, 'hash', 'UTF-8'))
+    ...     copy, answer_matrix = load_column_cache(os.path.join(directory, 'sample.columns'))
+    ...     print(bool((copy == codes).all()), answer_matrix.tolist())
+    ...     print(load_column_cache_source(os.path.join(directory, 'sample.columns')))
+    ...     del copy, answer_matrix
+    True [[1, 2, 3], [4, 5, -128]]
+    (10, 20, 'hash', 'UTF-8')
+    """
+    buffer, header = _read_column_cache_header(file_name)
+    column_count, row_count = header[2], header[3]
+    offset = _align_offset(struct.calcsize(_COLUMN_CACHE_HEADER_FORMAT))
+
+    codes = np.frombuffer(buffer, dtype='<i2', count=row_count * constants.NUMBER_OF_IDENTITIES,
+                          offset=offset)
+    offset = offset + codes.nbytes
+    answer_matrix = np.frombuffer(buffer, dtype=np.int8, count=row_count * column_count,
+                                  offset=offset)
+    return codes.reshape(constants.NUMBER_OF_IDENTITIES, row_count).T, \
+        answer_matrix.reshape(column_count, row_count).T
+
+
+def load_column_cache_source(file_name: str) -> Tuple[int, int, str, str]:
+    """Return the size, modification time, hash and encoding of the csv file the columnar cache
+    file was converted from, see save_column_cache.
+
+    Raise ValueError if the file is not a columnar cache file of the current version.
+
+    Preconditions:
+      - os.path.isfile(file_name)
+    """
+    _, header = _read_column_cache_header(file_name)
+    return header[4], header[5], header[6].rstrip(b'\0').decode('ascii'), \
+        header[7].rstrip(b'\0').decode('ascii')
+
+
+def _read_column_cache_header(file_name: str) -> Tuple[mmap.mmap, Tuple[Any, ...]]:
+    """Return the memory map of the columnar cache file and its unpacked header.
+
+    Raise ValueError if the file is not a columnar cache file of the current version.
+
+    Preconditions:
+      - os.path.isfile(file_name)
+    """
+    with open(file_name, 'rb') as cache_file:
+        buffer = mmap.mmap(cache_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if len(buffer) < struct.calcsize(_COLUMN_CACHE_HEADER_FORMAT):
+        raise ValueError(f'{file_name} is not a version {_COLUMN_CACHE_VERSION} column cache file')
+    header = struct.unpack_from(_COLUMN_CACHE_HEADER_FORMAT, buffer)
+    if header[0] != _COLUMN_CACHE_MAGIC or header[1] != _COLUMN_CACHE_VERSION:
+        raise ValueError(f'{file_name} is not a version {_COLUMN_CACHE_VERSION} column cache file')
+    return buffer, header
+
+
+def _align_offset(offset: int) -> int:
+    """Return the smallest multiple of 8 that is at least offset
+
+    >>> _align_offset(12)
+    16
+    >>> _align_offset(16)
+    16
+    """
+    return (offset + 7) // 8 * 8
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['python_ta.contracts', 'mmap', 'os', 'struct', 'numpy', 'constants'],
+        'allowed-io': ['save_column_cache', '_read_column_cache_header'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
+
+    import python_ta.contracts
+
+    python_ta.contracts.check_all_contracts()
+
+    import doctest
+
+    doctest.testmod()
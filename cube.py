@@ -0,0 +1,312 @@
+# -*- coding: <UTF-8> -*-
+"""Your Anxiety During COVID-19: cube
+
+Module Description
+==================
+This module defines the IdentityCube class -- the population and total stress score of every pair
+of identities from two different identity groups, which estimates the anxiety score from the joint
+distribution of the identities -- and the file the cube is stored in. The cube is built from the
+dataset by the data module. RUNNING THIS FILE TAKES NO EFFECT. IT SHOULD ONLY BE IMPORTED.
+
+Copyright and Usage Information
+===============================
+This project is licensed under the GNU General Public License v3.0.
+    Permissions of this strong copyleft license are conditioned on making available complete source
+    code of licensed works and modifications, which include larger works using a licensed work,
+    under the same license. Copyright and license notices must be preserved. Contributors provide an
+    express grant of patent rights.
+
+Authors (by alphabetical order):
+  - Faruk, Fardin   https://github.com/Fard-Faru
+  - Hsieh, Sharon   https://github.com/SharonHsieh22
+  - Li, Sinan       https://github.com/LanceLi1416/
+  - Zhan, Jeffery   https://github.com/jeffzhan
+"""
+import mmap
+import os
+import struct
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+import constants
+
+# The number of identities of every identity group, and the index of the first identity of every
+# identity group in the order of constants.IDENTITY_GROUP_OPTIONS_LIST
+_GROUP_SIZES = [len(options) for options in constants.IDENTITY_GROUP_OPTIONS_LIST]
+_REGULATED_OFFSETS = [sum(_GROUP_SIZES[:i]) for i in range(len(_GROUP_SIZES))]
+# Every pair of identity groups, whose joint populations and scores are stored in the identity cube
+PAIR_GROUPS = [(i, j) for i in range(len(_GROUP_SIZES)) for j in range(i + 1, len(_GROUP_SIZES))]
+# The smallest population of a pair of identities for the identity cube to use its average score
+_MIN_POPULATION = 30
+
+# The header of an identity cube file: the magic bytes, the version of the format, the number of
+# identities and the number of pairs of identities stored
+_CUBE_MAGIC = b'ANXP'
+_CUBE_VERSION = 1
+_CUBE_HEADER_FORMAT = '<4sHxxII'
+
+
+class IdentityCube:
+    """The population and total stress score of every pair of identities from two different
+    identity groups, for estimating the anxiety score from the joint distribution of the identities
+    instead of from every identity on its own.
+
+    Only the pairs with a population are stored. A pair is identified by the key
+    first * identity_count + second, where first < second are the indices of the identities in
+    the order of constants.IDENTITY_GROUP_OPTIONS_LIST. NA and unrecognized identities are not
+    stored.
+
+    Instance Attributes:
+      - keys: the sorted keys of the stored pairs
+      - populations: the population of every stored pair
+      - scores: the total stress score of every stored pair
+      - min_population: the smallest population of a pair for its average score to be used
+
+    Representation Invariants:
+      - len(self.keys) == len(self.populations) == len(self.scores)
+      - all(self.keys[:-1] < self.keys[1:])
+      - self.min_population >= 1
+    """
+    keys: np.ndarray
+    populations: np.ndarray
+    scores: np.ndarray
+    min_population: int
+
+    def __init__(self, keys: np.ndarray, populations: np.ndarray, scores: np.ndarray,
+                 min_population: int = _MIN_POPULATION) -> None:
+        """Initialize the cube with the given pairs"""
+        self.keys = keys
+        self.populations = populations
+        self.scores = scores
+        self.min_population = min_population
+
+    def lookup(self, first: int, second: int) -> Tuple[int, float]:
+        """Return the population and total stress score of the pair of identities, given their
+        indices in the order of constants.IDENTITY_GROUP_OPTIONS_LIST.
+
+        >>> cube = IdentityCube(np.array([5, 300]), np.array([2, 40]), np.array([3.0, 8.0]))
+        >>> cube.lookup(0, 5), cube.lookup(1, 300 - sum(_GROUP_SIZES)), cube.lookup(0, 6)
+        ((2, 3.0), (40, 8.0), (0, 0.0))
+        """
+        key = min(first, second) * sum(_GROUP_SIZES) + max(first, second)
+        position = int(np.searchsorted(self.keys, key))
+        if position < len(self.keys) and self.keys[position] == key:
+            return int(self.populations[position]), float(self.scores[position])
+        return 0, 0.0
+
+    def estimate_anxiety_score(self, identity: Dict[str, str],
+                               data: List[Dict[str, float]]) -> float:
+        """Return the anxiety score of a person with the given identities.
+
+        Every pair of identity groups gives an estimate: the average score of the people who share
+        both identities, or if fewer than min_population people do, the average of the two
+        identities' average scores in data. The anxiety score is the average of these estimates,
+        so it is the same as the average of the identities' average scores when every pair is too
+        small.
+
+        Preconditions:
+          - len(identity) == constants.NUMBER_OF_IDENTITIES
+          - all(identity[constants.IDENTITY_NAMES[i]] in constants.IDENTITY_GROUP_OPTIONS_LIST[i]
+                for i in range(constants.NUMBER_OF_IDENTITIES))
+
+        >>> data = [{option: float(i) for option in constants.IDENTITY_GROUP_OPTIONS_LIST[i]} \
+                    for i in range(constants.NUMBER_OF_IDENTITIES)]
+        >>> identity = {constants.IDENTITY_NAMES[i]: constants.IDENTITY_GROUP_OPTIONS_LIST[i][0] \
+                        for i in range(constants.NUMBER_OF_IDENTITIES)}
+        >>> empty_cube = IdentityCube(np.empty(0, dtype=np.int64), np.empty(0), np.empty(0))
+        >>> round(empty_cube.estimate_anxiety_score(identity, data), 9)
+        5.0
+        >>> cube = IdentityCube(np.array([_REGULATED_OFFSETS[1]]), np.array([30]), \
+                                np.array([3315.0]))
+        >>> round(cube.estimate_anxiety_score(identity, data), 9)
+        7.0
+        """
+        codes = [constants.IDENTITY_GROUP_OPTIONS_LIST[i].index(
+            identity[constants.IDENTITY_NAMES[i]]) for i in range(constants.NUMBER_OF_IDENTITIES)]
+
+        # ACCUMULATOR estimates_so_far: the sum of the estimates of every pair of identity groups
+        estimates_so_far = 0.0
+        for estimate in self.pair_estimates(codes, data):
+            estimates_so_far += estimate
+        return float(estimates_so_far / len(PAIR_GROUPS))
+
+    def pair_estimates(self, codes: List[int], data: List[Dict[str, float]]) -> List[float]:
+        """Return the estimate of every pair of identity groups for a person, given the index of
+        the identity of the person in the options of every identity group. The anxiety score of the
+        person is the average of the estimates, see estimate_anxiety_score.
+
+        Preconditions:
+          - len(codes) == constants.NUMBER_OF_IDENTITIES
+        """
+        indices = [_REGULATED_OFFSETS[i] + codes[i] for i in range(constants.NUMBER_OF_IDENTITIES)]
+        averages = [data[i][constants.IDENTITY_GROUP_OPTIONS_LIST[i][codes[i]]]
+                    for i in range(constants.NUMBER_OF_IDENTITIES)]
+
+        pair_keys = np.array([indices[i] * sum(_GROUP_SIZES) + indices[j] for i, j in PAIR_GROUPS])
+        positions = np.minimum(np.searchsorted(self.keys, pair_keys), max(len(self.keys) - 1, 0))
+        if len(self.keys) > 0:
+            found = self.keys[positions] == pair_keys
+            found &= self.populations[positions] >= self.min_population
+        else:
+            found = np.zeros(len(pair_keys), dtype=bool)
+
+        # ACCUMULATOR estimates: the estimate of every pair of identity groups so far
+        estimates = []
+        for k in range(len(PAIR_GROUPS)):
+            if found[k]:
+                estimates.append(float(self.scores[positions[k]] / self.populations[positions[k]]))
+            else:
+                i, j = PAIR_GROUPS[k]
+                estimates.append((averages[i] + averages[j]) / 2)
+        return estimates
+
+    def update_pair_estimates(self, estimates: List[float], codes: List[int], id_index: int,
+                              data: List[Dict[str, float]]) -> float:
+        """Update the estimates returned by pair_estimates after the identity in the identity group
+        at id_index changed to the one given in codes, and return the change of their sum. Only
+        the pairs with that identity group are looked up again.
+
+        Preconditions:
+          - len(estimates) == len(PAIR_GROUPS)
+          - len(codes) == constants.NUMBER_OF_IDENTITIES
+          - 0 <= id_index < constants.NUMBER_OF_IDENTITIES
+
+        >>> data = [{option: float(i) for option in constants.IDENTITY_GROUP_OPTIONS_LIST[i]} \
+                    for i in range(constants.NUMBER_OF_IDENTITIES)]
+        >>> cube = IdentityCube(np.array([_REGULATED_OFFSETS[1]]), np.array([30]), \
+                                np.array([3315.0]))
+        >>> codes = [0] * constants.NUMBER_OF_IDENTITIES
+        >>> estimates = cube.pair_estimates(codes, data)
+        >>> codes[1] = 1
+        >>> change = cube.update_pair_estimates(estimates, codes, 1, data)
+        >>> change, estimates == cube.pair_estimates(codes, data)
+        (-110.0, True)
+        """
+        # ACCUMULATOR change_so_far: the change of the sum of the estimates so far
+        change_so_far = 0.0
+        for k in range(len(PAIR_GROUPS)):
+            i, j = PAIR_GROUPS[k]
+            if id_index not in (i, j):
+                continue
+            population, score = self.lookup(_REGULATED_OFFSETS[i] + codes[i],
+                                            _REGULATED_OFFSETS[j] + codes[j])
+            if population >= self.min_population:
+                estimate = score / population
+            else:
+                estimate = (data[i][constants.IDENTITY_GROUP_OPTIONS_LIST[i][codes[i]]] +
+                            data[j][constants.IDENTITY_GROUP_OPTIONS_LIST[j][codes[j]]]) / 2
+            change_so_far += estimate - estimates[k]
+            estimates[k] = estimate
+        return change_so_far
+
+    def estimate_anxiety_scores(self, codes: np.ndarray, averages: np.ndarray) -> np.ndarray:
+        """Return the anxiety score of every person in a batch, the same as estimate_anxiety_score
+        returns for every person on their own.
+
+        codes holds the index of the identity of every person in the options of every identity
+        group, and averages holds the average score of that identity in the data.
+
+        Preconditions:
+          - codes.shape == averages.shape == (len(codes), constants.NUMBER_OF_IDENTITIES)
+
+        >>> cube = IdentityCube(np.array([_REGULATED_OFFSETS[1]]), np.array([30]), \
+                                np.array([3315.0]))
+        >>> averages = np.array([[float(i) for i in range(constants.NUMBER_OF_IDENTITIES)]] * 2)
+        >>> codes = np.zeros((2, constants.NUMBER_OF_IDENTITIES), dtype=np.int64)
+        >>> codes[1, 1] = 1
+        >>> np.round(cube.estimate_anxiety_scores(codes, averages), 9).tolist()
+        [7.0, 5.0]
+        """
+        indices = codes + np.array(_REGULATED_OFFSETS)
+        # ACCUMULATOR estimates_so_far: the sum of the estimates of every pair of identity groups
+        # for every person
+        estimates_so_far = np.zeros(len(codes))
+        for i, j in PAIR_GROUPS:
+            fallbacks = (averages[:, i] + averages[:, j]) / 2
+            if len(self.keys) == 0:
+                estimates_so_far += fallbacks
+                continue
+            pair_keys = indices[:, i] * sum(_GROUP_SIZES) + indices[:, j]
+            positions = np.minimum(np.searchsorted(self.keys, pair_keys), len(self.keys) - 1)
+            found = (self.keys[positions] == pair_keys) & \
+                (self.populations[positions] >= self.min_population)
+            pair_averages = self.scores[positions] / self.populations[positions]
+            estimates_so_far += np.where(found, pair_averages, fallbacks)
+        return estimates_so_far / len(PAIR_GROUPS)
+
+
+def get_cube_file_name(json_file_name: str) -> str:
+    """Return the name of the identity cube file stored next to the given processed data file.
+
+    >>> get_cube_file_name('data/real_data.json')
+    'data/real_data.cube'
+    """
+    return os.path.splitext(json_file_name)[0] + '.cube'
+
+
+def load_identity_cube(file_name: str) -> IdentityCube:
+    """Load the previously stored identity cube file.
+
+    The file is memory mapped and the arrays of the cube are views of it, so nothing is parsed or
+    copied.
+
+    Preconditions:
+      - os.path.isfile(file_name)
+
+    >>> import tempfile
+    >>> cube = IdentityCube(np.array([6, 300]), np.array([1, 40]), np.array([2.0, 8.0]))
+    >>> with tempfile.TemporaryDirectory() as directory:
+    ...     save_identity_cube(os.path.join(directory, 'sample.cube'), cube)
+    ...     copy = load_identity_cube(os.path.join(directory, 'sample.cube'))
+    ...     print(len(copy.keys), copy.lookup(0, 6), copy.lookup(0, 7))
+    ...     del copy
+    2 (1, 2.0) (0, 0.0)
+    """
+    with open(file_name, 'rb') as cube_file:
+        buffer = mmap.mmap(cube_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version, identity_count, pair_count = struct.unpack_from(_CUBE_HEADER_FORMAT, buffer)
+    if magic != _CUBE_MAGIC or version != _CUBE_VERSION or identity_count != sum(_GROUP_SIZES):
+        raise ValueError(f'{file_name} is not a version {_CUBE_VERSION} identity cube file')
+
+    offset = struct.calcsize(_CUBE_HEADER_FORMAT)
+    keys = np.frombuffer(buffer, dtype='<i8', count=pair_count, offset=offset)
+    offset = offset + keys.nbytes
+    populations = np.frombuffer(buffer, dtype='<i8', count=pair_count, offset=offset)
+    offset = offset + populations.nbytes
+    scores = np.frombuffer(buffer, dtype='<f8', count=pair_count, offset=offset)
+    return IdentityCube(keys, populations, scores)
+
+
+def save_identity_cube(file_name: str, cube: IdentityCube) -> None:
+    """Store the identity cube in an identity cube file.
+
+    The file starts with a header, followed by three fixed-width little-endian arrays holding the
+    keys (int64), populations (int64) and total scores (float64) of the pairs.
+    """
+    with open(file_name, 'wb') as cube_file:
+        cube_file.write(struct.pack(_CUBE_HEADER_FORMAT, _CUBE_MAGIC, _CUBE_VERSION,
+                                    sum(_GROUP_SIZES), len(cube.keys)))
+        cube_file.write(np.asarray(cube.keys).astype('<i8').tobytes())
+        cube_file.write(np.asarray(cube.populations).astype('<i8').tobytes())
+        cube_file.write(np.asarray(cube.scores).astype('<f8').tobytes())
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['python_ta.contracts', 'mmap', 'os', 'struct', 'numpy', 'constants'],
+        'allowed-io': ['load_identity_cube', 'save_identity_cube'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
+
+    import python_ta.contracts
+
+    python_ta.contracts.check_all_contracts()
+
+    import doctest
+
+    doctest.testmod()
@@ -21,11 +21,235 @@ Authors (by alphabetical order):
   - Li, Sinan       https://github.com/LanceLi1416/
   - Zhan, Jeffery   https://github.com/jeffzhan
 """
+import base64
+import contextlib
 import csv
+import gzip
+import hashlib
+import io
 import json
-from typing import Dict, List, Tuple
+import lzma
+import mmap
+import os
+import struct
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from operator import itemgetter
+from typing import Any, Dict, Iterable, Iterator, List, Tuple, Union
+
+import numpy as np
 
 import constants
+from bootstrap import BOOTSTRAP_CONFIDENCE, BOOTSTRAP_SEED, bootstrap_confidence_intervals, \
+    get_interval_file_name, save_confidence_intervals
+from column_cache import compact_answers, expand_answers, get_column_cache_file_name, \
+    load_column_cache, load_column_cache_source, save_column_cache
+from cube import PAIR_GROUPS, IdentityCube, get_cube_file_name, save_identity_cube
+from distribution import ScoreDistribution, build_population_distribution, \
+    build_score_distribution, get_distribution_file_name, get_population_file_name, \
+    save_population_distribution, save_score_distribution
+from sketch import QuantileSketch
+
+# Value added for each response in the survey
+# Depending on the nature of the question we may want to reduce or increase the stress score
+_STRESS_METHOD = [
+    # Scale_PSS10_UCLA
+    1, 1, 1, -1, -1, 1, -1, -1, 1, 1,
+    1, 1, 1,
+    # OECD_people
+    -1, -1,
+    # OECD_institutions
+    -1, -1, -1, -1, -1, -1,
+    # Corona_concerns
+    1, 1, 1, 1, 1,
+    # Trust_countrymeasure
+    -1,
+    # Compliance
+    -1, 0, 0, 1, -1, 1,
+    # BFF_15
+    1, 1, -1, 0, 0, 0, 0, 0, 0, 0, 1, 0, -1, 0, 0,
+    # Expl_Distress
+    1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1,
+    # SPS
+    -1, -1, -1, -1, -1, -1, -1, -1, -1, -1,
+    -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1,
+    1, 1, 1, 1, 1, -1
+]
+
+# Tuple Consists of:
+# First element is the scale that all the questions in a category are measured upon
+# Second element is number of questions within the same category
+_CATEGORY_TUPLES = [(5, 10), (5, 3), (11, 2), (11, 6), (6, 5), (11, 1),
+                    (6, 6), (6, 15), (6, 25), (6, 10), (6, 15), (6, 6)]
+
+# The names of the columns of the dataset holding the answers used for calculations, in the order
+# of _STRESS_METHOD
+_ANSWER_COLUMN_NAMES = \
+    [f'Scale_PSS10_UCLA_{i}' for i in range(1, 11)] + \
+    [f'Scale_SLON_{i}' for i in range(1, 4)] + \
+    [f'OECD_people_{i}' for i in range(1, 3)] + \
+    [f'OECD_insititutions_{i}' for i in range(1, 7)] + \
+    [f'Corona_concerns_{i}' for i in range(1, 6)] + \
+    ['Trust_countrymeasure'] + \
+    [f'Compliance_{i}' for i in range(1, 7)] + \
+    [f'BFF_15_{i}' for i in range(1, 16)] + \
+    [f'Expl_Distress_{i}' for i in range(1, 25)] + \
+    [f'SPS_{i}' for i in range(1, 11)] + \
+    [f'Expl_Coping_{i}' for i in range(1, 17)] + \
+    [f'Expl_media_{i}' for i in range(1, 7)]
+
+# Number of rows scored together by the vectorized scoring engine
+_SCORE_BLOCK_SIZE = 4096
+# The value an NA answer is parsed into by the vectorized scoring engine
+_NA_ANSWER = np.iinfo(np.int64).min
+
+# The names of the columns of the dataset holding the identities, in the order of
+# constants.IDENTITY_NAMES
+_IDENTITY_COLUMN_NAMES = ['Dem_age', 'Dem_gender', 'Dem_edu', 'Dem_employment', 'Country',
+                          'Dem_Expat', 'Dem_maritalstatus', 'Dem_riskgroup', 'Dem_islolation',
+                          'Dem_isolation_adults', 'Dem_isolation_kids']
+
+# The unregulated data is stored in flat arrays, where the identities of every identity group are
+# followed by the NA of the group. The offset is the index of the first identity of each group.
+_GROUP_SIZES = [len(options) for options in constants.IDENTITY_GROUP_OPTIONS_LIST]
+_GROUP_OFFSETS = [sum(_GROUP_SIZES[:i]) + i for i in range(len(_GROUP_SIZES))]
+# The index of the first identity of each group once the NA are removed
+_REGULATED_OFFSETS = [sum(_GROUP_SIZES[:i]) for i in range(len(_GROUP_SIZES))]
+# The code of the last element of the flat arrays, which collects the unrecognized identities
+_UNRECOGNIZED_CODE = sum(_GROUP_SIZES) + len(_GROUP_SIZES)
+# The first and the second identity group of every pair of identity groups of the identity cube
+_PAIR_FIRSTS, _PAIR_SECONDS = [pair[0] for pair in PAIR_GROUPS], [pair[1] for pair in PAIR_GROUPS]
+# Number of shards given to every worker process when the dataset is read in parallel
+_SHARDS_PER_WORKER = 4
+# Number of bytes read at a time when looking for the boundaries of the shards
+_SHARD_SCAN_CHUNK_SIZE = 1 << 20
+# Number of bytes of every block of the chained hash of a file
+_HASH_BLOCK_SIZE = 1 << 20
+# The extensions of the compressed datasets that are decompressed as a stream while they are read
+_COMPRESSED_EXTENSIONS = ('.zip', '.gz', '.xz')
+# Number of bytes of a compressed dataset decompressed at a time
+_STREAM_BUFFER_SIZE = 1 << 20
+# The version of the state saved by incremental processing, which changes with its format
+_INGEST_STATE_VERSION = 10
+# The version of the processed data, which changes with the scoring or the format of any processed
+# file, so processed data of an older version is never reused
+_PROCESSED_DATA_VERSION = 4
+
+# The header of a binary model file: the magic bytes, the version of the format, and the number of
+# identity groups, followed by the number of identities in each group
+_MODEL_MAGIC = b'ANXM'
+_MODEL_VERSION = 1
+_MODEL_HEADER_FORMAT = '<4sHH'
+
+# The header of a quantile sketch file: the magic bytes, the version of the format, the number of
+# identities and the size of the sketches, followed by the serialized sketches
+_SKETCHES_MAGIC = b'ANXK'
+_SKETCHES_VERSION = 1
+_SKETCHES_HEADER_FORMAT = '<4sHxxII'
+
+# The instrument calculating the stress score, as a list of items. Every item is the name of the
+# column holding the answer, the scale the answer is measured upon, and the value added for each
+# response. An answer that is NA or above its scale adds nothing.
+STRESS_INSTRUMENT = list(zip(_ANSWER_COLUMN_NAMES,
+                             [scale for scale, count in _CATEGORY_TUPLES for _ in range(count)],
+                             _STRESS_METHOD))
+
+# Named instruments that can be calculated together by process_data: the stress score, and the
+# parts of it coming from the PSS10 scale and from the distress questions
+INSTRUMENTS = {
+    'composite': STRESS_INSTRUMENT,
+    'pss10': [item for item in STRESS_INSTRUMENT if item[0].startswith('Scale_PSS10_UCLA_')],
+    'distress': [item for item in STRESS_INSTRUMENT if item[0].startswith('Expl_Distress_')]
+}
+
+
+class ScoringPlan:
+    """A flat execution plan calculating the scores of several instruments at once, compiled from
+    their items by compile_instruments.
+
+    The answer columns used by any of the instruments are read once. The items of all instruments
+    are flattened into arrays, so a block of rows is bounded and weighted for every instrument in
+    one matrix operation.
+
+    Instance Attributes:
+      - names: the names of the instruments
+      - instruments: the items of every instrument, as given to compile_instruments
+      - column_names: the names of the answer columns used by any of the instruments
+      - items: for every instrument, the index of the answer in column_names, the scale and the
+               weight of each item
+      - item_columns: the index of the answer in column_names of every item of every instrument
+      - scales: the scale of every item of every instrument
+      - steps: the value of one step of the scale of every item of every instrument
+      - weights: the weight of every item of every instrument
+      - offsets: the index in the flattened items of the first item of every instrument, followed
+                 by the total number of items
+
+    Representation Invariants:
+      - len(self.names) == len(self.instruments) == len(self.items) == len(self.offsets) - 1
+      - len(self.item_columns) == len(self.scales) == len(self.weights) == self.offsets[-1]
+    """
+    names: List[str]
+    instruments: List[List[Tuple[str, int, float]]]
+    column_names: List[str]
+    items: List[List[Tuple[int, int, float]]]
+    item_columns: np.ndarray
+    scales: np.ndarray
+    steps: np.ndarray
+    weights: np.ndarray
+    offsets: List[int]
+
+    def __init__(self, instruments: Dict[str, List[Tuple[str, int, float]]]) -> None:
+        """Compile the named instruments into a plan
+
+        Preconditions:
+          - instruments != {}
+          - all(instrument != [] for instrument in instruments.values())
+          - all(item[1] >= 2 for instrument in instruments.values() for item in instrument)
+        """
+        self.names = list(instruments)
+        self.instruments = [[tuple(item) for item in instruments[name]] for name in self.names]
+        self.column_names = []
+        self.items = []
+        for instrument in self.instruments:
+            for item in instrument:
+                if item[0] not in self.column_names:
+                    self.column_names.append(item[0])
+            self.items.append([(self.column_names.index(name), scale, weight)
+                               for name, scale, weight in instrument])
+
+        flat_items = [item for items in self.items for item in items]
+        self.item_columns = np.array([item[0] for item in flat_items], dtype=np.intp)
+        self.scales = np.array([item[1] for item in flat_items])
+        self.steps = np.array([4 / (item[1] - 1) for item in flat_items])
+        self.weights = np.array([item[2] for item in flat_items], dtype=np.float64)
+        self.offsets = [0]
+        for items in self.items:
+            self.offsets.append(self.offsets[-1] + len(items))
+
+
+def compile_instruments(instruments: Dict[str, List[Tuple[str, int, float]]]) -> ScoringPlan:
+    """Return the execution plan calculating the scores of the named instruments in one scan of
+    the dataset. Every instrument is a list of items as in STRESS_INSTRUMENT.
+
+    Raise ValueError if there is no instrument, an instrument has no items, or the scale of an item
+    has less than 2 steps.
+
+    >>> plan = compile_instruments(INSTRUMENTS)
+    >>> plan.names, len(plan.column_names), plan.offsets
+    (['composite', 'pss10', 'distress'], 104, [0, 104, 114, 138])
+    """
+    if not instruments:
+        raise ValueError('There are no instruments to compile')
+    for name, instrument in instruments.items():
+        if not instrument:
+            raise ValueError(f'The instrument {name} has no items')
+        if any(item[1] < 2 for item in instrument):
+            raise ValueError(f'The instrument {name} has an item with a scale less than 2')
+    return ScoringPlan(instruments)
+
+
+# The plan calculating only the stress score, compiled once
+_STRESS_PLAN = compile_instruments({'composite': STRESS_INSTRUMENT})
 
 
 def calculate_extrema(data: List[Dict[str, float]]) -> Tuple[float, float]:
@@ -62,314 +286,1749 @@ def load_json_data(file_name: str, file_encoding: str = 'UTF-8') -> List[Dict[st
     return data
 
 
+def get_model_file_name(json_file_name: str) -> str:
+    """Return the name of the binary model file stored next to the given processed data file.
+
+    >>> get_model_file_name('data/real_data.json')
+    'data/real_data.model'
+    """
+    return os.path.splitext(json_file_name)[0] + '.model'
+
+
+def load_binary_model(file_name: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Load the previously stored binary model file, and return the population, total score and
+    total squared score of every identity, in the order of constants.IDENTITY_GROUP_OPTIONS_LIST.
+
+    The file is memory mapped and the returned arrays are views of it, so nothing is parsed or
+    copied, and the file is only read from the disk as the arrays are accessed.
+
+    Preconditions:
+      - os.path.isfile(file_name)
+
+    >>> import tempfile
+    >>> sample_data = _regulate_na(_initialize_data_arrays())
+    >>> sample_data[0][:2], sample_data[1][:2], sample_data[2][:2] = [2, 1], [3.0, 1.5], [5.0, 2.25]
+    >>> with tempfile.TemporaryDirectory() as directory:
+    ...     _save_binary_model(os.path.join(directory, 'sample.model'), sample_data)
+    ...     model = load_binary_model(os.path.join(directory, 'sample.model'))
+    ...     all((model[i] == sample_data[i]).all() for i in range(3))
+    True
+    """
+    with open(file_name, 'rb') as model_file:
+        buffer = mmap.mmap(model_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version, group_count = struct.unpack_from(_MODEL_HEADER_FORMAT, buffer)
+    if magic != _MODEL_MAGIC or version != _MODEL_VERSION:
+        raise ValueError(f'{file_name} is not a version {_MODEL_VERSION} model file')
+
+    offset = struct.calcsize(_MODEL_HEADER_FORMAT)
+    group_sizes = np.frombuffer(buffer, dtype='<u4', count=group_count, offset=offset)
+    identity_count = int(group_sizes.sum())
+    offset = _align_model_offset(offset + group_sizes.nbytes)
+
+    populations = np.frombuffer(buffer, dtype='<i8', count=identity_count, offset=offset)
+    offset = offset + populations.nbytes
+    scores = np.frombuffer(buffer, dtype='<f8', count=identity_count, offset=offset)
+    offset = offset + scores.nbytes
+    squared_scores = np.frombuffer(buffer, dtype='<f8', count=identity_count, offset=offset)
+    return populations, scores, squared_scores
+
+
+def load_binary_data(file_name: str) -> List[Dict[str, float]]:
+    """Load the previously stored binary model file, and return the same average anxiety scores
+    as load_json_data does for the json file stored with it.
+
+    Preconditions:
+      - os.path.isfile(file_name)
+    """
+    return _calculate_data_average(load_binary_model(file_name))
+
+
+def create_quantile_sketches(size: int) -> List[QuantileSketch]:
+    """Return an empty quantile sketch of the given size for every identity, in the order of
+    constants.IDENTITY_GROUP_OPTIONS_LIST, followed by one for the whole population.
+
+    The list can be given to read_csv_file to collect the distribution of the scores of every
+    identity, and the lists of several datasets or runs can be merged sketch by sketch.
+
+    Preconditions:
+      - size >= 8
+
+    >>> sketches = create_quantile_sketches(100)
+    >>> len(sketches) == sum(_GROUP_SIZES) + 1, sketches[-1].size
+    (True, 100)
+    """
+    return [QuantileSketch(size) for _ in range(sum(_GROUP_SIZES) + 1)]
+
+
+def get_sketch_file_name(json_file_name: str) -> str:
+    """Return the name of the quantile sketch file stored next to the given processed data file.
+
+    >>> get_sketch_file_name('data/real_data.json')
+    'data/real_data.sketches'
+    """
+    return os.path.splitext(json_file_name)[0] + '.sketches'
+
+
+def load_quantile_sketches(file_name: str) -> List[QuantileSketch]:
+    """Load the previously stored quantile sketch file, in the same format as
+    create_quantile_sketches.
+
+    Preconditions:
+      - os.path.isfile(file_name)
+
+    >>> import tempfile
+    >>> sample_data = _initialize_data_arrays(20)
+    >>> _add_block_to_data(np.array([_GROUP_OFFSETS, _GROUP_OFFSETS]), np.array([2.0, 1.0]), \
+                           sample_data)
+    >>> with tempfile.TemporaryDirectory() as directory:
+    ...     _save_quantile_sketches(os.path.join(directory, 'sample.sketches'), sample_data)
+    ...     sketches = load_quantile_sketches(os.path.join(directory, 'sample.sketches'))
+    >>> sketches[0].count, sketches[0].quantile(0.5), sketches[-1].quantile(1.0), sketches[1].count
+    (2, 1.0, 2.0, 0)
+    """
+    with open(file_name, 'rb') as sketch_file:
+        buffer = sketch_file.read()
+
+    magic, version, identity_count, _ = struct.unpack_from(_SKETCHES_HEADER_FORMAT, buffer)
+    if magic != _SKETCHES_MAGIC or version != _SKETCHES_VERSION or \
+            identity_count != sum(_GROUP_SIZES):
+        raise ValueError(f'{file_name} is not a version {_SKETCHES_VERSION} quantile sketch file')
+
+    # ACCUMULATOR sketches_so_far: the sketches read so far
+    sketches_so_far = []
+    offset = struct.calcsize(_SKETCHES_HEADER_FORMAT)
+    for _ in range(identity_count + 1):
+        sketch, offset = QuantileSketch.from_bytes(buffer, offset)
+        sketches_so_far.append(sketch)
+    return sketches_so_far
+
+
+def _save_binary_model(file_name: str, data: Tuple[np.ndarray, np.ndarray, np.ndarray]) -> None:
+    """Store the population, total score and total squared score of every identity in a binary
+    model file.
+
+    The file starts with a header, followed by the number of identities of every identity group,
+    then three fixed-width little-endian arrays holding the populations (int64), total scores
+    (float64) and total squared scores (float64) of all identities, in the order of
+    constants.IDENTITY_GROUP_OPTIONS_LIST. Each array starts at an offset that is a multiple of 8.
+
+    Preconditions:
+      - all(len(array) == sum(_GROUP_SIZES) for array in data)
+    """
+    header = struct.pack(_MODEL_HEADER_FORMAT, _MODEL_MAGIC, _MODEL_VERSION, len(_GROUP_SIZES)) + \
+        np.array(_GROUP_SIZES, dtype='<u4').tobytes()
+
+    with open(file_name, 'wb') as model_file:
+        model_file.write(header)
+        model_file.write(bytes(_align_model_offset(len(header)) - len(header)))
+        model_file.write(data[0].astype('<i8').tobytes())
+        model_file.write(data[1].astype('<f8').tobytes())
+        model_file.write(data[2].astype('<f8').tobytes())
+
+
+def _build_identity_cube(data: Tuple[Any, ...]) -> IdentityCube:
+    """Return the identity cube of the pairs of identities with a population in the unregulated
+    data. The pairs with an NA or unrecognized identity are left out.
+
+    Preconditions:
+      - data[3] is not None
+
+    >>> sample_data = _initialize_data_arrays(pairs=True)
+    >>> _add_block_to_data(np.array([_GROUP_OFFSETS]), np.array([2.0]), sample_data)
+    >>> cube = _build_identity_cube(sample_data)
+    >>> len(cube.keys), cube.lookup(0, 6), cube.lookup(0, 7)
+    (55, (1, 2.0), (0, 0.0))
+    """
+    regulated_indices = _get_regulated_indices()
+    pair_codes = np.flatnonzero(data[3])
+    firsts = regulated_indices[pair_codes // (_UNRECOGNIZED_CODE + 1)]
+    seconds = regulated_indices[pair_codes % (_UNRECOGNIZED_CODE + 1)]
+    recognized = (firsts >= 0) & (seconds >= 0)
+    return IdentityCube(firsts[recognized] * sum(_GROUP_SIZES) + seconds[recognized],
+                        data[3][pair_codes[recognized]], data[4][pair_codes[recognized]])
+
+
+def _build_score_distribution(data: Tuple[Any, ...], averages: List[Dict[str, float]],
+                              cube: Union[IdentityCube, None] = None) -> ScoreDistribution:
+    """Return the distribution of the anxiety scores of the respondents in the unregulated data,
+    estimated from their identities with the averages of the processed data and the cube, the same
+    way User.estimate_anxiety_score estimates the score of a user, so the score of a user is
+    compared with scores on the same scale.
+
+    A user has an identity in every identity group, so the score of a respondent with an NA or
+    unrecognized identity is estimated with the most common identity of that group instead. The
+    respondent is still left out of the identities of that group.
+
+    Preconditions:
+      - data[5] is not None
+
+    >>> sample_data = _initialize_data_arrays(respondents=True)
+    >>> codes = np.array([_GROUP_OFFSETS, _GROUP_OFFSETS])
+    >>> codes[1, 0] = _GROUP_OFFSETS[0] + 1
+    >>> _add_block_to_data(codes, np.array([2.0, 1.0]), sample_data)
+    >>> averages = [{option: 0.0 for option in options} \
+                    for options in constants.IDENTITY_GROUP_OPTIONS_LIST]
+    >>> averages[0]['18-24'], averages[0]['25-34'] = 11.0, 22.0
+    >>> distribution = _build_score_distribution(sample_data, averages)
+    >>> distribution.scores.tolist(), distribution.identity_scores[:2].tolist()
+    ([1.0, 2.0], [1.0, 2.0])
+    """
+    if data[5]:
+        codes = np.concatenate(data[5])
+    else:
+        codes = np.empty((0, constants.NUMBER_OF_IDENTITIES), dtype=np.int16)
+
+    regulated_indices = _get_regulated_indices()
+    identities = regulated_indices[codes]
+    recognized = regulated_indices >= 0
+    populations = np.zeros(sum(_GROUP_SIZES), dtype=np.int64)
+    populations[regulated_indices[recognized]] = data[0][recognized]
+    most_common = [_REGULATED_OFFSETS[i] + int(np.argmax(
+        populations[_REGULATED_OFFSETS[i]:_REGULATED_OFFSETS[i] + _GROUP_SIZES[i]]))
+        for i in range(len(_GROUP_SIZES))]
+    estimated_identities = np.where(identities >= 0, identities, np.array(most_common))
+
+    identity_averages = np.array([averages[i][option] for i in range(len(_GROUP_SIZES))
+                                  for option in constants.IDENTITY_GROUP_OPTIONS_LIST[i]])
+    respondent_averages = identity_averages[estimated_identities]
+    if cube is not None:
+        scores = cube.estimate_anxiety_scores(estimated_identities - np.array(_REGULATED_OFFSETS),
+                                              respondent_averages)
+    else:
+        # ACCUMULATOR anxiety: the sum of the averages of the identities of every respondent
+        anxiety = np.zeros(len(codes))
+        for i in range(constants.NUMBER_OF_IDENTITIES):
+            anxiety = anxiety + respondent_averages[:, i]
+        scores = anxiety / constants.NUMBER_OF_IDENTITIES
+    return build_score_distribution(scores, identities)
+
+
+def _save_quantile_sketches(file_name: str, data: Tuple[Any, ...]) -> None:
+    """Store the quantile sketch of every identity and of the whole population in the unregulated
+    data in a quantile sketch file, in the same order as create_quantile_sketches.
+
+    The file starts with a header, followed by the sketches serialized by QuantileSketch.to_bytes.
+
+    Preconditions:
+      - data[7] is not None
+    """
+    sketches = _get_regulated_sketches(data[7])
+    with open(file_name, 'wb') as sketch_file:
+        sketch_file.write(struct.pack(_SKETCHES_HEADER_FORMAT, _SKETCHES_MAGIC, _SKETCHES_VERSION,
+                                      sum(_GROUP_SIZES), sketches[-1].size))
+        for sketch in sketches:
+            sketch_file.write(sketch.to_bytes())
+
+
+def _get_regulated_sketches(code_sketches: List[QuantileSketch]) -> List[QuantileSketch]:
+    """Return the sketches of the identities, indexed by their codes in the unregulated data, in
+    the same order as create_quantile_sketches. The sketches of NA and unrecognized identities are
+    left out.
+    """
+    regulated_indices = _get_regulated_indices()
+    return [code_sketches[code] for code in np.argsort(regulated_indices)
+            if regulated_indices[code] >= 0] + [code_sketches[-1]]
+
+
+def _get_bucket_scores(data: Tuple[Any, ...]) -> List[np.ndarray]:
+    """Return the scores of the respondents of every identity in the unregulated data, in the
+    order of constants.IDENTITY_GROUP_OPTIONS_LIST. The respondents with an NA identity are added
+    to every identity of the group when _regulate_na adds them, so the average of the scores of
+    every identity is its average in the processed data.
+
+    Preconditions:
+      - data[5] is not None
+
+    >>> sample_data = _initialize_data_arrays(respondents=True)
+    >>> _add_block_to_data(np.array([_GROUP_OFFSETS, _GROUP_OFFSETS]), np.array([2.0, 1.0]), \
+                           sample_data)
+    >>> [scores.tolist() for scores in _get_bucket_scores(sample_data)[:2]]
+    [[2.0, 1.0], []]
+    """
+    if data[5]:
+        codes, scores = np.concatenate(data[5]), np.concatenate(data[6])
+    else:
+        codes = np.empty((0, constants.NUMBER_OF_IDENTITIES), dtype=np.int16)
+        scores = np.empty(0, dtype=np.float32)
+
+    # ACCUMULATOR bucket_scores: the scores of the identities of the groups so far
+    bucket_scores = []
+    for i in range(constants.NUMBER_OF_IDENTITIES):
+        start, na_index = _GROUP_OFFSETS[i], _GROUP_OFFSETS[i] + _GROUP_SIZES[i]
+        if data[1][na_index] != 0.0:
+            na_scores = scores[codes[:, i] == na_index]
+        else:
+            na_scores = np.empty(0, dtype=np.float32)
+        for code in range(start, na_index):
+            bucket_scores.append(np.concatenate([scores[codes[:, i] == code], na_scores]))
+    return bucket_scores
+
+
+def _get_regulated_indices() -> np.ndarray:
+    """Return the index of every code of the unregulated data in the order of
+    constants.IDENTITY_GROUP_OPTIONS_LIST, or -1 for the codes of NA and unrecognized identities.
+
+    >>> regulated_indices = _get_regulated_indices()
+    >>> regulated_indices[:8].tolist()
+    [0, 1, 2, 3, 4, 5, -1, 6]
+    """
+    regulated_indices = np.full(_UNRECOGNIZED_CODE + 1, -1, dtype=np.int64)
+    for i in range(len(_GROUP_SIZES)):
+        regulated_indices[_GROUP_OFFSETS[i]:_GROUP_OFFSETS[i] + _GROUP_SIZES[i]] = \
+            np.arange(_REGULATED_OFFSETS[i], _REGULATED_OFFSETS[i] + _GROUP_SIZES[i])
+    return regulated_indices
+
+
+def _align_model_offset(offset: int) -> int:
+    """Return the smallest multiple of 8 that is at least offset
+
+    >>> _align_model_offset(12)
+    16
+    >>> _align_model_offset(16)
+    16
+    """
+    return (offset + 7) // 8 * 8
+
+
+def build_column_cache(file_name: str, file_encoding: str = 'ISO-8859-1') -> None:
+    """Convert the csv file into a columnar cache file stored next to it, see
+    get_column_cache_file_name.
+
+    The cache holds the columns used for calculations as typed arrays: the identities of every row
+    as the codes used by read_csv_file, and the answers as small integers, see compact_answers.
+
+    The cache records the size, modification time, hash and encoding of the csv file, and is only
+    used while all of them are unchanged, see save_column_cache.
+
+    Raise ValueError if an answer is too low to be stored in the cache.
+
+    Preconditions:
+      - file_name.endswith('.csv') or is_compressed_source(file_name)
+      - os.path.isfile(file_name)
+
+    >>> import shutil, tempfile
+    >>> with tempfile.TemporaryDirectory() as directory:
+    ...     csv_file_name = shutil.copy(constants.TEST_DATA_CSV_FILE, directory)
+    ...     build_column_cache(csv_file_name)
+    ...     codes, answer_matrix = load_column_cache(get_column_cache_file_name(csv_file_name))
+    ...     print(codes.shape, answer_matrix.shape, answer_matrix.dtype.name)
+    ...     del codes, answer_matrix
+    (100, 11) (100, 104) int8
+    """
+    file_stat = os.stat(file_name)
+    columns = _find_columns(_read_csv_header(file_name, file_encoding), _ANSWER_COLUMN_NAMES)
+
+    # ACCUMULATOR codes_so_far, answers_so_far: the columns of the blocks read so far
+    codes_so_far = [np.empty((0, constants.NUMBER_OF_IDENTITIES), dtype=np.int16)]
+    answers_so_far = [np.empty((0, len(_ANSWER_COLUMN_NAMES)), dtype=np.int8)]
+    with _open_csv_stream(file_name, file_encoding) as csv_file:
+        reader = csv.reader(csv_file)
+        next(reader)
+        for identities, answers in _read_blocks(reader, columns):
+            codes_so_far.append(_encode_identities(identities))
+            answer_matrix = _parse_answer_block(answers, len(_ANSWER_COLUMN_NAMES))
+            answers_so_far.append(compact_answers(answer_matrix, answer_matrix == _NA_ANSWER))
+
+    save_column_cache(get_column_cache_file_name(file_name), np.concatenate(codes_so_far),
+                      np.concatenate(answers_so_far),
+                      (file_stat.st_size, file_stat.st_mtime_ns,
+                       _hash_file_prefix(file_name, file_stat.st_size), file_encoding))
+
+
+def read_cached_csv_file(file_name: str, file_encoding: str = 'ISO-8859-1') -> \
+        Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return the same data as read_csv_file, but calculated from the columnar cache of the csv
+    file, which is built first if it is missing or out of date, see build_column_cache.
+
+    The cache is scanned once in blocks of _SCORE_BLOCK_SIZE rows, without parsing anything.
+
+    Preconditions:
+      - file_name.endswith('.csv') or is_compressed_source(file_name)
+      - os.path.isfile(file_name)
+    """
+    return _read_cached_csv_file(file_name, file_encoding, _STRESS_PLAN)[0][:3]
+
+
+def _read_cached_csv_file(file_name: str, file_encoding: str, plan: ScoringPlan,
+                          sketch_size: int = 0, pairs: bool = False,
+                          respondents: bool = False) -> List[Tuple[Any, ...]]:
+    """Return the data of every instrument of the plan, calculated from the columnar cache of the
+    csv file, see read_cached_csv_file. If sketch_size is positive, quantile sketches of that size
+    are also kept, if pairs is True, the pairs of identities are counted, and if respondents is
+    True, the codes and scores of the respondents are kept, see _initialize_data_arrays.
+
+    Raise ValueError if the plan uses an answer column that is not in the cache.
+
+    Preconditions:
+      - file_name.endswith('.csv') or is_compressed_source(file_name)
+      - os.path.isfile(file_name)
+    """
+    missing_columns = [name for name in plan.column_names if name not in _ANSWER_COLUMN_NAMES]
+    if missing_columns:
+        raise ValueError(f'The column cache does not hold the columns {missing_columns}')
+    cache_columns = [_ANSWER_COLUMN_NAMES.index(name) for name in plan.column_names]
+
+    cache_file_name = get_column_cache_file_name(file_name)
+    if not _is_column_cache_valid(file_name, file_encoding, cache_file_name):
+        build_column_cache(file_name, file_encoding)
+    codes, answer_matrix = load_column_cache(cache_file_name)
+
+    # ACCUMULATOR data_processed_so_far: the running arrays of populations and scores of every
+    # instrument
+    data_processed_so_far = [_initialize_data_arrays(sketch_size, pairs, respondents)
+                             for _ in plan.names]
+    for start in range(0, len(codes), _SCORE_BLOCK_SIZE):
+        stress_scores = _score_answer_matrix(
+            *expand_answers(answer_matrix[start:start + _SCORE_BLOCK_SIZE, cache_columns]), plan)
+        _add_scores_to_data(codes[start:start + _SCORE_BLOCK_SIZE], stress_scores,
+                            data_processed_so_far)
+    return data_processed_so_far
+
+
+def _is_column_cache_valid(file_name: str, file_encoding: str, cache_file_name: str) -> bool:
+    """Return whether the columnar cache file exists and was converted from the csv file as it is
+    now, with the same encoding: its size, modification time and hash must all be unchanged.
+    """
+    if not os.path.isfile(cache_file_name):
+        return False
+    try:
+        size, modification_time, file_hash, encoding = load_column_cache_source(cache_file_name)
+    except ValueError:
+        return False
+
+    file_stat = os.stat(file_name)
+    return size == file_stat.st_size and modification_time == file_stat.st_mtime_ns and \
+        encoding == file_encoding and file_hash == _hash_file_prefix(file_name, file_stat.st_size)
+
+
 def process_data(input_file_name: str, output_file_name: str,
-                 input_encoding: str = 'ISO-8859-1', output_encoding: str = 'UTF-8') -> None:
+                 input_encoding: str = 'ISO-8859-1', output_encoding: str = 'UTF-8',
+                 vectorized: bool = True, workers: int = 1, incremental: bool = False,
+                 cached: bool = False,
+                 instruments: Union[Dict[str, List[Tuple[str, int, float]]], None] = None,
+                 sketch_size: int = 0, bootstrap_resamples: int = 0,
+                 identity_cube: bool = False, score_distribution: bool = False,
+                 population_distribution: bool = False, key: Union[str, None] = None) -> None:
     """Process the data, then store it in a json file for future reference
 
+    If vectorized is True, the stress scores are calculated in blocks by the NumPy scoring engine,
+    otherwise they are calculated row by row. If workers is greater than 1, the dataset is read by
+    that many processes in parallel. All of these options give identical results.
+
+    If incremental is True, the unaveraged data is also stored next to the json file, together with
+    how much of the dataset it covers. The next incremental run then only reads the records that
+    were appended to the dataset since, unless the part that was read before has changed.
+
+    The dataset may also be a csv file compressed in a .zip, .gz or .xz file, which is
+    decompressed as a stream while it is read, see is_compressed_source. It is then read by a single
+    process, and incremental is ignored.
+
+    If cached is True, the scores are calculated from the columnar cache of the dataset instead,
+    see read_cached_csv_file. vectorized, workers and incremental are then ignored.
+
+    The population, total score and total squared score of every identity are also stored in a
+    binary model file next to the json file, see get_model_file_name and load_binary_model.
+
+    If instruments is given, the scores of every named instrument in it are calculated in the same
+    scan of the dataset, instead of the stress score, and stored in separate files, see
+    get_instrument_file_name. The instruments are compiled once by compile_instruments.
+
+    If identity_cube is True, the population and total score of every pair of identities are also
+    stored in an identity cube file, see get_cube_file_name and load_identity_cube.
+
+    If score_distribution is True, the anxiety score of every respondent, estimated from their
+    identities the same way as the score of a user, with the identity cube if identity_cube is also
+    True, is also stored sorted in a score distribution file, see get_distribution_file_name and
+    load_score_distribution.
+
+    If population_distribution is True, the distribution of the anxiety score over the population,
+    convolved from the averages and populations of the identities, is also stored in a population
+    distribution file, see get_population_file_name and load_population_distribution. It only
+    holds for anxiety scores estimated without the identity cube.
+
+    If sketch_size is positive, a quantile sketch of that size of the scores of every identity is
+    also stored in a quantile sketch file, see get_sketch_file_name and load_quantile_sketches.
+    Larger sketches are more accurate. The sketches are kept in the state of incremental processing
+    and updated with the records appended to the dataset.
+
+    If bootstrap_resamples is positive, the bootstrap confidence interval of the average score of
+    every identity is also calculated from that many resamples of the scores of its respondents,
+    see bootstrap_confidence_intervals, and stored in a confidence interval file in the same format
+    as the json file, see get_interval_file_name and load_confidence_intervals. The resampling is
+    done by the pool of workers, and is reproducible.
+
+    Every processed file is written under a temporary name and renamed once all of them are
+    written, and the optional files that were not asked for this time are removed. Then the key of
+    the processed data is stored in a key file, see get_processed_data_key, so
+    is_processed_data_current only reuses processed data that was completely written from the same
+    dataset and scoring configuration. If the key was already calculated with the same options,
+    e.g. to call is_processed_data_current first, it is given as key so the dataset is not hashed
+    again.
+
     Preconditions:
       - os.path.isfile(file_name)
-      - input_file_name.endswith('.csv')
+      - input_file_name.endswith('.csv') or is_compressed_source(input_file_name)
       - output_file_name.endswith('.json')
+      - workers >= 1
+      - key is None or key == get_processed_data_key(input_file_name, input_encoding, \
+            output_encoding, instruments, sketch_size, bootstrap_resamples, identity_cube, \
+            score_distribution, population_distribution)
+    """
+    if key is None:
+        key = get_processed_data_key(input_file_name, input_encoding, output_encoding, instruments,
+                                     sketch_size, bootstrap_resamples, identity_cube,
+                                     score_distribution, population_distribution)
+    respondents = score_distribution or bootstrap_resamples > 0
+    if instruments is None:
+        plan, output_file_names = _STRESS_PLAN, [output_file_name]
+    else:
+        plan = compile_instruments(instruments)
+        output_file_names = [get_instrument_file_name(output_file_name, name)
+                             for name in plan.names]
+
+    if cached:
+        raw_data = _read_cached_csv_file(input_file_name, input_encoding, plan, sketch_size,
+                                         identity_cube, respondents)
+    elif incremental and not is_compressed_source(input_file_name):
+        raw_data = _read_csv_file_incremental(input_file_name, input_encoding, vectorized, workers,
+                                              _get_ingest_state_file_name(output_file_name), plan,
+                                              sketch_size, identity_cube, respondents)
+    else:
+        raw_data = _read_csv_records(input_file_name, input_encoding, vectorized, workers, plan,
+                                     sketch_size, identity_cube, respondents)
+
+    # ACCUMULATOR written_file_names: the processed files written under temporary names so far
+    written_file_names = []
+    # ACCUMULATOR unrequested_file_names: the optional processed files that were not requested
+    unrequested_file_names = []
+    for i in range(len(plan.names)):
+        regulated_data = _regulate_na(raw_data[i])
+        data = _calculate_data_average(regulated_data)
+        file_names = [output_file_names[i], get_model_file_name(output_file_names[i]),
+                      get_cube_file_name(output_file_names[i]),
+                      get_distribution_file_name(output_file_names[i]),
+                      get_population_file_name(output_file_names[i]),
+                      get_sketch_file_name(output_file_names[i]),
+                      get_interval_file_name(output_file_names[i])]
+        requested = [True, True, identity_cube, score_distribution, population_distribution,
+                     sketch_size > 0, bootstrap_resamples > 0]
+        with open(file_names[0] + '.tmp', 'w', encoding=output_encoding) as json_file:
+            json.dump(data, json_file)
+        _save_binary_model(file_names[1] + '.tmp', regulated_data)
+        cube = _build_identity_cube(raw_data[i]) if identity_cube else None
+        if cube is not None:
+            save_identity_cube(file_names[2] + '.tmp', cube)
+        if score_distribution:
+            save_score_distribution(file_names[3] + '.tmp',
+                                    _build_score_distribution(raw_data[i], data, cube))
+        if population_distribution:
+            save_population_distribution(file_names[4] + '.tmp',
+                                         build_population_distribution(regulated_data[0], data))
+        if sketch_size > 0:
+            _save_quantile_sketches(file_names[5] + '.tmp', raw_data[i])
+        if bootstrap_resamples > 0:
+            intervals = bootstrap_confidence_intervals(_get_bucket_scores(raw_data[i]),
+                                                       bootstrap_resamples, workers=workers)
+            save_confidence_intervals(file_names[6] + '.tmp',
+                                      _split_into_identity_groups(intervals.tolist()),
+                                      output_encoding)
+        written_file_names.extend(file_names[j] for j in range(len(file_names)) if requested[j])
+        unrequested_file_names.extend(file_names[j] for j in range(len(file_names))
+                                      if not requested[j])
+
+    for file_name in written_file_names:
+        os.replace(file_name + '.tmp', file_name)
+    for file_name in unrequested_file_names:
+        if os.path.isfile(file_name):
+            os.remove(file_name)
+    _write_file_atomically(get_key_file_name(output_file_name), key)
+
+
+def get_key_file_name(json_file_name: str) -> str:
+    """Return the name of the file storing the key of the given processed data file.
+
+    >>> get_key_file_name('data/real_data.json')
+    'data/real_data.key'
+    """
+    return os.path.splitext(json_file_name)[0] + '.key'
+
+
+def get_processed_data_key(input_file_name: str, input_encoding: str = 'ISO-8859-1',
+                           output_encoding: str = 'UTF-8',
+                           instruments: Union[Dict[str, List[Tuple[str, int, float]]],
+                                              None] = None,
+                           sketch_size: int = 0, bootstrap_resamples: int = 0,
+                           identity_cube: bool = False, score_distribution: bool = False,
+                           population_distribution: bool = False) -> str:
+    """Return the key of the data process_data would produce from the csv file with the given
+    options: the hexadecimal BLAKE2 hash of the chained hash of the whole csv file, see
+    _hash_file_blocks, the scoring configuration and _PROCESSED_DATA_VERSION.
+
+    The options that give identical results, such as the number of workers, are not part of the key.
+
+    Preconditions:
+      - os.path.isfile(input_file_name)
+    """
+    plan = _STRESS_PLAN if instruments is None else compile_instruments(instruments)
+    fingerprint = json.dumps([_PROCESSED_DATA_VERSION, input_encoding, output_encoding,
+                              instruments is None, plan.names, plan.instruments, sketch_size,
+                              bootstrap_resamples, BOOTSTRAP_SEED, BOOTSTRAP_CONFIDENCE,
+                              identity_cube, score_distribution, population_distribution,
+                              constants.IDENTITY_GROUP_OPTIONS_LIST])
+    key_hash = hashlib.blake2b(fingerprint.encode('UTF-8'))
+    key_hash.update(_hash_file_prefix(input_file_name,
+                                      os.path.getsize(input_file_name)).encode('ascii'))
+    return key_hash.hexdigest()
+
+
+def is_processed_data_current(input_file_name: str, output_file_name: str,
+                              input_encoding: str = 'ISO-8859-1', output_encoding: str = 'UTF-8',
+                              instruments: Union[Dict[str, List[Tuple[str, int, float]]],
+                                                 None] = None,
+                              sketch_size: int = 0, bootstrap_resamples: int = 0,
+                              identity_cube: bool = False, score_distribution: bool = False,
+                              population_distribution: bool = False,
+                              key: Union[str, None] = None) -> bool:
+    """Return whether process_data has completely written the processed data file from the csv
+    file as it is now, with the same options, so it can be reused instead of processed again.
+
+    If the key of the processed data was already calculated with the same options, it is given as
+    key, so it can be passed on to process_data without hashing the dataset again.
+
+    Preconditions:
+      - os.path.isfile(input_file_name)
+      - key is None or key == get_processed_data_key(input_file_name, input_encoding, \
+            output_encoding, instruments, sketch_size, bootstrap_resamples, identity_cube, \
+            score_distribution, population_distribution)
+
+    >>> import tempfile
+    >>> with tempfile.TemporaryDirectory() as directory:
+    ...     input_file_name = os.path.join(directory, 'sample.csv')
+    ...     output_file_name = os.path.join(directory, 'sample.json')
+    ...     with open(input_file_name, 'w', newline='') as input_file:
+    ...         csv.writer(input_file).writerows([_IDENTITY_COLUMN_NAMES + _ANSWER_COLUMN_NAMES,
+    ...                                           ['30'] + ['NA'] * 114])
+    ...     before = is_processed_data_current(input_file_name, output_file_name)
+    ...     process_data(input_file_name, output_file_name)
+    ...     after = is_processed_data_current(input_file_name, output_file_name)
+    ...     other = is_processed_data_current(input_file_name, output_file_name, sketch_size=50)
+    ...     with open(input_file_name, 'a', newline='') as input_file:
+    ...         csv.writer(input_file).writerows([['30'] + ['NA'] * 114])
+    ...     changed = is_processed_data_current(input_file_name, output_file_name)
+    ...     process_data(input_file_name, output_file_name, incremental=True)
+    ...     with open(input_file_name, 'rb') as input_file:
+    ...         contents = input_file.read()
+    ...     with open(input_file_name, 'wb') as input_file:
+    ...         _ = input_file.write(contents.replace(b'\\n30,', b'\\n40,', 1))
+    ...     edited = is_processed_data_current(input_file_name, output_file_name)
+    >>> before, after, other, changed, edited
+    (False, True, False, False, False)
+    """
+    key_file_name = get_key_file_name(output_file_name)
+    if instruments is None:
+        output_file_names = [output_file_name]
+    else:
+        output_file_names = [get_instrument_file_name(output_file_name, name)
+                             for name in instruments]
+    if not all(os.path.isfile(file_name) for file_name in output_file_names + [key_file_name]):
+        return False
+
+    if key is None:
+        key = get_processed_data_key(input_file_name, input_encoding, output_encoding, instruments,
+                                     sketch_size, bootstrap_resamples, identity_cube,
+                                     score_distribution, population_distribution)
+    with open(key_file_name, 'r', encoding='ascii') as key_file:
+        return key_file.read() == key
+
+
+def _write_file_atomically(file_name: str, text: str) -> None:
+    """Write the text to the file under a temporary name and then rename it, so the file is never
+    left partially written.
     """
-    data = _calculate_data_average(_regulate_na(read_csv_file(input_file_name, input_encoding)))
-    with open(output_file_name, 'w', encoding=output_encoding) as json_file:
-        json.dump(data, json_file)
+    with open(file_name + '.tmp', 'w', encoding='UTF-8') as temporary_file:
+        temporary_file.write(text)
+    os.replace(file_name + '.tmp', file_name)
+
 
+def get_instrument_file_name(output_file_name: str, instrument_name: str) -> str:
+    """Return the name of the processed data file of the named instrument, when process_data
+    calculates several instruments for the given processed data file.
 
-def read_csv_file(file_name: str, file_encoding: str = 'ISO-8859-1') -> \
-        List[Dict[str, Tuple[int, float]]]:
+    >>> get_instrument_file_name('data/real_data.json', 'pss10')
+    'data/real_data_pss10.json'
+    """
+    return os.path.splitext(output_file_name)[0] + '_' + instrument_name + '.json'
+
+
+def read_csv_file(file_name: str, file_encoding: str = 'ISO-8859-1', vectorized: bool = True,
+                  workers: int = 1, sketches: Union[List[QuantileSketch], None] = None) -> \
+        Tuple[np.ndarray, np.ndarray, np.ndarray]:
     """Return the data stored in a csv file with the given filename.
 
-    The return value is list consisting of 11 dictionaries:
-    - The first is a dictionary with age ranges (in groups of 10)
-    - The second is a dictionary of genders
-    - The third is a dictionary of education statuses
-    - The fourth is a dictionary of employment statuses
-    - The fifth is a dictionary of countries of residence
-    - The sixth is a dictionary of whether or not the participant is an expatriate
-    - The seventh is a dictionary of marital statuses
-    - The eighth is a dictionary of whether or not the participant is part of a high-risk group
-        for Coronavirus
-    - The ninth is a dictionary of isolation status
-    - The tenth is a dictionary of ranges of the number of adults the participant is isolating with
-    - The eleventh is a dictionary of ranges of the number of children the participant
-        is isolating with (edited)
-
-    The dictionaries each map to their own tuple of two items,
-    the first being the population (or number of people) that have added their score to it
-    and the second being the total stress_score that has been added to them,
+    The return value is a tuple of three arrays, holding for every identity:
+    - The population (or number of people) that have added their score to it
+    - The total stress_score that has been added to them
+    - The total of the squares of the stress_score that has been added to them
+
+    The arrays are indexed by the code of the identity. The identities of the 11 identity groups
+    come in the order of constants.IDENTITY_GROUP_OPTIONS_LIST, and every identity group is
+    followed by its NA. The last element collects the people whose identity is not recognized, and
+    is ignored. The lookup tables in _IDENTITY_CODE_TABLES map the values in the csv file to codes.
+
+    Only the identity columns and the answer columns used for calculations are kept from every row,
+    which are found by their names in the header of the file.
+
+    If vectorized is True, the rows are read in blocks of _SCORE_BLOCK_SIZE and each block is
+    scored at once by _score_answer_block, otherwise every row is scored by _calc_stress_score.
+
+    If workers is greater than 1, the records of the file are split into shards that are read and
+    scored by a pool of that many processes. The shards are added to the arrays in the order they
+    appear in the file, so the result is identical to reading the file in a single process. A csv
+    file compressed in a .zip, .gz or .xz file is decompressed as a stream by a single process.
+
+    If sketches is given, in the format of create_quantile_sketches, the stress score of every
+    record is also summarized in the quantile sketch of every identity it belongs to and of the
+    whole population, so the sketches can be merged across datasets and runs.
+
+    Preconditions:
+      - file_name.endswith('.csv') or is_compressed_source(file_name)
+      - os.path.isfile(file_name)
+      - workers >= 1
+      - sketches is None or len(sketches) == sum(_GROUP_SIZES) + 1
+    """
+    sketch_size = 0 if sketches is None else sketches[-1].size
+    data = _read_csv_records(file_name, file_encoding, vectorized, workers, _STRESS_PLAN,
+                             sketch_size)[0]
+    if sketches is not None:
+        for sketch, new_sketch in zip(sketches, _get_regulated_sketches(data[7])):
+            sketch.merge(new_sketch)
+    return data[:3]
+
+
+def _read_csv_records(file_name: str, file_encoding: str, vectorized: bool, workers: int,
+                      plan: ScoringPlan, sketch_size: int = 0, pairs: bool = False,
+                      respondents: bool = False) -> List[Tuple[Any, ...]]:
+    """Return the data of every instrument of the plan, in the same format as read_csv_file. If
+    sketch_size is positive, quantile sketches of that size are also kept, if pairs is True, the
+    pairs of identities are counted, and if respondents is True, the codes and scores of the
+    respondents are kept, see _initialize_data_arrays.
+
+    Preconditions:
+      - file_name.endswith('.csv') or is_compressed_source(file_name)
+      - os.path.isfile(file_name)
+      - workers >= 1
+    """
+    # ACCUMULATOR data_processed_so_far: the running arrays of populations and scores of every
+    # instrument
+    data_processed_so_far = [_initialize_data_arrays(sketch_size, pairs, respondents)
+                             for _ in plan.names]
+    _add_csv_records_to_data(file_name, file_encoding, 0, None, vectorized, workers, plan,
+                             data_processed_so_far)
+    return data_processed_so_far
+
+
+def _read_csv_file_incremental(file_name: str, file_encoding: str, vectorized: bool, workers: int,
+                               state_file_name: str, plan: ScoringPlan, sketch_size: int = 0,
+                               pairs: bool = False,
+                               respondents: bool = False) -> List[Tuple[Any, ...]]:
+    """Return the same data as _read_csv_records, but only read the records appended to the csv
+    file since the state in state_file_name was saved. The state is then updated to cover every
+    complete record of the file, see _find_last_record_end. The last record is read after the state
+    is saved if it does not end with a newline, as it may still be written to.
+
+    The saved state is only used if it was saved for the same instruments, sketch size, pairs and
+    respondents, and the whole part of the file it covers is unchanged, see _is_unchanged_prefix.
+    Otherwise, the whole file is read again.
 
     Preconditions:
       - file_name.endswith('.csv')
       - os.path.isfile(file_name)
+      - workers >= 1
     """
-    # ACCUMULATOR data_processed_so_far: the running list of
-    data_processed_so_far = _initialize_data_list()
+    file_size = os.path.getsize(file_name)
+    block_hashes = _hash_file_blocks(file_name, file_size)
+    state = _load_ingest_state(state_file_name)
 
-    with open(file_name, encoding=file_encoding) as file:
-        reader = csv.reader(file)
-        # Reads the first row of the csv file, which contains the headers.
-        next(reader)
+    instruments = json.loads(json.dumps(dict(zip(plan.names, plan.instruments))))
+
+    if state is not None and state['encoding'] == file_encoding and \
+            state['instruments'] == instruments and state['sketch_size'] == sketch_size and \
+            state['pairs'] == pairs and state['respondents'] == respondents and \
+            _is_unchanged_prefix(file_name, block_hashes, state['size'], state['hash']):
+        data_processed_so_far, offset, row_count = state['data'], state['offset'], state['rows']
+    else:
+        data_processed_so_far = [_initialize_data_arrays(sketch_size, pairs, respondents)
+                                 for _ in plan.names]
+        offset, row_count = 0, 0
+
+    end = _find_last_record_end(file_name, offset)
+    if offset < end:
+        row_count = row_count + _add_csv_records_to_data(file_name, file_encoding, offset, end,
+                                                         vectorized, workers, plan,
+                                                         data_processed_so_far)
+
+    _save_ingest_state(state_file_name, {
+        'version': _INGEST_STATE_VERSION,
+        'encoding': file_encoding,
+        'instruments': instruments,
+        'sketch_size': sketch_size,
+        'pairs': pairs,
+        'respondents': respondents,
+        'offset': end,
+        'rows': row_count,
+        'size': file_size,
+        'hash': block_hashes[-1],
+        'data': [[None if array is None else array.tolist() for array in data[:5]] +
+                 [None if data[5] is None else _encode_state_array(data[5], '<i2'),
+                  None if data[6] is None else _encode_state_array(data[6], '<f4'),
+                  _encode_state_sketches(data[7])]
+                 for data in data_processed_so_far]
+    })
+
+    if end < file_size:
+        # A single record is left, so it is read without starting the worker processes
+        _add_csv_records_to_data(file_name, file_encoding, end, file_size, vectorized, 1, plan,
+                                 data_processed_so_far)
+    return data_processed_so_far
+
+
+def _add_csv_records_to_data(file_name: str, file_encoding: str, start: int,
+                             end: Union[int, None], vectorized: bool, workers: int,
+                             plan: ScoringPlan, data: List[Tuple[Any, ...]]) -> int:
+    """Add every record of the csv file from the byte offset start to the byte offset end, or to
+    the end of the file if end is None, to the arrays of every instrument of the plan, and return
+    the number of records added.
+
+    If start is 0, the header of the file is skipped. See read_csv_file for the other parameters.
+    A compressed csv file is always read as a stream by a single process, see _open_csv_stream.
+
+    Preconditions:
+      - os.path.isfile(file_name)
+      - start == 0 or start is the byte offset of the boundary of a record in the file
+      - end is None or start < end <= os.path.getsize(file_name)
+      - (start == 0 and end is None) or not is_compressed_source(file_name)
+      - workers >= 1
+    """
+    # ACCUMULATOR row_count: the number of records added so far
+    row_count = 0
+    columns = _find_columns(_read_csv_header(file_name, file_encoding), plan.column_names)
+
+    if workers > 1 and not is_compressed_source(file_name):
+        shards = _split_csv_file(file_name, workers * _SHARDS_PER_WORKER, start, end)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            shard_results = executor.map(_read_csv_shard,
+                                         [file_name] * len(shards), [file_encoding] * len(shards),
+                                         [shard[0] for shard in shards],
+                                         [shard[1] for shard in shards],
+                                         [columns] * len(shards), [vectorized] * len(shards),
+                                         [plan] * len(shards))
+            for codes, stress_scores in _split_shards_into_blocks(shard_results):
+                _add_scores_to_data(codes, stress_scores, data)
+                row_count = row_count + len(codes)
+        return row_count
+
+    if is_compressed_source(file_name):
+        text_file = _open_csv_stream(file_name, file_encoding)
+    elif end is None:
+        binary_file = open(file_name, 'rb')
+        binary_file.seek(start)
+        text_file = io.TextIOWrapper(binary_file, encoding=file_encoding)
+    else:
+        text_file = contextlib.closing(_read_lines(file_name, file_encoding, start, end))
+
+    with text_file as lines:
+        reader = csv.reader(lines)
+        if start == 0:
+            # Reads the first row of the csv file, which contains the headers.
+            next(reader)
         # This list comprehension reads each remaining row of the file, where each row is
         # represented as a list of strings.
         # The header row is *not* included in this list.
-        for row in reader:
-            stress_score = _calc_stress_score(row)
-
-            # change from numerical to category
-            _add_age_to_dict(int(row[4]), stress_score, data_processed_so_far)
-            _add_isolation_to_dict(row[16], 9, stress_score, data_processed_so_far)
-            _add_isolation_to_dict(row[17], 10, stress_score, data_processed_so_far)
-            # countries - some countries are not displayed correctly
-            _add_country_to_dict(row[9], stress_score, data_processed_so_far)
-            # expat - csv file uses lower case
-            _add_expat_to_dict(row[10], stress_score, data_processed_so_far)
-            # marital - csv file uses ' or ' instead of '/'
-            _add_marital_to_dict(row[12], stress_score, data_processed_so_far)
-            # remaining ones
-            remaining_columns = [5, 6, 8, 14, 15]
-            for csv_index in remaining_columns:
-                category = data_processed_so_far[
-                    remaining_columns.index(csv_index) + (1 if csv_index < 10 else 4)]
-                if row[csv_index] in category:
-                    value = category[row[csv_index]]
-                    category[row[csv_index]] = (value[0] + 1, value[1] + stress_score)
+        for identities, answers in _read_blocks(reader, columns):
+            _add_scores_to_data(_encode_identities(identities),
+                                _score_block(answers, vectorized, plan), data)
+            row_count = row_count + len(identities)
 
-    return data_processed_so_far
+    return row_count
+
+
+def _read_csv_header(file_name: str, file_encoding: str) -> List[str]:
+    """Return the names of the columns of the csv file
 
+    Preconditions:
+      - os.path.isfile(file_name)
+    """
+    with _open_csv_stream(file_name, file_encoding) as file:
+        return next(csv.reader(file))
 
-def _initialize_data_list() -> List[Dict[str, Tuple[int, float]]]:
-    """Return initialized values
 
-    >>> initial = _initialize_data_list()
-    >>> all(list(initial[i].keys()) == (constants.IDENTITY_GROUP_OPTIONS_LIST[i] + ['NA']) \
-            for i in range(len(initial)))
+def _read_lines(file_name: str, file_encoding: str, start: int, end: int) -> Iterator[str]:
+    """Return the lines of the csv file from the byte offset start to the byte offset end, decoded.
+
+    Preconditions:
+      - os.path.isfile(file_name)
+      - 0 <= start <= end <= os.path.getsize(file_name)
+
+    >>> [len(line) for line in _read_lines(constants.TEST_DATA_CSV_FILE, 'UTF-8', 0, 2390)]
+    [2386, 4]
+    """
+    with open(file_name, 'rb') as file:
+        file.seek(start)
+        # ACCUMULATOR position: the byte offset of the next line in the file
+        position = start
+        for line in file:
+            line = line[:end - position]
+            if not line:
+                return
+            yield line.decode(file_encoding)
+            position = position + len(line)
+
+
+def _find_last_record_end(file_name: str, start: int) -> int:
+    """Return the byte offset of the end of the last complete record of the csv file after the
+    byte offset start, which is right after the last newline outside a quoted field, or start if
+    there is none. Only the part of the file after start is read.
+
+    Preconditions:
+      - os.path.isfile(file_name)
+      - start == 0 or start is the byte offset of the boundary of a record in the file
+
+    >>> import tempfile
+    >>> with tempfile.TemporaryDirectory() as directory:
+    ...     file_name = os.path.join(directory, 'sample.csv')
+    ...     with open(file_name, 'wb') as file:
+    ...         _ = file.write(b'a,b\\n1,"x\\ny"\\n2,"z\\n')
+    ...     _find_last_record_end(file_name, 0), _find_last_record_end(file_name, 12)
+    (12, 12)
+    """
+    with open(file_name, 'rb') as file:
+        file.seek(start)
+        # ACCUMULATOR quote_count: the number of quotes from start to the end of the part of the
+        # file still to search
+        quote_count = 0
+        chunk = file.read(_SHARD_SCAN_CHUNK_SIZE)
+        while chunk:
+            quote_count = quote_count + chunk.count(b'"')
+            chunk = file.read(_SHARD_SCAN_CHUNK_SIZE)
+
+        # ACCUMULATOR end: the end of the part of the file still to search, searched backwards
+        end = file.tell()
+        while end > start:
+            chunk_start = max(start, end - _SHARD_SCAN_CHUNK_SIZE)
+            file.seek(chunk_start)
+            chunk = file.read(end - chunk_start)
+            newline = chunk.rfind(b'\n')
+            while newline != -1:
+                quote_count = quote_count - chunk.count(b'"', newline)
+                if quote_count % 2 == 0:
+                    return chunk_start + newline + 1
+                chunk = chunk[:newline]
+                newline = chunk.rfind(b'\n')
+            quote_count = quote_count - chunk.count(b'"')
+            end = chunk_start
+
+    return start
+
+
+def is_compressed_source(file_name: str) -> bool:
+    """Return whether the dataset is a csv file compressed in a .zip, .gz or .xz file
+
+    >>> is_compressed_source('data/COVIDiSTRESS June 17.csv.gz')
     True
+    >>> is_compressed_source('data/COVIDiSTRESS June 17.csv')
+    False
     """
-    data_start = [
-        # Initialize age
-        {age: (0, 0.0) for age in constants.DEM_AGE + ['NA']},
-        # Initialize gender
-        {gender: (0, 0.0) for gender in constants.DEM_GENDER + ['NA']},
-        # Initialize education
-        {edu: (0, 0.0) for edu in constants.DEM_EDU + ['NA']},
-        # Initialize employment status
-        {employment: (0, 0.0) for employment in constants.DEM_EMPLOYMENT + ['NA']},
-        # Initialize country of residence
-        {country: (0, 0.0) for country in constants.COUNTRIES + ['NA']},
-        # Initialize whether they are an expatriate
-        {expat: (0, 0.0) for expat in constants.EXPAT + ['NA']},
-        # Initialize marital status
-        {marital_status: (0, 0.0) for marital_status in constants.DEM_MARITAL_STATUS + ['NA']},
-        # Initialize whether they reside in a high risk group
-        {risk_group: (0, 0.0) for risk_group in constants.RISK_GROUP + ['NA']},
-        # Initialize isolation status
-        {isolation: (0, 0.0) for isolation in constants.DEM_ISOLATION + ['NA']},
-        # Initialize adults isolated with participant
-        {iso_adults: (0, 0.0) for iso_adults in constants.DEM_ISOLATION_PEOPLE + ['NA']},
-        # Initialize children isolated with participant
-        {iso_kids: (0, 0.0) for iso_kids in constants.DEM_ISOLATION_PEOPLE + ['NA']}
-    ]
-
-    return data_start
-
-
-def _calc_stress_score(person: List[str]) -> float:
-    """Return stress score from a row of the dataset
-
-    Preconditions:
-      - len(person) > 144
-    """
-    # Value added for each response in the survey
-    # Depending on the nature of the question we may want to reduce or increase the stress score
-    stress_method = [
-        # Scale_PSS10_UCLA
-        1, 1, 1, -1, -1, 1, -1, -1, 1, 1,
-        1, 1, 1,
-        # OECD_people
-        -1, -1,
-        # OECD_institutions
-        -1, -1, -1, -1, -1, -1,
-        # Corona_concerns
-        1, 1, 1, 1, 1,
-        # Trust_countrymeasure
-        -1,
-        # Compliance
-        -1, 0, 0, 1, -1, 1,
-        # BFF_15
-        1, 1, -1, 0, 0, 0, 0, 0, 0, 0, 1, 0, -1, 0, 0,
-        # Expl_Distress
-        1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1,
-        # SPS
-        -1, -1, -1, -1, -1, -1, -1, -1, -1, -1,
-        -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1,
-        1, 1, 1, 1, 1, -1
-    ]
-
-    # Tuple Consists of:
-    # First element is the scale that all the questions in a category are measured upon
-    # Second element is number of questions within the same category
-    category_tuples = [(5, 10), (5, 3), (11, 2), (11, 6), (6, 5), (11, 1),
-                       (6, 6), (6, 15), (6, 25), (6, 10), (6, 15), (6, 6)]
-    # List of values from dataset of survey used for calculations
-    answer_values = person[21:54] + person[70:109] + person[110:136] + person[137:144]
-    # ACCUMULATOR stress_so_far: running sum of stress score
-    stress_so_far = 0.0
-    # ACCUMULATOR absolute_index: running index to offset the for loop scaling
-    absolute_index = 0
-
-    for scale_tuple in category_tuples:
-        for _ in range(scale_tuple[1]):
-            og_answer = answer_values[absolute_index]
-            if og_answer != 'NA' and int(og_answer) <= scale_tuple[0]:
-                bounded_answer = ((int(og_answer) - 1) * (4 / (scale_tuple[0] - 1)))
-                stress_so_far += bounded_answer * stress_method[absolute_index]
-            absolute_index += 1
-    return stress_so_far
+    return file_name.endswith(_COMPRESSED_EXTENSIONS)
+
 
+def _open_csv_stream(file_name: str, file_encoding: str) -> io.TextIOWrapper:
+    """Return the csv file opened as text. If it is compressed in a .zip, .gz or .xz file, it is
+    decompressed and decoded as a stream while it is read, _STREAM_BUFFER_SIZE bytes at a time,
+    so the decompressed csv file is never written to disk. A .zip file is read from the first csv
+    file in it.
 
-def _add_age_to_dict(age: int, stress_score: float,
-                     data: List[Dict[str, Tuple[int, float]]]) -> None:
-    """Add the age to the corresponding key in the dictionary
+    Raise ValueError if a .zip file has no csv file in it.
 
     Preconditions:
-      - 18 <= age <= 110
-      - len(data[0]) == len(constants.DEM_AGE)
-      - all(key in constants.DEM_AGE for key in data[0])
+      - os.path.isfile(file_name)
+
+    >>> import tempfile
+    >>> with tempfile.TemporaryDirectory() as directory:
+    ...     with gzip.open(os.path.join(directory, 'sample.csv.gz'), 'wt') as compressed_file:
+    ...         _ = compressed_file.write('a,b\\n1,2\\n')
+    ...     with _open_csv_stream(os.path.join(directory, 'sample.csv.gz'), 'UTF-8') as file:
+    ...         list(csv.reader(file))
+    [['a', 'b'], ['1', '2']]
+    """
+    if file_name.endswith('.zip'):
+        with zipfile.ZipFile(file_name) as archive:
+            csv_names = [name for name in archive.namelist() if name.endswith('.csv')]
+            if not csv_names:
+                raise ValueError(f'There is no csv file in {file_name}')
+            binary_file = archive.open(csv_names[0])
+    elif file_name.endswith('.gz'):
+        binary_file = gzip.open(file_name, 'rb')
+    elif file_name.endswith('.xz'):
+        binary_file = lzma.open(file_name, 'rb')
+    else:
+        return open(file_name, encoding=file_encoding, newline='')
+
+    return io.TextIOWrapper(io.BufferedReader(binary_file, _STREAM_BUFFER_SIZE),
+                            encoding=file_encoding, newline='')
+
+
+def _find_columns(header: List[str], answer_column_names: List[str]) -> \
+        Tuple[List[int], List[int]]:
+    """Return the indices of the identity columns and of the given answer columns, found by their
+    names in the header of the dataset.
+
+    Raise ValueError if any of the columns is missing.
+
+    >>> header = ['', 'Dem_age', 'Scale_SLON_2'] + _IDENTITY_COLUMN_NAMES[1:] + _ANSWER_COLUMN_NAMES
+    >>> columns = _find_columns(header, _ANSWER_COLUMN_NAMES)
+    >>> columns[0][:2], columns[1][:2]
+    ([1, 3], [13, 14])
     """
-    key = constants.DEM_AGE[(age - 15) // 10] if age < 65 else '65+'
-    data[0][key] = (data[0][key][0] + 1, data[0][key][1] + stress_score)
+    missing_columns = [name for name in _IDENTITY_COLUMN_NAMES + answer_column_names
+                       if name not in header]
+    if missing_columns:
+        raise ValueError(f'The dataset is missing the columns {missing_columns}')
+
+    return [header.index(name) for name in _IDENTITY_COLUMN_NAMES], \
+        [header.index(name) for name in answer_column_names]
 
 
-def _add_isolation_to_dict(isolation_people: str, dict_index: int, stress_score: float,
-                           data: List[Dict[str, Tuple[int, float]]]) -> None:
-    """Adds the isolation adults / kids to the corresponding key in the dictionary
+def _read_blocks(rows: Iterable[List[str]], columns: Tuple[List[int], List[int]]) -> \
+        Iterator[Tuple[List[Tuple[str, ...]], List[str]]]:
+    """Return an iterator of the blocks of at most _SCORE_BLOCK_SIZE consecutive rows, which
+    together hold every row of the dataset.
+
+    Only the columns found by _find_columns are kept: a block is the list of the identities of
+    every row, and the list of the answers of every row joined by commas. The other fields of a row
+    are dropped as soon as it is read, instead of being kept until the block is processed.
+    """
+    get_identities, get_answers = itemgetter(*columns[0]), itemgetter(*columns[1])
+    # ACCUMULATOR identities, answers: the rows read since the last block was returned
+    identities, answers = [], []
+    for row in rows:
+        identities.append(get_identities(row))
+        answers.append(','.join(get_answers(row)))
+        if len(identities) == _SCORE_BLOCK_SIZE:
+            yield identities, answers
+            identities, answers = [], []
+    if identities:
+        yield identities, answers
+
+
+def _score_block(answers: List[str], vectorized: bool, plan: ScoringPlan) -> np.ndarray:
+    """Return the scores of every instrument of the plan for a block of rows of the dataset, given
+    the answers of every row joined by commas, with one column for every instrument.
+
+    If vectorized is True, the block is scored at once by _score_answer_block, otherwise every row
+    is scored by _calc_stress_score.
 
     Preconditions:
-      - 0 <= isolation_people <= 110
-      - dict_index in {9, 10}
-      - all(key in constants.DEM_ISOLATION_PEOPLE for key in data[dict_index])
+      - answers != []
     """
-    category = data[dict_index]
-    if isolation_people == 'NA':
-        category['NA'] = (category['NA'][0] + 1, category['NA'][1] + stress_score)
+    if vectorized:
+        return _score_answer_block(answers, plan)
     else:
-        num_dependents = int(isolation_people)
-        key = str(num_dependents) if num_dependents < 10 else \
-            constants.DEM_ISOLATION_PEOPLE[(num_dependents - 11) // 10 + 11]
-        category[key] = (category[key][0] + 1, category[key][1] + stress_score)
+        return np.array([[_calc_stress_score(row_answers.split(','), items) for items in plan.items]
+                         for row_answers in answers])
+
 
+def _split_csv_file(file_name: str, shard_count: int, start: int = 0,
+                    end: Union[int, None] = None) -> List[Tuple[int, int]]:
+    """Return the byte ranges (start, end) of at most shard_count shards of similar sizes, which
+    together cover every record of the csv file after the header, or after the byte offset start
+    if it is not 0, and before the byte offset end, or the end of the file if end is None.
 
-def _add_country_to_dict(country: str, stress_score: float,
-                         data: List[Dict[str, Tuple[int, float]]]) -> None:
-    """Adds the country to the corresponding key in the dictionary
+    Every shard starts and ends on the boundary of a record, so a quoted field that spans multiple
+    lines (e.g. Final_open) is never split. A newline is a boundary only if an even number of
+    quotes comes before it, as an escaped quote inside a quoted field is written as two quotes.
 
     Preconditions:
-      - all(key in constants.COUNTRIES for key in data[4])
+      - os.path.isfile(file_name)
+      - shard_count >= 1
+      - start == 0 or start is the byte offset of the boundary of a record in the file
+      - end is None or end is the byte offset of the boundary of a record in the file
     """
-    category = data[4]
-    if country == {'China', 'Taiwan'}:
-        value = category['China']
-        category['China'] = (value[0] + 1, value[1] + stress_score)
-    elif country == 'Côte dIvoire':  # '' is displayed correctly, don't worry
-        value = category['Côte d’Ivoire']
-        category['Côte d’Ivoire'] = (value[0] + 1, value[1] + stress_score)
+    file_size = os.path.getsize(file_name) if end is None else end
+    if start == 0:
+        # The first target finds the end of the header
+        targets = [file_size * i // shard_count for i in range(shard_count)]
+        # ACCUMULATOR boundaries: the record boundaries found so far
+        boundaries = []
     else:
-        if country in category:
-            value = category[country]
-            category[country] = (value[0] + 1, value[1] + stress_score)
+        targets = [start + (file_size - start) * i // shard_count for i in range(1, shard_count)]
+        boundaries = [start]
+    # ACCUMULATOR quote_parity: the parity of the number of quotes before the current chunk
+    quote_parity = 0
+    # ACCUMULATOR position: the offset of the current chunk in the file
+    position = start
+
+    with open(file_name, 'rb') as file:
+        file.seek(start)
+        chunk = file.read(_SHARD_SCAN_CHUNK_SIZE)
+        while chunk and targets:
+            # ACCUMULATOR parity: the parity of the number of quotes before index
+            index, parity = 0, quote_parity
+            while targets:
+                # Skip to the next target, as there cannot be a boundary before it
+                skip_to = min(max(targets[0] - position, index), len(chunk))
+                parity = parity + chunk.count(b'"', index, skip_to)
+                newline = chunk.find(b'\n', skip_to)
+                if newline == -1:
+                    break
+                parity = parity + chunk.count(b'"', skip_to, newline)
+                index = newline + 1
+                if parity % 2 == 0:
+                    boundaries.append(position + index)
+                    targets = [target for target in targets if target >= position + index]
+
+            quote_parity = (quote_parity + chunk.count(b'"')) % 2
+            position = position + len(chunk)
+            chunk = file.read(_SHARD_SCAN_CHUNK_SIZE)
+
+    boundaries.append(file_size)
+    return [(boundaries[i], boundaries[i + 1]) for i in range(len(boundaries) - 1)
+            if boundaries[i] < boundaries[i + 1]]
+
+
+def _read_csv_shard(file_name: str, file_encoding: str, start: int, end: int,
+                    columns: Tuple[List[int], List[int]], vectorized: bool,
+                    plan: ScoringPlan) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the codes of the identities and the scores of every instrument of the plan of every
+    record in the given byte range of the csv file. This is the task run by every worker process
+    when reading in parallel.
 
+    Preconditions:
+      - os.path.isfile(file_name)
+      - 0 < start < end <= os.path.getsize(file_name)
+    """
+    with open(file_name, 'rb') as file:
+        file.seek(start)
+        text = file.read(end - start).decode(file_encoding)
+
+    blocks = list(_read_blocks(csv.reader(io.StringIO(text)), columns))
+    if not blocks:
+        return np.empty((0, constants.NUMBER_OF_IDENTITIES), dtype=np.int16), \
+            np.empty((0, len(plan.names)))
+
+    return np.concatenate([_encode_identities(block[0]) for block in blocks]), \
+        np.concatenate([_score_block(block[1], vectorized, plan) for block in blocks])
+
+
+def _split_shards_into_blocks(shard_results: Iterable[Tuple[np.ndarray, np.ndarray]]) -> \
+        Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """Return the codes and the scores of the records of the shards, in the order of the shards,
+    split into the same blocks of _SCORE_BLOCK_SIZE records as when the records are read in a
+    single process, so the quantile sketches are updated identically.
+
+    >>> shards = [(np.zeros((3000, 1)), np.zeros(3000)), (np.ones((2000, 1)), np.ones(2000))]
+    >>> [(len(block[0]), int(block[1].sum())) for block in _split_shards_into_blocks(shards)]
+    [(4096, 1096), (904, 904)]
+    """
+    # ACCUMULATOR pending: the codes and the scores of the records not yet in a block
+    pending_codes, pending_scores = [], []
+    for codes, stress_scores in shard_results:
+        pending_codes.append(codes)
+        pending_scores.append(stress_scores)
+        if sum(len(block) for block in pending_codes) >= _SCORE_BLOCK_SIZE:
+            codes, stress_scores = np.concatenate(pending_codes), np.concatenate(pending_scores)
+            full_length = len(codes) // _SCORE_BLOCK_SIZE * _SCORE_BLOCK_SIZE
+            for start in range(0, full_length, _SCORE_BLOCK_SIZE):
+                yield codes[start:start + _SCORE_BLOCK_SIZE], \
+                    stress_scores[start:start + _SCORE_BLOCK_SIZE]
+            pending_codes, pending_scores = [codes[full_length:]], [stress_scores[full_length:]]
+
+    if sum(len(block) for block in pending_codes) > 0:
+        yield np.concatenate(pending_codes), np.concatenate(pending_scores)
+
+
+def _encode_identities(identities: List[Tuple[str, ...]]) -> np.ndarray:
+    """Return the matrix of the codes of the identities of every row in a block of the dataset,
+    with one row for every row of the block and one column for every identity group.
+
+    Preconditions:
+      - all(len(row) == constants.NUMBER_OF_IDENTITIES for row in identities)
+
+    >>> block = [('33', 'Female', 'None', 'Student', 'Côte dIvoire', 'yes', \
+                  'Other or would rather not say', 'Yes', 'Isolated', '2', 'NA'), \
+                 ('70', 'NA', 'Some', 'NA', 'Atlantis', 'NA', 'Single', 'No', 'NA', '15', '0')]
+    >>> for codes in _encode_identities(block):
+    ...     print([_decode_identity(code) for code in codes])
+    ['25-34', 'Female', 'None', 'Student', 'Côte d’Ivoire', 'Yes', 'Other/would rather not say', \
+'Yes', 'Isolated', '2', 'NA']
+    ['65+', 'NA', None, 'NA', None, None, 'Single', 'No', 'NA', '11-20', '0']
+    """
+    codes = np.empty((len(identities), constants.NUMBER_OF_IDENTITIES), dtype=np.int16)
+    for i in range(constants.NUMBER_OF_IDENTITIES):
+        code_table = _IDENTITY_CODE_TABLES[i]
+        column_codes = [code_table.get(row[i], -1) for row in identities]
+        if -1 in column_codes:
+            column_codes = [_encode_unlisted_identity(i, identities[j][i])
+                            if column_codes[j] == -1 else column_codes[j]
+                            for j in range(len(identities))]
+        codes[:, i] = column_codes
+    return codes
+
+
+def _add_block_to_data(codes: np.ndarray, stress_scores: np.ndarray,
+                       data: Tuple[Any, ...]) -> None:
+    """Add the stress score of every row in a block of the dataset to every identity the row
+    belongs to, and to every pair of identities from two different identity groups the row belongs
+    to if the data counts the pairs, given the codes of the identities of the rows. The codes and
+    the scores of the rows are also kept, the scores as float32, and added to the quantile sketches
+    if the data has them.
+
+    The scores are added in the order of the rows, so the totals are identical to adding the rows
+    one at a time.
 
-def _add_expat_to_dict(expat: str, stress_score: float,
-                       data: List[Dict[str, Tuple[int, float]]]) -> None:
-    """Adds the expatriation status to the corresponding key in the dictionary
+    Preconditions:
+      - codes.shape == (len(stress_scores), constants.NUMBER_OF_IDENTITIES)
+    """
+    populations, scores, squared_scores, pair_populations, pair_scores = data[:5]
+    if data[5] is not None:
+        data[5].append(np.array(codes, dtype=np.int16))
+        data[6].append(stress_scores.astype(np.float32))
+    stress_scores_squared = stress_scores * stress_scores
+    for i in range(codes.shape[1]):
+        populations += np.bincount(codes[:, i], minlength=len(populations))
+        np.add.at(scores, codes[:, i], stress_scores)
+        np.add.at(squared_scores, codes[:, i], stress_scores_squared)
+
+    if pair_populations is not None:
+        pair_codes = codes[:, _PAIR_FIRSTS].astype(np.int64) * (_UNRECOGNIZED_CODE + 1) + \
+            codes[:, _PAIR_SECONDS]
+        pair_populations += np.bincount(pair_codes.ravel(), minlength=len(pair_populations))
+        np.add.at(pair_scores, pair_codes.ravel(), np.repeat(stress_scores, len(PAIR_GROUPS)))
+
+    if data[7] is not None:
+        _add_block_to_sketches(codes, stress_scores, data[7])
+
+
+def _add_block_to_sketches(codes: np.ndarray, stress_scores: np.ndarray,
+                           sketches: List[QuantileSketch]) -> None:
+    """Add the stress score of every row in a block of the dataset to the quantile sketch of
+    every identity the row belongs to, and to the sketch of the whole population, which is the last
+    one. The scores of every identity are added in the order of the rows.
 
     Preconditions:
-      - all(key in constants.EXPAT for key in data[5])
+      - codes.shape == (len(stress_scores), constants.NUMBER_OF_IDENTITIES)
+      - len(sketches) == _UNRECOGNIZED_CODE + 2
     """
-    category = data[5]
-    if expat == 'yes':
-        value = category['Yes']
-        category['Yes'] = (value[0] + 1, value[1] + stress_score)
-    elif expat == 'no':
-        value = category['No']
-        category['No'] = (value[0] + 1, value[1] + stress_score)
+    sketches[-1].update(stress_scores)
+    for i in range(codes.shape[1]):
+        order = np.argsort(codes[:, i], kind='stable')
+        sorted_codes = codes[order, i]
+        boundaries = np.flatnonzero(sorted_codes[1:] != sorted_codes[:-1]) + 1
+        for group in np.split(order, boundaries):
+            if len(group) > 0:
+                sketches[codes[group[0], i]].update(stress_scores[group])
 
 
-def _add_marital_to_dict(marital_status: str, stress_score: float,
-                         data: List[Dict[str, Tuple[int, float]]]) -> None:
-    """Adds the marital status to the corresponding key in the dictionary
+def _add_scores_to_data(codes: np.ndarray, stress_scores: np.ndarray,
+                        data: List[Tuple[Any, ...]]) -> None:
+    """Add a block of rows of the dataset to the arrays of every instrument, given the scores of
+    the rows with one column for every instrument. See _add_block_to_data.
 
     Preconditions:
-      - all(key in constants.DEM_MARITAL_STATUS for key in data[6])
+      - stress_scores.shape == (len(codes), len(data))
     """
-    category = data[6]
-    if marital_status == 'Other or would rather not say':
-        value = category['Other/would rather not say']
-        category['Other/would rather not say'] = (value[0] + 1, value[1] + stress_score)
+    for i in range(len(data)):
+        _add_block_to_data(codes, stress_scores[:, i], data[i])
+
+
+def _get_ingest_state_file_name(output_file_name: str) -> str:
+    """Return the name of the file storing the state of incremental processing for the given
+    processed data file.
+
+    >>> _get_ingest_state_file_name('data/real_data.json')
+    'data/real_data_state.json'
+    """
+    return os.path.splitext(output_file_name)[0] + '_state.json'
+
+
+def _load_ingest_state(file_name: str) -> Union[Dict[str, Any], None]:
+    """Return the state of incremental processing stored in the given file, or None if there is
+    no usable state.
+    """
+    if not os.path.isfile(file_name):
+        return None
+
+    with open(file_name, 'r', encoding='UTF-8') as state_file:
+        state = json.load(state_file)
+    if state.get('version') != _INGEST_STATE_VERSION:
+        return None
+
+    state['data'] = [(np.array(data[0], dtype=np.int64), np.array(data[1], dtype=np.float64),
+                      np.array(data[2], dtype=np.float64),
+                      None if data[3] is None else np.array(data[3], dtype=np.int64),
+                      None if data[4] is None else np.array(data[4], dtype=np.float64),
+                      None if data[5] is None else
+                      [_decode_state_array(data[5], '<i2').reshape(-1,
+                                                                   constants.NUMBER_OF_IDENTITIES)],
+                      None if data[6] is None else [_decode_state_array(data[6], '<f4')],
+                      _decode_state_sketches(data[7])) for data in state['data']]
+    return state
+
+
+def _save_ingest_state(file_name: str, state: Dict[str, Any]) -> None:
+    """Store the state of incremental processing in the given file"""
+    _write_file_atomically(file_name, json.dumps(state))
+
+
+def _encode_state_array(blocks: List[np.ndarray], dtype: str) -> str:
+    """Return the blocks of an array joined together, as base64 text of their bytes in the given
+    dtype, to be stored compactly in the state of incremental processing.
+
+    >>> _decode_state_array(_encode_state_array([np.array([1.5]), np.array([-2.0])], '<f4'), '<f4')
+    array([ 1.5, -2. ], dtype=float32)
+    """
+    if not blocks:
+        return ''
+    return base64.b64encode(np.concatenate(blocks).astype(dtype).tobytes()).decode('ascii')
+
+
+def _decode_state_array(text: str, dtype: str) -> np.ndarray:
+    """Return the array encoded by _encode_state_array"""
+    return np.frombuffer(base64.b64decode(text), dtype=dtype).copy()
+
+
+def _encode_state_sketches(sketches: Union[List[QuantileSketch], None]) -> \
+        Union[List[str], None]:
+    """Return the quantile sketches as base64 text of their bytes, to be stored in the state of
+    incremental processing, or None if there are no sketches.
+
+    >>> sketch = QuantileSketch(20)
+    >>> sketch.update(np.array([1.0, 3.0]))
+    >>> _decode_state_sketches(_encode_state_sketches([sketch]))[0].quantile(1.0)
+    3.0
+    """
+    if sketches is None:
+        return None
+    return [base64.b64encode(sketch.to_bytes()).decode('ascii') for sketch in sketches]
+
+
+def _decode_state_sketches(texts: Union[List[str], None]) -> Union[List[QuantileSketch], None]:
+    """Return the quantile sketches encoded by _encode_state_sketches"""
+    if texts is None:
+        return None
+    return [QuantileSketch.from_bytes(base64.b64decode(text))[0] for text in texts]
+
+
+def _is_unchanged_prefix(file_name: str, block_hashes: List[str], length: int,
+                         file_hash: str) -> bool:
+    """Return whether the first length bytes of the file still have the chained hash file_hash,
+    given the chained hashes block_hashes of the blocks of the whole file as it is now, see
+    _hash_file_blocks.
+
+    The whole prefix is checked, as the hash of every block before the last block of the prefix
+    is in block_hashes. Only that last block is hashed again, as it may end inside a block of the
+    file as it is now.
+
+    >>> import tempfile
+    >>> with tempfile.TemporaryDirectory() as directory:
+    ...     file_name = os.path.join(directory, 'sample.bin')
+    ...     with open(file_name, 'wb') as file:
+    ...         _ = file.write(bytes(_HASH_BLOCK_SIZE + 10))
+    ...     prefix_hash = _hash_file_prefix(file_name, _HASH_BLOCK_SIZE + 5)
+    ...     with open(file_name, 'ab') as file:
+    ...         _ = file.write(bytes(_HASH_BLOCK_SIZE))
+    ...     appended = _is_unchanged_prefix(file_name, \
+                                        _hash_file_blocks(file_name, os.path.getsize(file_name)), \
+                                        _HASH_BLOCK_SIZE + 5, prefix_hash)
+    ...     with open(file_name, 'r+b') as file:
+    ...         _ = file.write(b'edited')
+    ...     edited = _is_unchanged_prefix(file_name, \
+                                      _hash_file_blocks(file_name, os.path.getsize(file_name)), \
+                                      _HASH_BLOCK_SIZE + 5, prefix_hash)
+    >>> appended, edited
+    (True, False)
+    """
+    if not 0 < length <= os.path.getsize(file_name):
+        return False
+    start = _get_last_block_start(length)
+    return _hash_file_blocks(file_name, length, start,
+                             block_hashes[start // _HASH_BLOCK_SIZE])[-1] == file_hash
+
+
+def _hash_file_prefix(file_name: str, length: int) -> str:
+    """Return the chained hash of the first length bytes of the file, see _hash_file_blocks
+
+    Preconditions:
+      - 0 <= length <= os.path.getsize(file_name)
+    """
+    return _hash_file_blocks(file_name, length)[-1]
+
+
+def _hash_file_blocks(file_name: str, end: int, start: int = 0,
+                      start_hash: str = '') -> List[str]:
+    """Return the chained hashes of the first start, start + _HASH_BLOCK_SIZE,
+    start + 2 * _HASH_BLOCK_SIZE, ... bytes of the file, up to the chained hash of its first end
+    bytes, given the chained hash start_hash of its first start bytes.
+
+    The bytes are split into blocks of _HASH_BLOCK_SIZE bytes, and the chained hash of the bytes up
+    to the end of a block is the hexadecimal BLAKE2 hash of the chained hash of the bytes before
+    the block followed by the block. So the hash of every block depends on every byte before it,
+    and the hash of a prefix of the file continues from the hash of the blocks before its last
+    block.
+
+    Preconditions:
+      - 0 <= start <= end <= os.path.getsize(file_name)
+      - start % _HASH_BLOCK_SIZE == 0
+      - start_hash is the chained hash of the first start bytes of the file
+
+    >>> import tempfile
+    >>> with tempfile.TemporaryDirectory() as directory:
+    ...     file_name = os.path.join(directory, 'sample.bin')
+    ...     with open(file_name, 'wb') as file:
+    ...         _ = file.write(bytes(range(256)) * (_HASH_BLOCK_SIZE // 128))
+    ...     whole = _hash_file_blocks(file_name, 2 * _HASH_BLOCK_SIZE)
+    ...     continued = _hash_file_blocks(file_name, 2 * _HASH_BLOCK_SIZE, _HASH_BLOCK_SIZE, \
+                                          whole[1])
+    >>> len(whole), whole[0], continued == whole[1:]
+    (3, '', True)
+    """
+    # ACCUMULATOR block_hashes: the chained hashes of the bytes up to the end of every block
+    # hashed so far
+    block_hashes = [start_hash]
+    with open(file_name, 'rb') as file:
+        file.seek(start)
+        for position in range(start, end, _HASH_BLOCK_SIZE):
+            block = file.read(min(_HASH_BLOCK_SIZE, end - position))
+            block_hashes.append(hashlib.blake2b(bytes.fromhex(block_hashes[-1]) +
+                                                block).hexdigest())
+    return block_hashes
+
+
+def _get_last_block_start(length: int) -> int:
+    """Return the byte offset of the last block of the chained hash of the first length bytes of a
+    file, see _hash_file_blocks.
+
+    >>> _get_last_block_start(_HASH_BLOCK_SIZE), _get_last_block_start(_HASH_BLOCK_SIZE + 1)
+    (0, 1048576)
+    >>> _get_last_block_start(0)
+    0
+    """
+    return max(0, (length - 1) // _HASH_BLOCK_SIZE * _HASH_BLOCK_SIZE)
+
+
+def _initialize_data_arrays(sketch_size: int = 0, pairs: bool = False,
+                            respondents: bool = False) -> Tuple[Any, ...]:
+    """Return initialized values: the population, total score and total squared score of every
+    identity, the population and total score of every pair of identities, where the pair of codes
+    first and second is at first * (_UNRECOGNIZED_CODE + 1) + second, the lists of the blocks
+    of the codes and the scores of the respondents, and the quantile sketches of the scores.
+
+    The pairs of identities are only counted if pairs is True, for the identity cube. Otherwise,
+    their arrays are None.
+
+    The codes and scores of the respondents are only kept if respondents is True, for the score
+    distribution and the bootstrap confidence intervals, since they grow with the dataset.
+    Otherwise, their lists are None.
+
+    If sketch_size is positive, there is a quantile sketch of that size for every code, followed by
+    one for the whole population. Otherwise, no sketches are kept and the last value is None.
+
+    >>> initial = _initialize_data_arrays()
+    >>> all(len(array) == _UNRECOGNIZED_CODE + 1 and not array.any() for array in initial[:3])
+    True
+    >>> initial[3:]
+    (None, None, None, None, None)
+    >>> all(len(array) == (_UNRECOGNIZED_CODE + 1) ** 2 and not array.any() \
+            for array in _initialize_data_arrays(pairs=True)[3:5])
+    True
+    >>> _initialize_data_arrays(respondents=True)[5:7]
+    ([], [])
+    >>> len(_initialize_data_arrays(50)[7]) == _UNRECOGNIZED_CODE + 2
+    True
+    """
+    if sketch_size > 0:
+        sketches = [QuantileSketch(sketch_size) for _ in range(_UNRECOGNIZED_CODE + 2)]
+    else:
+        sketches = None
+    if pairs:
+        pair_populations = np.zeros((_UNRECOGNIZED_CODE + 1) ** 2, dtype=np.int64)
+        pair_scores = np.zeros((_UNRECOGNIZED_CODE + 1) ** 2)
+    else:
+        pair_populations, pair_scores = None, None
+    respondent_codes, respondent_scores = ([], []) if respondents else (None, None)
+    return np.zeros(_UNRECOGNIZED_CODE + 1, dtype=np.int64), \
+        np.zeros(_UNRECOGNIZED_CODE + 1), np.zeros(_UNRECOGNIZED_CODE + 1), \
+        pair_populations, pair_scores, respondent_codes, respondent_scores, sketches
+
+
+def _get_age_identity(age: int) -> str:
+    """Return the age range of the given age
+
+    Preconditions:
+      - 18 <= age <= 110
+
+    >>> _get_age_identity(33)
+    '25-34'
+    """
+    return constants.DEM_AGE[(age - 15) // 10] if age < 65 else '65+'
+
+
+def _get_isolation_identity(isolation_people: str) -> str:
+    """Return the range of the given number of adults / kids in isolation, or NA
+
+    Preconditions:
+      - isolation_people == 'NA' or 0 <= int(isolation_people) <= 110
+
+    >>> _get_isolation_identity('15')
+    '11-20'
+    """
+    if isolation_people == 'NA':
+        return 'NA'
+    num_dependents = int(isolation_people)
+    return str(num_dependents) if num_dependents < 10 else \
+        constants.DEM_ISOLATION_PEOPLE[(num_dependents - 11) // 10 + 11]
+
+
+def _get_identity_code(id_index: int, identity: str) -> int:
+    """Return the code of the identity (or NA) in the identity group with the given index
+
+    >>> _get_identity_code(1, 'Female')
+    8
+    """
+    options = constants.IDENTITY_GROUP_OPTIONS_LIST[id_index]
+    if identity == 'NA':
+        return _GROUP_OFFSETS[id_index] + len(options)
+    else:
+        return _GROUP_OFFSETS[id_index] + options.index(identity)
+
+
+def _decode_identity(code: int) -> Union[str, None]:
+    """Return the identity (or NA) with the given code, or None if the code is for unrecognized
+    identities.
+
+    >>> _decode_identity(8)
+    'Female'
+    """
+    for i in range(constants.NUMBER_OF_IDENTITIES):
+        if _GROUP_OFFSETS[i] <= code <= _GROUP_OFFSETS[i] + _GROUP_SIZES[i]:
+            return (constants.IDENTITY_GROUP_OPTIONS_LIST[i] + ['NA'])[code - _GROUP_OFFSETS[i]]
+    return None
+
+
+def _build_identity_code_tables() -> List[Dict[str, int]]:
+    """Return the lookup tables mapping the values in the csv file to the codes of the
+    identities, one for every identity group.
+
+    Values that are missing from a table are encoded by _encode_unlisted_identity.
+    """
+    tables = [{identity: _get_identity_code(i, identity)
+               for identity in constants.IDENTITY_GROUP_OPTIONS_LIST[i] + ['NA']}
+              for i in range(constants.NUMBER_OF_IDENTITIES)]
+
+    # change from numerical to category
+    tables[0] = {str(age): _get_identity_code(0, _get_age_identity(age)) for age in range(111)}
+    for i in [9, 10]:
+        tables[i] = {str(people): _get_identity_code(i, _get_isolation_identity(str(people)))
+                     for people in range(111)}
+        tables[i]['NA'] = _get_identity_code(i, 'NA')
+    # countries - some countries are not displayed correctly
+    tables[4]['Côte dIvoire'] = _get_identity_code(4, 'Côte d’Ivoire')
+    # expat - csv file uses lower case, and NA is not counted
+    tables[5] = {'yes': _get_identity_code(5, 'Yes'), 'no': _get_identity_code(5, 'No')}
+    # marital - csv file uses ' or ' instead of '/'
+    tables[6]['Other or would rather not say'] = _get_identity_code(6, 'Other/would rather not say')
+
+    return tables
+
+
+# The lookup tables mapping the values in the csv file to the codes of the identities
+_IDENTITY_CODE_TABLES = _build_identity_code_tables()
+
+
+def _encode_unlisted_identity(id_index: int, value: str) -> int:
+    """Return the code of a value in the csv file that is missing from the lookup table of the
+    identity group with the given index.
+
+    Numerical values that are out of the range of the table are converted to their categories, and
+    other values are unrecognized.
+
+    >>> _encode_unlisted_identity(0, '111') == _get_identity_code(0, '65+')
+    True
+    >>> _encode_unlisted_identity(4, 'Atlantis') == _UNRECOGNIZED_CODE
+    True
+    """
+    if id_index == 0:
+        return _get_identity_code(0, _get_age_identity(int(value)))
+    elif id_index in {9, 10}:
+        return _get_identity_code(id_index, _get_isolation_identity(value))
     else:
-        if marital_status in category:
-            value = category[marital_status]
-            category[marital_status] = (value[0] + 1, value[1] + stress_score)
+        return _UNRECOGNIZED_CODE
 
 
-def _regulate_na(data: List[Dict[str, Tuple[int, float]]]) -> List[Dict[str, Tuple[int, float]]]:
-    """Add the score and population for NA to all other identities in the identity group
+def _calc_stress_score(answer_values: List[str], items: List[Tuple[int, int, float]]) -> float:
+    """Return the score of an instrument from the answers of a row of the dataset, given the items
+    of the instrument as in ScoringPlan.items.
 
     Preconditions:
-      - all(list(id_group.keys())[-1] == 'NA' for id_group in data)
+      - all(item[0] < len(answer_values) for item in items)
+
+    >>> _calc_stress_score(['3', 'NA', '9'], [(0, 5, 1), (1, 5, 1), (2, 5, -1), (0, 11, -1)])
+    1.2
+    """
+    # ACCUMULATOR stress_so_far: running sum of stress score
+    stress_so_far = 0.0
 
-    >>> sample_data = [{'id1': (10, 5), 'id2': (14, 29), 'NA': (3, 15)}]
-    >>> expected_data = [{'id1': (13, 20), 'id2': (17, 44)}]
-    >>> _regulate_na(sample_data) == expected_data
+    for answer_index, scale, weight in items:
+        og_answer = answer_values[answer_index]
+        if og_answer != 'NA' and int(og_answer) <= scale:
+            bounded_answer = ((int(og_answer) - 1) * (4 / (scale - 1)))
+            stress_so_far += bounded_answer * weight
+    return stress_so_far
+
+
+def _score_answer_block(answers: List[str], plan: ScoringPlan) -> np.ndarray:
+    """Return the scores of every instrument of the plan for a block of rows of the dataset,
+    calculated at once, given the answers of every row joined by commas.
+
+    The answers are parsed into an integer matrix with the NA answers masked out, then the whole
+    block is bounded and weighted in one matrix operation. The weighted answers of each row are
+    summed in the same order as _calc_stress_score does, so the scores are identical to it.
+
+    Preconditions:
+      - answers != []
+      - all(len(row_answers.split(',')) == len(plan.column_names) for row_answers in answers)
+
+    >>> from random import Random
+    >>> random = Random(110)
+    >>> answers = [','.join(random.choice(['NA', '1', '3', '6', '11', '99']) \
+                            for _ in range(len(_ANSWER_COLUMN_NAMES))) for _ in range(50)]
+    >>> plan = compile_instruments(INSTRUMENTS)
+    >>> scores = [[_calc_stress_score(row_answers.split(','), items) for items in plan.items] \
+                  for row_answers in answers]
+    >>> _score_answer_block(answers, plan).tolist() == scores
     True
     """
-    regulated_data = []
+    answer_matrix = _parse_answer_block(answers, len(plan.column_names))
+    return _score_answer_matrix(answer_matrix, answer_matrix == _NA_ANSWER, plan)
 
-    for i in range(len(data)):
-        regulated_data.append({})
-        na_population, na_score = data[i]['NA']
-        if na_score != 0.0:
-            identity_list = list(data[i].keys())[:-1]  # pop 'NA'
-            for identity in identity_list:
-                regulated_data[i][identity] = (data[i][identity][0] + na_population,
-                                               data[i][identity][1] + na_score)
-        else:
-            regulated_data[i] = {k: data[i][k] for k in list(data[i])[:-1]}  # ignore NA
 
-    return regulated_data
+def _parse_answer_block(answers: List[str], column_count: int) -> np.ndarray:
+    """Return the integer matrix of the answers of a block of rows of the dataset, given the
+    answers of every row joined by commas, with _NA_ANSWER standing for NA.
+
+    >>> _parse_answer_block(['1,NA,3', '4,5,NA'], 3).tolist() == [[1, _NA_ANSWER, 3], \
+                                                                  [4, 5, _NA_ANSWER]]
+    True
+    """
+    answer_text = ','.join(answers).replace('NA', str(_NA_ANSWER))
+    answer_matrix = np.fromstring(answer_text, dtype=np.int64, sep=',')
+    return answer_matrix.reshape(len(answers), column_count)
+
 
+def _score_answer_matrix(answer_matrix: np.ndarray, na_mask: np.ndarray,
+                         plan: ScoringPlan) -> np.ndarray:
+    """Return the scores of every instrument of the plan for a block of rows of the dataset, given
+    the integer matrix of their answers and where the answers are NA. See _score_answer_block.
 
-def _calculate_data_average(data: List[Dict[str, Tuple[int, float]]]) -> List[Dict[str, float]]:
+    Preconditions:
+      - answer_matrix.shape == na_mask.shape
+      - answer_matrix.shape[1] == len(plan.column_names)
+    """
+    item_answers = answer_matrix[:, plan.item_columns]
+    bounded_answers = (item_answers - 1) * plan.steps
+    weighted_answers = np.where(na_mask[:, plan.item_columns] | (item_answers > plan.scales), 0.0,
+                                bounded_answers * plan.weights)
+
+    stress_scores = np.empty((len(answer_matrix), len(plan.names)))
+    for i in range(len(plan.names)):
+        # ACCUMULATOR stress_so_far: running sum of the score of the instrument of every row
+        stress_so_far = np.zeros(len(answer_matrix))
+        for column in range(plan.offsets[i], plan.offsets[i + 1]):
+            stress_so_far += weighted_answers[:, column]
+        stress_scores[:, i] = stress_so_far
+    return stress_scores
+
+
+def _regulate_na(data: Tuple[Any, ...]) -> \
+        Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Add the score and population for NA to all other identities in the identity group, and
+    return the arrays without the NA and the unrecognized identities, in the order of
+    constants.IDENTITY_GROUP_OPTIONS_LIST.
+
+    >>> sample_data = _initialize_data_arrays()
+    >>> sample_data[0][:7], sample_data[1][:7], sample_data[2][:7] = 1, 2.0, 4.0
+    >>> regulated_data = _regulate_na(sample_data)
+    >>> regulated_data[0][:7].tolist(), regulated_data[1][:7].tolist()
+    ([2, 2, 2, 2, 2, 2, 0], [4.0, 4.0, 4.0, 4.0, 4.0, 4.0, 0.0])
+    """
+    regulated_data = ([], [], [])
+
+    for i in range(constants.NUMBER_OF_IDENTITIES):
+        start, na_index = _GROUP_OFFSETS[i], _GROUP_OFFSETS[i] + _GROUP_SIZES[i]
+        for j in range(3):
+            if data[1][na_index] != 0.0:
+                regulated_data[j].append(data[j][start:na_index] + data[j][na_index])
+            else:
+                regulated_data[j].append(data[j][start:na_index])  # ignore NA
+
+    return np.concatenate(regulated_data[0]), np.concatenate(regulated_data[1]), \
+        np.concatenate(regulated_data[2])
+
+
+def _calculate_data_average(data: Tuple[np.ndarray, np.ndarray, np.ndarray]) -> \
+        List[Dict[str, float]]:
     """Calculate the average anxiety score for every identity group in the data.
 
     Preconditions:
-      - all(all(id_group[id][0] > 0 for id in id_group) for id_group in data)
+      - all(len(array) == sum(_GROUP_SIZES) for array in data)
 
-    >>> sample_data = [{'id1_1': (10, 5), 'id1_2': (3, 15)}, {'id2_1': (5, 10), 'id2_2': (15, 3)}]
-    >>> expected_data = [{'id1_1': 0.5, 'id1_2': 5.0}, {'id2_1': 2.0, 'id2_2': 0.2}]
-    >>> _calculate_data_average(sample_data) == expected_data
+    >>> sample_data = _regulate_na(_initialize_data_arrays())
+    >>> sample_data[0][:2], sample_data[1][:2] = [10, 3], [5.0, 15.0]
+    >>> average_data = _calculate_data_average(sample_data)
+    >>> average_data[0] == {'18-24': 0.5, '25-34': 5.0, '35-44': 0.0, '45-54': 0.0, \
+                            '55-64': 0.0, '65+': 0.0}
     True
     """
-    average_data = []
+    populations, scores = data[0], data[1]
+    averages = np.divide(scores, populations, out=np.zeros(len(scores)), where=populations != 0)
+    return _split_into_identity_groups(averages.tolist())
 
-    for i in range(len(data)):
-        average_data.append({})
-        for identity in data[i]:
-            if data[i][identity][0] != 0:
-                average_data[i][identity] = data[i][identity][1] / data[i][identity][0]
-            else:
-                average_data[i][identity] = 0.0
 
-    return average_data
+def _split_into_identity_groups(values: List[Any]) -> List[Dict[str, Any]]:
+    """Return the values of every identity, in the order of constants.IDENTITY_GROUP_OPTIONS_LIST,
+    as a dictionary mapping every identity to its value for every identity group.
+
+    Preconditions:
+      - len(values) == sum(_GROUP_SIZES)
+
+    >>> _split_into_identity_groups(list(range(sum(_GROUP_SIZES))))[1]
+    {'Male': 6, 'Female': 7, 'Other/would rather not say': 8}
+    """
+    split_values = []
+    # ACCUMULATOR offset: the index of the first identity of the current identity group
+    offset = 0
+    for options in constants.IDENTITY_GROUP_OPTIONS_LIST:
+        split_values.append(dict(zip(options, values[offset:offset + len(options)])))
+        offset = offset + len(options)
+
+    return split_values
 
 
 if __name__ == '__main__':
     import python_ta
 
     python_ta.check_all(config={
-        'extra-imports': ['python_ta.contracts', 'csv', 'json', 'os.path', 'constants'],
-        'allowed-io': ['read_csv_file', 'process_data', 'load_json_data'],
+        'extra-imports': ['python_ta.contracts', 'base64', 'contextlib', 'csv', 'gzip', 'hashlib',
+                          'io', 'json', 'lzma', 'mmap', 'os', 'struct', 'zipfile',
+                          'concurrent.futures', 'operator', 'numpy', 'constants', 'bootstrap',
+                          'column_cache', 'cube', 'distribution', 'sketch'],
+        'allowed-io': ['read_csv_file', 'process_data', 'load_json_data', 'load_binary_model',
+                       '_save_binary_model', '_split_csv_file', '_read_csv_shard',
+                       '_read_csv_header', 'build_column_cache',
+                       'load_quantile_sketches', '_save_quantile_sketches',
+                       'is_processed_data_current', '_write_file_atomically', '_open_csv_stream',
+                       '_add_csv_records_to_data', '_load_ingest_state', '_save_ingest_state',
+                       '_read_lines', '_find_last_record_end', '_hash_file_blocks'],
         'max-line-length': 100,
         'disable': ['R1705', 'C0200']
     })
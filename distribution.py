@@ -0,0 +1,571 @@
+# -*- coding: <UTF-8> -*-
+"""Your Anxiety During COVID-19: distribution
+
+Module Description
+==================
+This module defines the distributions of the anxiety score the percentile of a user is found in,
+and the files they are stored in: the ScoreDistribution class -- the sorted anxiety scores of the
+respondents of the dataset, estimated from their identities by the data module -- and the
+PopulationDistribution class -- the distribution of the anxiety score convolved from the averages
+and populations of the identities. RUNNING THIS FILE TAKES NO EFFECT. IT SHOULD ONLY BE IMPORTED.
+
+Copyright and Usage Information
+===============================
+This project is licensed under the GNU General Public License v3.0.
+    Permissions of this strong copyleft license are conditioned on making available complete source
+    code of licensed works and modifications, which include larger works using a licensed work,
+    under the same license. Copyright and license notices must be preserved. Contributors provide an
+    express grant of patent rights.
+
+Authors (by alphabetical order):
+  - Faruk, Fardin   https://github.com/Fard-Faru
+  - Hsieh, Sharon   https://github.com/SharonHsieh22
+  - Li, Sinan       https://github.com/LanceLi1416/
+  - Zhan, Jeffery   https://github.com/jeffzhan
+"""
+import math
+import mmap
+import os
+import struct
+from typing import Dict, List
+
+import numpy as np
+
+import constants
+
+# The number of identities of every identity group, and the index of the first identity of every
+# identity group in the order of constants.IDENTITY_GROUP_OPTIONS_LIST
+_GROUP_SIZES = [len(options) for options in constants.IDENTITY_GROUP_OPTIONS_LIST]
+_REGULATED_OFFSETS = [sum(_GROUP_SIZES[:i]) for i in range(len(_GROUP_SIZES))]
+
+# The header of a score distribution file: the magic bytes, the version of the format, the number of
+# identities and the number of respondents, followed by where the scores of every identity start
+_DISTRIBUTION_MAGIC = b'ANXS'
+_DISTRIBUTION_VERSION = 2
+_DISTRIBUTION_HEADER_FORMAT = '<4sHxxII'
+
+# The header of a population distribution file: the magic bytes, the version of the format, the
+# number of identities, the number of bins of the whole population, the lowest anxiety score and the
+# width of a bin, followed by the number of bins and the lowest score of every identity group, the
+# average scores of the identities and the distributions
+_POPULATION_MAGIC = b'ANXW'
+_POPULATION_VERSION = 1
+_POPULATION_HEADER_FORMAT = '<4sHxxIIdd'
+# The number of bins the range of the anxiety scores is split into by the population distribution
+_POPULATION_BINS = 4096
+
+
+class ScoreDistribution:
+    """The anxiety score of every respondent of the dataset, estimated from their identities the
+    same way as the score of a user, sorted, for finding the percentile of a score among the whole
+    population or among the people sharing an identity by binary search.
+
+    The scores are stored as float32 to bound the memory used. The respondents with an NA or
+    unrecognized identity are left out of that identity group only.
+
+    Instance Attributes:
+      - scores: the sorted scores of all respondents
+      - identity_scores: the sorted scores of the people of every identity, one identity after
+                         another in the order of constants.IDENTITY_GROUP_OPTIONS_LIST
+      - identity_offsets: the index in identity_scores of the first score of every identity,
+                          followed by len(identity_scores)
+
+    Representation Invariants:
+      - len(self.identity_offsets) == sum(_GROUP_SIZES) + 1
+      - self.identity_offsets[-1] == len(self.identity_scores)
+    """
+    scores: np.ndarray
+    identity_scores: np.ndarray
+    identity_offsets: np.ndarray
+
+    def __init__(self, scores: np.ndarray, identity_scores: np.ndarray,
+                 identity_offsets: np.ndarray) -> None:
+        """Initialize the distribution with the given sorted scores"""
+        self.scores = scores
+        self.identity_scores = identity_scores
+        self.identity_offsets = identity_offsets
+
+    def percentile(self, score: float) -> float:
+        """Return the percentage of all respondents whose score is at most the given score, or 50
+        if there are no respondents.
+
+        >>> distribution = ScoreDistribution(np.array([-1.0, 2.0, 2.0, 7.5], dtype=np.float32), \
+                                             np.empty(0, dtype=np.float32), \
+                                             np.zeros(sum(_GROUP_SIZES) + 1, dtype=np.int64))
+        >>> distribution.percentile(2.0), distribution.percentile(-3.0), distribution.percentile(8)
+        (75.0, 0.0, 100.0)
+        """
+        return _find_percentile(self.scores, score)
+
+    def identity_percentile(self, score: float, id_group: str, identity: str) -> float:
+        """Return the percentage of the respondents with the given identity in the identity group
+        whose score is at most the given score. If no respondent has the identity, return the
+        percentile among all respondents instead.
+
+        Preconditions:
+          - id_group in constants.IDENTITY_NAMES
+          - identity in \
+            constants.IDENTITY_GROUP_OPTIONS_LIST[constants.IDENTITY_NAMES.index(id_group)]
+
+        >>> identity_offsets = np.full(sum(_GROUP_SIZES) + 1, 2, dtype=np.int64)
+        >>> identity_offsets[0] = 0
+        >>> distribution = ScoreDistribution(np.array([-1.0, 2.0, 2.0, 7.5], dtype=np.float32), \
+                                             np.array([-1.0, 7.5], dtype=np.float32), \
+                                             identity_offsets)
+        >>> distribution.identity_percentile(2.0, 'Age', '18-24')
+        50.0
+        >>> distribution.identity_percentile(2.0, 'Age', '25-34')
+        75.0
+        """
+        id_index = constants.IDENTITY_NAMES.index(id_group)
+        index = _REGULATED_OFFSETS[id_index] + \
+            constants.IDENTITY_GROUP_OPTIONS_LIST[id_index].index(identity)
+        start, end = self.identity_offsets[index], self.identity_offsets[index + 1]
+        if start == end:
+            return self.percentile(score)
+        return _find_percentile(self.identity_scores[start:end], score)
+
+    def percentiles(self, scores: np.ndarray) -> np.ndarray:
+        """Return the percentile of every score in a batch, the same as percentile returns for
+        every score on its own.
+
+        >>> distribution = ScoreDistribution(np.array([-1.0, 2.0, 2.0, 7.5], dtype=np.float32), \
+                                             np.empty(0, dtype=np.float32), \
+                                             np.zeros(sum(_GROUP_SIZES) + 1, dtype=np.int64))
+        >>> distribution.percentiles(np.array([2.0, -3.0, 8])).tolist()
+        [75.0, 0.0, 100.0]
+        """
+        return _find_percentiles(self.scores, scores)
+
+    def identity_percentiles(self, scores: np.ndarray, id_group: str,
+                             codes: np.ndarray) -> np.ndarray:
+        """Return the percentile of every score in a batch among the respondents sharing the
+        identity in the identity group given by its index in codes, the same as
+        identity_percentile returns for every score on its own.
+
+        Preconditions:
+          - id_group in constants.IDENTITY_NAMES
+          - len(codes) == len(scores)
+          - all(0 <= code < len(constants.IDENTITY_GROUP_OPTIONS_LIST[ \
+                constants.IDENTITY_NAMES.index(id_group)]) for code in codes)
+
+        >>> identity_offsets = np.full(sum(_GROUP_SIZES) + 1, 2, dtype=np.int64)
+        >>> identity_offsets[0] = 0
+        >>> distribution = ScoreDistribution(np.array([-1.0, 2.0, 2.0, 7.5], dtype=np.float32), \
+                                             np.array([-1.0, 7.5], dtype=np.float32), \
+                                             identity_offsets)
+        >>> percentiles = distribution.identity_percentiles(np.array([2.0, 2.0]), 'Age', \
+                                                            np.array([0, 1]))
+        >>> percentiles.tolist()
+        [50.0, 75.0]
+        """
+        id_index = constants.IDENTITY_NAMES.index(id_group)
+        percentiles = np.empty(len(scores))
+        for code in np.unique(codes):
+            matching = codes == code
+            start = self.identity_offsets[_REGULATED_OFFSETS[id_index] + code]
+            end = self.identity_offsets[_REGULATED_OFFSETS[id_index] + code + 1]
+            if start == end:
+                percentiles[matching] = _find_percentiles(self.scores, scores[matching])
+            else:
+                percentiles[matching] = _find_percentiles(self.identity_scores[start:end],
+                                                          scores[matching])
+        return percentiles
+
+
+def build_score_distribution(scores: np.ndarray, identities: np.ndarray) -> ScoreDistribution:
+    """Return the distribution of the scores of the respondents, given the score of every
+    respondent and the index of every identity of every respondent in the order of
+    constants.IDENTITY_GROUP_OPTIONS_LIST, or -1 for an NA or unrecognized identity.
+
+    Preconditions:
+      - identities.shape == (len(scores), constants.NUMBER_OF_IDENTITIES)
+
+    >>> identities = np.array([_REGULATED_OFFSETS, _REGULATED_OFFSETS])
+    >>> identities[1, 0] = -1
+    >>> distribution = build_score_distribution(np.array([2.0, 1.0]), identities)
+    >>> distribution.scores.tolist(), distribution.identity_scores[:3].tolist()
+    ([1.0, 2.0], [2.0, 1.0, 2.0])
+    >>> distribution.identity_offsets[:3].tolist()
+    [0, 1, 1]
+    """
+    identity_indices = np.asarray(identities).ravel()
+    identity_scores = np.repeat(np.asarray(scores, dtype=np.float32),
+                                constants.NUMBER_OF_IDENTITIES)
+    recognized = identity_indices >= 0
+    identity_indices, identity_scores = identity_indices[recognized], identity_scores[recognized]
+    order = np.lexsort((identity_scores, identity_indices))
+    identity_offsets = np.concatenate(
+        [[0], np.cumsum(np.bincount(identity_indices, minlength=sum(_GROUP_SIZES)))])
+    return ScoreDistribution(np.sort(np.asarray(scores, dtype=np.float32)),
+                             identity_scores[order], identity_offsets.astype(np.int64))
+
+
+class PopulationDistribution:
+    """The distribution of the anxiety score over a population where every identity is as common as
+    among the respondents, for finding the percentile of a score among the population or among the
+    people sharing an identity with a single table lookup.
+
+    The anxiety score is the average of the average scores of a person's identities, so the
+    distribution of the score is the convolution of the distributions of the average scores of
+    every identity group, weighted by the populations of the identities. The identity groups are
+    taken as independent of each other. The range of the scores is split into bins of the same
+    width, and the histograms of the identity groups are convolved with the FFT. The scores
+    estimated from an identity cube are not such averages, so they are not ranked in this
+    distribution.
+
+    Instance Attributes:
+      - averages: the average score of every identity, in the order of
+                  constants.IDENTITY_GROUP_OPTIONS_LIST
+      - lowest: the lowest anxiety score, which is the center of the first bin
+      - bin_width: the width of every bin
+      - cdf: the fraction of the population whose score is in every bin or a bin below it
+      - group_lowests: for every identity group, the lowest sum of the contributions of the other
+                       identity groups to the anxiety score
+      - group_cdfs: for every identity group, the cdf of the sum of the contributions of the other
+                    identity groups to the anxiety score
+
+    Representation Invariants:
+      - len(self.averages) == sum(_GROUP_SIZES)
+      - self.bin_width > 0
+      - len(self.group_lowests) == len(self.group_cdfs) == constants.NUMBER_OF_IDENTITIES
+
+    >>> data = [{option: 0.0 for option in options} \
+                for options in constants.IDENTITY_GROUP_OPTIONS_LIST]
+    >>> data[0]['65+'], data[1]['Female'] = 11.0, 11.0
+    >>> populations = np.ones(sum(_GROUP_SIZES), dtype=np.int64)
+    >>> populations[:6] = [10, 10, 10, 10, 10, 50]
+    >>> distribution = build_population_distribution(populations, data)
+    >>> [round(distribution.percentile(score), 9) for score in [-0.5, 0.0, 1.0, 2.0]]
+    [0.0, 33.333333333, 83.333333333, 100.0]
+    >>> round(distribution.identity_percentile(1.0, 'Age', '65+'), 9)
+    66.666666667
+    """
+    averages: np.ndarray
+    lowest: float
+    bin_width: float
+    cdf: np.ndarray
+    group_lowests: np.ndarray
+    group_cdfs: List[np.ndarray]
+
+    def __init__(self, averages: np.ndarray, lowest: float, bin_width: float, cdf: np.ndarray,
+                 group_lowests: np.ndarray, group_cdfs: List[np.ndarray]) -> None:
+        """Initialize the distribution with the given cdfs"""
+        self.averages = averages
+        self.lowest = lowest
+        self.bin_width = bin_width
+        self.cdf = cdf
+        self.group_lowests = group_lowests
+        self.group_cdfs = group_cdfs
+
+    def percentile(self, score: float) -> float:
+        """Return the percentage of the population whose score is at most the given score"""
+        return _look_up_score(self.cdf, self.lowest, self.bin_width, score)
+
+    def identity_percentile(self, score: float, id_group: str, identity: str) -> float:
+        """Return the percentage of the people with the given identity in the identity group whose
+        score is at most the given score.
+
+        Preconditions:
+          - id_group in constants.IDENTITY_NAMES
+          - identity in \
+            constants.IDENTITY_GROUP_OPTIONS_LIST[constants.IDENTITY_NAMES.index(id_group)]
+        """
+        id_index = constants.IDENTITY_NAMES.index(id_group)
+        code = constants.IDENTITY_GROUP_OPTIONS_LIST[id_index].index(identity)
+        contribution = float(self.averages[_REGULATED_OFFSETS[id_index] + code]) / \
+            constants.NUMBER_OF_IDENTITIES
+        return _look_up_score(self.group_cdfs[id_index], float(self.group_lowests[id_index]),
+                              self.bin_width, score - contribution)
+
+    def percentiles(self, scores: np.ndarray) -> np.ndarray:
+        """Return the percentile of every score in a batch, the same as percentile returns for
+        every score on its own.
+        """
+        return _look_up_cdf(self.cdf, self.lowest, self.bin_width, scores)
+
+    def identity_percentiles(self, scores: np.ndarray, id_group: str,
+                             codes: np.ndarray) -> np.ndarray:
+        """Return the percentile of every score in a batch among the people sharing the identity in
+        the identity group given by its index in codes, the same as identity_percentile returns for
+        every score on its own.
+
+        Preconditions:
+          - id_group in constants.IDENTITY_NAMES
+          - len(codes) == len(scores)
+        """
+        id_index = constants.IDENTITY_NAMES.index(id_group)
+        contributions = self.averages[_REGULATED_OFFSETS[id_index] + np.asarray(codes)] / \
+            constants.NUMBER_OF_IDENTITIES
+        return _look_up_cdf(self.group_cdfs[id_index], float(self.group_lowests[id_index]),
+                            self.bin_width, np.asarray(scores) - contributions)
+
+
+def build_population_distribution(populations: np.ndarray, data: List[Dict[str, float]],
+                                  bins: int = _POPULATION_BINS) -> PopulationDistribution:
+    """Return the distribution of the anxiety score over a population where every identity is as
+    common as given by its population, see PopulationDistribution. The identities of an identity
+    group without a population are taken as equally common.
+
+    Preconditions:
+      - len(populations) == sum(_GROUP_SIZES)
+      - bins > 0
+    """
+    averages = np.array([data[i][option] for i in range(constants.NUMBER_OF_IDENTITIES)
+                         for option in constants.IDENTITY_GROUP_OPTIONS_LIST[i]])
+    contributions = _split_into_groups(averages / constants.NUMBER_OF_IDENTITIES)
+    group_populations = _split_into_groups(np.asarray(populations, dtype=np.float64))
+    lowests = np.array([group.min() for group in contributions])
+    lowest = float(lowests.sum())
+    bin_width = (sum(float(group.max()) for group in contributions) - lowest) / bins
+    if bin_width <= 0:
+        bin_width = 1.0
+
+    # ACCUMULATOR histograms: the weighted histogram of the contributions of every identity group
+    histograms = []
+    for i in range(constants.NUMBER_OF_IDENTITIES):
+        weights = group_populations[i] if group_populations[i].sum() > 0 else \
+            np.ones(len(group_populations[i]))
+        positions = np.rint((contributions[i] - lowests[i]) / bin_width).astype(np.int64)
+        histograms.append(np.bincount(positions, weights=weights / weights.sum()))
+
+    length = sum(len(histogram) for histogram in histograms) - len(histograms) + 1
+    fft_size = 1 << (length - 1).bit_length()
+    spectra = [np.fft.rfft(histogram, fft_size) for histogram in histograms]
+    # The products of the spectra of the identity groups before and after every identity group
+    prefixes, suffixes = [np.ones(fft_size // 2 + 1)], [np.ones(fft_size // 2 + 1)]
+    for i in range(len(spectra)):
+        prefixes.append(prefixes[-1] * spectra[i])
+        suffixes.append(suffixes[-1] * spectra[-1 - i])
+
+    cdf = _to_cdf(np.fft.irfft(prefixes[-1], fft_size)[:length])
+    group_cdfs = [_to_cdf(np.fft.irfft(prefixes[i] * suffixes[len(spectra) - 1 - i],
+                                       fft_size)[:length - len(histograms[i]) + 1])
+                  for i in range(len(spectra))]
+    return PopulationDistribution(averages, lowest, bin_width, cdf, lowest - lowests, group_cdfs)
+
+
+def _split_into_groups(values: np.ndarray) -> List[np.ndarray]:
+    """Return the values of every identity group, given the values of every identity in the order
+    of constants.IDENTITY_GROUP_OPTIONS_LIST.
+    """
+    return [values[_REGULATED_OFFSETS[i]:_REGULATED_OFFSETS[i] + _GROUP_SIZES[i]]
+            for i in range(len(_GROUP_SIZES))]
+
+
+def _to_cdf(histogram: np.ndarray) -> np.ndarray:
+    """Return the cumulative fractions of the histogram, leaving out the small negative counts left
+    by the rounding errors of the FFT.
+    """
+    cdf = np.cumsum(np.maximum(histogram, 0))
+    return cdf / cdf[-1] if cdf[-1] > 0 else cdf
+
+
+def _look_up_score(cdf: np.ndarray, lowest: float, bin_width: float, score: float) -> float:
+    """Return the cdf of the bin of the score, the same as _look_up_cdf returns for a single
+    score.
+    """
+    position = math.floor((score - lowest) / bin_width + 0.5)
+    if position < 0:
+        return 0.0
+    return float(cdf[min(position, len(cdf) - 1)]) * 100
+
+
+def _look_up_cdf(cdf: np.ndarray, lowest: float, bin_width: float,
+                 scores: np.ndarray) -> np.ndarray:
+    """Return the cdf of the bin of every score, as a percentage, where the first bin is centered
+    at lowest. The scores below the first bin are at 0 and the scores above the last bin at 100.
+    """
+    positions = np.floor((np.asarray(scores, dtype=np.float64) - lowest) / bin_width + 0.5)
+    percentiles = cdf[np.clip(positions, 0, len(cdf) - 1).astype(np.int64)] * 100
+    return np.where(positions < 0, 0.0, percentiles)
+
+
+def _find_percentiles(sorted_scores: np.ndarray, scores: np.ndarray) -> np.ndarray:
+    """Return the percentage of the sorted float32 scores that are at most every score, or 50 if
+    there are no sorted scores, the same as _find_percentile returns for every score on its own.
+    """
+    if len(sorted_scores) == 0:
+        return np.full(len(scores), 50.0)
+    positions = np.searchsorted(sorted_scores, np.asarray(scores).astype(np.float32), side='right')
+    return positions / len(sorted_scores) * 100
+
+
+def _find_percentile(sorted_scores: np.ndarray, score: float) -> float:
+    """Return the percentage of the sorted float32 scores that are at most the given score, or 50
+    if there are no scores.
+    """
+    if len(sorted_scores) == 0:
+        return 50.0
+    position = np.searchsorted(sorted_scores, np.float32(score), side='right')
+    return int(position) / len(sorted_scores) * 100
+
+
+def get_distribution_file_name(json_file_name: str) -> str:
+    """Return the name of the score distribution file stored next to the given processed data file.
+
+    >>> get_distribution_file_name('data/real_data.json')
+    'data/real_data.scores'
+    """
+    return os.path.splitext(json_file_name)[0] + '.scores'
+
+
+def load_score_distribution(file_name: str) -> ScoreDistribution:
+    """Load the previously stored score distribution file.
+
+    The file is memory mapped and the arrays of the distribution are views of it, so nothing is
+    parsed or copied.
+
+    Preconditions:
+      - os.path.isfile(file_name)
+
+    >>> import tempfile
+    >>> identities = np.array([_REGULATED_OFFSETS, _REGULATED_OFFSETS])
+    >>> distribution = build_score_distribution(np.array([2.0, 1.0]), identities)
+    >>> with tempfile.TemporaryDirectory() as directory:
+    ...     save_score_distribution(os.path.join(directory, 'sample.scores'), distribution)
+    ...     copy = load_score_distribution(os.path.join(directory, 'sample.scores'))
+    ...     print(copy.scores, copy.identity_scores[:4])
+    ...     print(copy.percentile(1.5), copy.identity_percentile(1.0, 'Age', '65+'))
+    ...     del copy
+    [1. 2.] [1. 2. 1. 2.]
+    50.0 50.0
+    """
+    with open(file_name, 'rb') as distribution_file:
+        buffer = mmap.mmap(distribution_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version, identity_count, respondent_count = \
+        struct.unpack_from(_DISTRIBUTION_HEADER_FORMAT, buffer)
+    if magic != _DISTRIBUTION_MAGIC or version != _DISTRIBUTION_VERSION or \
+            identity_count != sum(_GROUP_SIZES):
+        raise ValueError(f'{file_name} is not a version {_DISTRIBUTION_VERSION} score distribution '
+                         'file')
+
+    offset = struct.calcsize(_DISTRIBUTION_HEADER_FORMAT)
+    identity_offsets = np.frombuffer(buffer, dtype='<i8', count=identity_count + 1, offset=offset)
+    offset = offset + identity_offsets.nbytes
+    scores = np.frombuffer(buffer, dtype='<f4', count=respondent_count, offset=offset)
+    offset = offset + scores.nbytes
+    identity_scores = np.frombuffer(buffer, dtype='<f4', count=int(identity_offsets[-1]),
+                                    offset=offset)
+    return ScoreDistribution(scores, identity_scores, identity_offsets)
+
+
+def save_score_distribution(file_name: str, distribution: ScoreDistribution) -> None:
+    """Store the score distribution in a score distribution file.
+
+    The file starts with a header, followed by three fixed-width little-endian arrays holding the
+    index of the first score of every identity (int64), the sorted scores of all respondents
+    (float32) and the sorted scores of every identity (float32).
+    """
+    with open(file_name, 'wb') as distribution_file:
+        distribution_file.write(struct.pack(_DISTRIBUTION_HEADER_FORMAT, _DISTRIBUTION_MAGIC,
+                                            _DISTRIBUTION_VERSION, sum(_GROUP_SIZES),
+                                            len(distribution.scores)))
+        distribution_file.write(np.asarray(distribution.identity_offsets).astype('<i8').tobytes())
+        distribution_file.write(np.asarray(distribution.scores).astype('<f4').tobytes())
+        distribution_file.write(np.asarray(distribution.identity_scores).astype('<f4').tobytes())
+
+
+def get_population_file_name(json_file_name: str) -> str:
+    """Return the name of the population distribution file stored next to the given processed data
+    file.
+
+    >>> get_population_file_name('data/real_data.json')
+    'data/real_data.population'
+    """
+    return os.path.splitext(json_file_name)[0] + '.population'
+
+
+def load_population_distribution(file_name: str) -> PopulationDistribution:
+    """Load the previously stored population distribution file.
+
+    The file is memory mapped and the arrays of the distribution are views of it, so nothing is
+    parsed or copied.
+
+    Preconditions:
+      - os.path.isfile(file_name)
+
+    >>> import tempfile
+    >>> data = [{option: float(len(option)) for option in options} \
+                for options in constants.IDENTITY_GROUP_OPTIONS_LIST]
+    >>> distribution = build_population_distribution(np.arange(sum(_GROUP_SIZES)), data)
+    >>> with tempfile.TemporaryDirectory() as directory:
+    ...     save_population_distribution(os.path.join(directory, 'sample.population'), \
+                                          distribution)
+    ...     copy = load_population_distribution(os.path.join(directory, 'sample.population'))
+    ...     print(copy.percentile(3.0) == distribution.percentile(3.0), \
+                  copy.identity_percentile(3.0, 'Gender', 'Male') == \
+                  distribution.identity_percentile(3.0, 'Gender', 'Male'))
+    ...     del copy
+    True True
+    """
+    with open(file_name, 'rb') as population_file:
+        buffer = mmap.mmap(population_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version, identity_count, length, lowest, bin_width = \
+        struct.unpack_from(_POPULATION_HEADER_FORMAT, buffer)
+    if magic != _POPULATION_MAGIC or version != _POPULATION_VERSION or \
+            identity_count != sum(_GROUP_SIZES):
+        raise ValueError(f'{file_name} is not a version {_POPULATION_VERSION} population '
+                         'distribution file')
+
+    offset = struct.calcsize(_POPULATION_HEADER_FORMAT)
+    group_lengths = np.frombuffer(buffer, dtype='<i8', count=len(_GROUP_SIZES), offset=offset)
+    offset = offset + group_lengths.nbytes
+    group_lowests = np.frombuffer(buffer, dtype='<f8', count=len(_GROUP_SIZES), offset=offset)
+    offset = offset + group_lowests.nbytes
+    averages = np.frombuffer(buffer, dtype='<f8', count=identity_count, offset=offset)
+    offset = offset + averages.nbytes
+    cdf = np.frombuffer(buffer, dtype='<f8', count=length, offset=offset)
+    offset = offset + cdf.nbytes
+    # ACCUMULATOR group_cdfs: the cdfs of the identity groups read so far
+    group_cdfs = []
+    for i in range(len(_GROUP_SIZES)):
+        group_cdfs.append(np.frombuffer(buffer, dtype='<f8', count=int(group_lengths[i]),
+                                        offset=offset))
+        offset = offset + group_cdfs[-1].nbytes
+    return PopulationDistribution(averages, lowest, bin_width, cdf, group_lowests, group_cdfs)
+
+
+def save_population_distribution(file_name: str, distribution: PopulationDistribution) -> None:
+    """Store the population distribution in a population distribution file.
+
+    The file starts with a header, followed by fixed-width little-endian arrays holding the number
+    of bins of the cdf of every identity group (int64), the lowest score of every identity group
+    (float64), the average score of every identity (float64), the cdf of the whole population
+    (float64) and the cdf of every identity group (float64).
+    """
+    with open(file_name, 'wb') as population_file:
+        population_file.write(struct.pack(_POPULATION_HEADER_FORMAT, _POPULATION_MAGIC,
+                                          _POPULATION_VERSION, len(distribution.averages),
+                                          len(distribution.cdf), distribution.lowest,
+                                          distribution.bin_width))
+        population_file.write(np.array([len(cdf) for cdf in distribution.group_cdfs],
+                                       dtype='<i8').tobytes())
+        population_file.write(np.asarray(distribution.group_lowests, dtype='<f8').tobytes())
+        population_file.write(np.asarray(distribution.averages, dtype='<f8').tobytes())
+        population_file.write(np.asarray(distribution.cdf, dtype='<f8').tobytes())
+        for cdf in distribution.group_cdfs:
+            population_file.write(np.asarray(cdf, dtype='<f8').tobytes())
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['python_ta.contracts', 'math', 'mmap', 'os', 'struct', 'numpy',
+                          'constants'],
+        'allowed-io': ['load_score_distribution', 'save_score_distribution',
+                       'load_population_distribution', 'save_population_distribution'],
+        'max-line-length': 100,
+        'disable': ['R1705', 'C0200']
+    })
+
+    import python_ta.contracts
+
+    python_ta.contracts.check_all_contracts()
+
+    import doctest
+
+    doctest.testmod()
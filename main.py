@@ -9,7 +9,7 @@ from PyQt5.QtWidgets import QApplication, QMessageBox
 
 import constants
 import ui
-from data import process_data
+from data import get_processed_data_key, is_processed_data_current, process_data
 
 
 def main():
@@ -56,11 +56,12 @@ def unzip_resources():
 
 
 def get_data():
-    """Download the dataset."""
+    """Download the dataset, unless it, or the dataset compressed in a .gz, .xz or .zip file,
+    already exists."""
     if not os.path.exists('data'):
         os.makedirs('data')
     os.chdir('data')
-    if not os.path.exists('COVIDiSTRESS June 17.csv'):
+    if not os.path.exists(find_dataset()):
         print('Downloading dataset...')
         file = requests.get('https://osf.io/m5s8d/download')
         open('COVIDiSTRESS June 17.csv', 'wb').write(file.content)
@@ -68,11 +69,32 @@ def get_data():
     os.chdir('../')
 
 
+def find_dataset() -> str:
+    """Return the name of the dataset, which may be compressed in a .gz, .xz or .zip file next to
+    where the csv file would be. The compressed dataset is read without decompressing it to disk.
+    """
+    datasets = [constants.REAL_DATA_CSV_FILE, constants.REAL_DATA_CSV_FILE + '.gz',
+                constants.REAL_DATA_CSV_FILE + '.xz',
+                os.path.splitext(constants.REAL_DATA_CSV_FILE)[0] + '.zip']
+    for dataset in datasets:
+        if os.path.exists(dataset):
+            return dataset
+    return constants.REAL_DATA_CSV_FILE
+
+
 def process_data_if_not_exist():
-    """If real_data.json does not exist, create it."""
-    if not os.path.exists(constants.REAL_DATA_JSON_FILE):
+    """If real_data.json was not completely processed from the dataset as it is now, with the
+    current scoring configuration and version, create or update it.
+
+    The key of the processed data is calculated once from the whole dataset, and only the records
+    appended to the dataset since it was last processed are read.
+    """
+    dataset = find_dataset()
+    key = get_processed_data_key(dataset, identity_cube=True, score_distribution=True)
+    if not is_processed_data_current(dataset, constants.REAL_DATA_JSON_FILE, key=key):
         print('Processing data...')
-        process_data(constants.REAL_DATA_CSV_FILE, constants.REAL_DATA_JSON_FILE)
+        process_data(dataset, constants.REAL_DATA_JSON_FILE, workers=os.cpu_count() or 1,
+                     incremental=True, identity_cube=True, score_distribution=True, key=key)
         print('Finished processing data!')
 
 
@@ -0,0 +1,188 @@
+# -*- coding: <UTF-8> -*-
+"""Your Anxiety During COVID-19: search
+
+Module Description
+==================
+This file finds the most and least anxious combinations of identities. The anxiety score is the
+average of the average scores of a person's identities, so the options of every identity group are
+sorted by their average score, and the combinations are visited from the best down with a priority
+queue, where every combination is reached from exactly one other by moving one identity group to
+its next option. Finding k combinations visits about k * 11 combinations, instead of the billions
+there are. RUNNING THIS FILE PRINTS THE COMBINATIONS FOUND WITH THE OPTIONS GIVEN AS ARGUMENTS, AS
+JSON LINES. Run it with --help for the options.
+
+Copyright and Usage Information
+===============================
+This project is licensed under the GNU General Public License v3.0.
+    Permissions of this strong copyleft license are conditioned on making available complete source
+    code of licensed works and modifications, which include larger works using a licensed work,
+    under the same license. Copyright and license notices must be preserved. Contributors provide an
+    express grant of patent rights.
+
+Authors (by alphabetical order):
+  - Faruk, Fardin   https://github.com/Fard-Faru
+  - Hsieh, Sharon   https://github.com/SharonHsieh22
+  - Li, Sinan       https://github.com/LanceLi1416/
+  - Zhan, Jeffery   https://github.com/jeffzhan
+"""
+import argparse
+import heapq
+import json
+import os
+import sys
+from typing import Dict, List, Tuple, Union
+
+import constants
+from data import get_model_file_name, load_binary_data, load_json_data
+from user import ScoreModel
+
+
+def find_best_identities(data: List[Dict[str, float]], k: int, most_anxious: bool = True,
+                         constraints: Union[Dict[str, List[str]], None] = None) -> \
+        List[Tuple[float, List[str]]]:
+    """Return the k combinations of identities with the highest anxiety scores, or the lowest if
+    most_anxious is False, from the best down, with their anxiety scores. Every combination has an
+    identity for every identity group in the order of constants.IDENTITY_NAMES, and the scores are
+    the same as User.estimate_anxiety_score calculates from the data. Fewer than k combinations are
+    returned if there are fewer than k combinations.
+
+    constraints maps the name of an identity group to the identities allowed in it. The identity
+    groups without constraints allow every identity.
+
+    Raise ValueError if a constraint names an identity group or identity that does not exist, or
+    allows no identity.
+
+    Preconditions:
+      - k >= 0
+      - all(set(data[i]) == set(constants.IDENTITY_GROUP_OPTIONS_LIST[i]) for i in range(len(data)))
+
+    >>> data = [{option: 0.0 for option in options} \
+                for options in constants.IDENTITY_GROUP_OPTIONS_LIST]
+    >>> data[0]['65+'], data[0]['25-34'], data[1]['Female'] = 11.0, 5.5, 2.2
+    >>> fixed = {constants.IDENTITY_NAMES[i]: [constants.IDENTITY_GROUP_OPTIONS_LIST[i][0]] \
+                 for i in range(2, constants.NUMBER_OF_IDENTITIES)}
+    >>> [(round(score, 9), identity[:2]) for score, identity in \
+         find_best_identities(data, 3, constraints=fixed)]
+    [(1.2, ['65+', 'Female']), (1.0, ['65+', 'Male']), (1.0, ['65+', 'Other/would rather not say'])]
+    """
+    options = _get_allowed_options(constraints)
+    # The allowed options of every identity group from the best down, and their average scores
+    sorted_options = []
+    for i in range(constants.NUMBER_OF_IDENTITIES):
+        ranked = sorted(options[i], key=lambda option: data[i][option], reverse=most_anxious)
+        sorted_options.append(ranked)
+
+    sign = -1 if most_anxious else 1
+    first = (0,) * constants.NUMBER_OF_IDENTITIES
+    # The combinations to visit, by their scores from the best down. The last identity group moved
+    # to a later option is the only one a combination moves further, so it is only reached once.
+    queue = [(sign * _score_of(data, sorted_options, first), first, 0)]
+    # ACCUMULATOR best: the best combinations so far
+    best = []
+    while len(queue) > 0 and len(best) < k:
+        key, ranks, last_moved = heapq.heappop(queue)
+        best.append((sign * key, [sorted_options[i][ranks[i]]
+                                  for i in range(constants.NUMBER_OF_IDENTITIES)]))
+        for i in range(last_moved, constants.NUMBER_OF_IDENTITIES):
+            if ranks[i] + 1 < len(sorted_options[i]):
+                successor = ranks[:i] + (ranks[i] + 1,) + ranks[i + 1:]
+                heapq.heappush(queue,
+                               (sign * _score_of(data, sorted_options, successor), successor, i))
+    return best
+
+
+def _score_of(data: List[Dict[str, float]], sorted_options: List[List[str]],
+              ranks: Tuple[int, ...]) -> float:
+    """Return the anxiety score of the combination with the option at the given rank of every
+    identity group, the same as User.estimate_anxiety_score calculates from the data.
+    """
+    # ACCUMULATOR anxiety: the sum of the average scores of the identities so far
+    anxiety = 0
+    for i in range(constants.NUMBER_OF_IDENTITIES):
+        anxiety = anxiety + data[i][sorted_options[i][ranks[i]]]
+    return anxiety / 11
+
+
+def _get_allowed_options(constraints: Union[Dict[str, List[str]], None]) -> List[List[str]]:
+    """Return the identities allowed in every identity group under the constraints.
+
+    Raise ValueError if a constraint names an identity group or identity that does not exist, or
+    allows no identity.
+
+    >>> [len(options) for options in _get_allowed_options({'Gender': ['Male', 'Female']})][:3]
+    [6, 2, 7]
+    >>> _get_allowed_options({'Gender': ['Robot']})
+    Traceback (most recent call last):
+    ValueError: 'Robot' is not an option of Gender
+    """
+    options = [list(group_options) for group_options in constants.IDENTITY_GROUP_OPTIONS_LIST]
+    for id_group, allowed in (constraints or {}).items():
+        if id_group not in constants.IDENTITY_NAMES:
+            raise ValueError(f'{id_group!r} is not an identity group')
+        id_index = constants.IDENTITY_NAMES.index(id_group)
+        for identity in allowed:
+            if identity not in constants.IDENTITY_GROUP_OPTIONS_LIST[id_index]:
+                raise ValueError(f'{identity!r} is not an option of {id_group}')
+        if len(allowed) == 0:
+            raise ValueError(f'No identity of {id_group} is allowed')
+        options[id_index] = [option for option in options[id_index] if option in allowed]
+    return options
+
+
+def main() -> None:
+    """Print the combinations of identities found with the options given on the command line, one
+    JSON object per line.
+
+    Run this file with --self-test alone to check it with python_ta and run its doctests instead.
+    """
+    parser = argparse.ArgumentParser(
+        description='Find the most or least anxious combinations of identities.')
+    parser.add_argument('-k', type=int, default=10, help='the number of combinations to find')
+    parser.add_argument('--least', action='store_true',
+                        help='find the least anxious combinations instead of the most anxious')
+    parser.add_argument('--allow', action='append', default=[], metavar='GROUP=IDENTITY',
+                        help='allow only the given identities in the identity group, once for '
+                             'every identity allowed, e.g. --allow "Gender=Female"')
+    parser.add_argument('--data', default=constants.REAL_DATA_JSON_FILE,
+                        help='the processed data to score with')
+    arguments = parser.parse_args()
+
+    allowed_identities = {}
+    for constraint in arguments.allow:
+        group_name, _, allowed_identity = constraint.partition('=')
+        allowed_identities.setdefault(group_name, []).append(allowed_identity)
+
+    if os.path.isfile(get_model_file_name(arguments.data)):
+        anxiety_data = load_binary_data(get_model_file_name(arguments.data))
+    else:
+        anxiety_data = load_json_data(arguments.data)
+    model = ScoreModel(anxiety_data)
+    for anxiety_score, combination in find_best_identities(anxiety_data, arguments.k,
+                                                           not arguments.least,
+                                                           allowed_identities):
+        print(json.dumps({'anxiety_score': anxiety_score,
+                          'percentage': model.percentage(anxiety_score),
+                          'identity': dict(zip(constants.IDENTITY_NAMES, combination))}))
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] == ['--self-test']:
+        import python_ta
+
+        python_ta.check_all(config={
+            'extra-imports': ['python_ta.contracts', 'argparse', 'heapq', 'json', 'os', 'sys',
+                              'constants', 'data', 'user'],
+            'allowed-io': ['main'],
+            'max-line-length': 100,
+            'disable': ['R1705', 'C0200']
+        })
+
+        import python_ta.contracts
+
+        python_ta.contracts.check_all_contracts()
+
+        import doctest
+
+        doctest.testmod()
+    else:
+        main()
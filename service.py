@@ -0,0 +1,467 @@
+# -*- coding: <UTF-8> -*-
+"""Your Anxiety During COVID-19: service
+
+Module Description
+==================
+This file serves the anxiety scores over HTTP without the GUI. The processed data is loaded once,
+and the people sent in concurrent requests are scored together with the batch module, which gives
+the same results as the User class and the functions of the user module. Connections are kept alive
+between requests, and the latencies of the requests and the sizes of the batches are reported at
+/metrics. RUNNING THIS FILE STARTS THE SERVICE ON THE HOST AND PORT GIVEN AS THE FIRST AND SECOND
+ARGUMENTS, OR ON 127.0.0.1:8080.
+
+The service has two endpoints:
+  - POST /score, with a JSON object {"identity": [...]} where the identities are in the same format
+    as the input of the User class, answers with a JSON object of the anxiety score, its position
+    between the extrema as a percentage, the user's ranking in the population with every identity
+    group, and the real percentiles of the score if the distribution of the scores was processed.
+  - GET /metrics answers with the latency and batch size histograms, in the Prometheus text format.
+
+Copyright and Usage Information
+===============================
+This project is licensed under the GNU General Public License v3.0.
+    Permissions of this strong copyleft license are conditioned on making available complete source
+    code of licensed works and modifications, which include larger works using a licensed work,
+    under the same license. Copyright and license notices must be preserved. Contributors provide an
+    express grant of patent rights.
+
+Authors (by alphabetical order):
+  - Faruk, Fardin   https://github.com/Fard-Faru
+  - Hsieh, Sharon   https://github.com/SharonHsieh22
+  - Li, Sinan       https://github.com/LanceLi1416/
+  - Zhan, Jeffery   https://github.com/jeffzhan
+"""
+import asyncio
+import bisect
+import json
+import sys
+import time
+from typing import Any, Dict, List, Tuple, Union
+
+import numpy as np
+
+import constants
+from batch import encode_identity_table, load_scoring_data, score_codes, validate_identity
+from cube import IdentityCube
+from distribution import ScoreDistribution
+from user import ScoreModel
+
+# The most people scored together in one batch
+MAX_BATCH_SIZE = 256
+# The longest time in seconds a request waits for other requests to be scored with
+MAX_BATCH_DELAY = 0.002
+# The longest time in seconds a connection is kept open without a request
+_KEEP_ALIVE_TIMEOUT = 15.0
+# The largest body of a request, in bytes
+_MAX_BODY_SIZE = 1 << 16
+# The upper bounds of the buckets of the latency histogram, in seconds
+_LATENCY_BUCKETS = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0]
+# The upper bounds of the buckets of the batch size histogram
+_BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+# The reason phrase of every status code the service answers with
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+class Histogram:
+    """A histogram of observed values with fixed buckets, as reported by /metrics.
+
+    Instance Attributes:
+      - bounds: the upper bound of every bucket, in increasing order
+      - counts: the number of observed values in every bucket, followed by the number of values
+                above the last bound
+      - total: the sum of the observed values
+
+    Representation Invariants:
+      - len(self.counts) == len(self.bounds) + 1
+      - all(self.bounds[i] < self.bounds[i + 1] for i in range(len(self.bounds) - 1))
+
+    >>> histogram = Histogram([1, 5])
+    >>> for value in [0.5, 1, 3, 8]:
+    ...     histogram.observe(value)
+    >>> print(histogram.to_text('batch_size', 'The number of people scored together'))
+    # HELP batch_size The number of people scored together
+    # TYPE batch_size histogram
+    batch_size_bucket{le="1"} 2
+    batch_size_bucket{le="5"} 3
+    batch_size_bucket{le="+Inf"} 4
+    batch_size_sum 12.5
+    batch_size_count 4
+    """
+    bounds: List[float]
+    counts: List[int]
+    total: float
+
+    def __init__(self, bounds: List[float]) -> None:
+        """Initialize an empty histogram with the given bucket bounds"""
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        """Add the value to the bucket of the smallest bound at least the value"""
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total = self.total + value
+
+    def to_text(self, name: str, description: str) -> str:
+        """Return the histogram in the Prometheus text format, with cumulative buckets"""
+        lines = [f'# HELP {name} {description}', f'# TYPE {name} histogram']
+        # ACCUMULATOR count_so_far: the number of values in the buckets so far
+        count_so_far = 0
+        for bound, count in zip(self.bounds + ['+Inf'], self.counts):
+            count_so_far = count_so_far + count
+            lines.append(f'{name}_bucket{{le="{bound}"}} {count_so_far}')
+        lines.append(f'{name}_sum {self.total}')
+        lines.append(f'{name}_count {count_so_far}')
+        return '\n'.join(lines)
+
+
+class ScoreBatcher:
+    """The people waiting to be scored, who are scored together once MAX_BATCH_SIZE people are
+    waiting or the first of them has waited for MAX_BATCH_DELAY seconds.
+
+    Instance Attributes:
+      - model: the model of the processed data
+      - cube: the identity cube the scores are estimated from, or None to estimate them from the
+              data of the model alone
+      - distribution: the scores of the respondents for the real percentiles, or None to leave them
+                      out
+      - batch_sizes: the histogram of the number of people scored together
+
+    Representation Invariants:
+      - len(self._pending) < MAX_BATCH_SIZE
+    """
+    model: ScoreModel
+    cube: Union[IdentityCube, None]
+    distribution: Union[ScoreDistribution, None]
+    batch_sizes: Histogram
+    # The encoded identities of every person waiting, and the future of their results
+    _pending: List[Tuple[np.ndarray, asyncio.Future]]
+    # The timer scoring the people waiting once the first of them has waited long enough
+    _timer: Union[asyncio.TimerHandle, None]
+
+    def __init__(self, model: ScoreModel, cube: Union[IdentityCube, None] = None,
+                 distribution: Union[ScoreDistribution, None] = None) -> None:
+        """Initialize a batcher with nobody waiting"""
+        self.model = model
+        self.cube = cube
+        self.distribution = distribution
+        self.batch_sizes = Histogram(_BATCH_SIZE_BUCKETS)
+        self._pending = []
+        self._timer = None
+
+    async def score(self, codes: np.ndarray) -> Dict[str, Any]:
+        """Return the results of the person with the encoded identities, once they are scored with
+        the people waiting at the same time.
+
+        Preconditions:
+          - codes.shape == (constants.NUMBER_OF_IDENTITIES,)
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((codes, future))
+        if len(self._pending) >= MAX_BATCH_SIZE:
+            self.flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(MAX_BATCH_DELAY, self.flush)
+        return await future
+
+    def flush(self) -> None:
+        """Score every person waiting, and hand every person their results"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+        if len(pending) == 0:
+            return
+        self.batch_sizes.observe(len(pending))
+
+        try:
+            results = score_codes(np.array([codes for codes, _ in pending]), self.model,
+                                  self.cube, self.distribution)
+        except Exception as error:  # every waiting request has to be answered
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        for (_, future), result in zip(pending, results):
+            if not future.done():
+                future.set_result(result)
+
+
+class ScoringService:
+    """The HTTP service answering the requests of every connection.
+
+    Instance Attributes:
+      - batcher: the batcher scoring the people sent to /score
+      - latencies: the histogram of the time taken to answer the requests to /score, in seconds
+
+    >>> service = ScoringService(ScoreBatcher(ScoreModel( \
+            [{option: 0.0 for option in options} \
+             for options in constants.IDENTITY_GROUP_OPTIONS_LIST])))
+    >>> asyncio.run(service.respond('GET', '/score', b''))[0]
+    405
+    >>> asyncio.run(service.respond('POST', '/score', b'{"identity": [18]}'))
+    (400, 'application/json', b'{"error": "Expected 11 identities"}')
+    """
+    batcher: ScoreBatcher
+    latencies: Histogram
+
+    def __init__(self, batcher: ScoreBatcher) -> None:
+        """Initialize the service scoring with the given batcher"""
+        self.batcher = batcher
+        self.latencies = Histogram(_LATENCY_BUCKETS)
+
+    async def handle_connection(self, reader: asyncio.StreamReader,
+                                writer: asyncio.StreamWriter) -> None:
+        """Answer the requests sent through the connection until the client closes it, asks for it
+        to be closed, or sends no request for _KEEP_ALIVE_TIMEOUT seconds.
+
+        A request that cannot be read is answered with a 400, and a request that fails while it is
+        answered, e.g. because its batch failed, with a 500. The connection is then closed.
+
+        >>> async def send(service: ScoringService, request: bytes) -> bytes:
+        ...     server = await start_service(service, port=0)
+        ...     reader, writer = await asyncio.open_connection(
+        ...         '127.0.0.1', server.sockets[0].getsockname()[1])
+        ...     writer.write(request)
+        ...     status_line = await reader.readline()
+        ...     writer.close()
+        ...     server.close()
+        ...     await server.wait_closed()
+        ...     return status_line.rstrip()
+        >>> model = ScoreModel([{option: 0.0 for option in options} \
+                                for options in constants.IDENTITY_GROUP_OPTIONS_LIST])
+        >>> request = 'POST /score HTTP/1.1\\r\\nContent-Length: \u00b2\\r\\n\\r\\n'
+        >>> asyncio.run(send(ScoringService(ScoreBatcher(model)), request.encode('iso-8859-1')))
+        b'HTTP/1.1 400 Bad Request'
+        >>> class FailingBatcher(ScoreBatcher):
+        ...     async def score(self, codes: np.ndarray) -> Dict[str, Any]:
+        ...         raise RuntimeError('The batch failed')
+        >>> body = b'{"identity": [18, "Female", "None", "Student", "Canada", "No", "Single", \
+"No", "Isolated", 3, 30]}'
+        >>> asyncio.run(send(ScoringService(FailingBatcher(model)), \
+                             b'POST /score HTTP/1.1\\r\\nContent-Length: ' \
+                             + str(len(body)).encode() + b'\\r\\n\\r\\n' + body))
+        b'HTTP/1.1 500 Internal Server Error'
+        """
+        try:
+            keep_alive = True
+            while keep_alive:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'),
+                                                  _KEEP_ALIVE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                        asyncio.TimeoutError, ConnectionError):
+                    break
+                start = time.perf_counter()
+
+                lines = head.decode('iso-8859-1').split('\r\n')
+                request_line = lines[0].split()
+                headers = {}
+                for line in lines[1:]:
+                    if ':' in line:
+                        name, value = line.split(':', 1)
+                        headers[name.strip().lower()] = value.strip()
+                if len(request_line) != 3:
+                    await _write_response(writer, 400, 'application/json',
+                                          _error_body('Malformed request line'), False)
+                    break
+                method, path, version = request_line
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection == 'keep-alive' if version == 'HTTP/1.0' else \
+                    connection != 'close'
+
+                length = _parse_content_length(headers.get('content-length', ''))
+                if length is None:
+                    await _write_response(writer, 400, 'application/json',
+                                          _error_body('Malformed Content-Length'), False)
+                    break
+                if length > _MAX_BODY_SIZE:
+                    await _write_response(writer, 413, 'application/json',
+                                          _error_body('The body is too large'), False)
+                    break
+                body = await reader.readexactly(length)
+
+                try:
+                    status, content_type, payload = await self.respond(method, path, body)
+                except Exception:  # the request still has to be answered
+                    status, content_type, payload = \
+                        500, 'application/json', _error_body('The request could not be answered')
+                    keep_alive = False
+                await _write_response(writer, status, content_type, payload, keep_alive)
+                if path == '/score':
+                    self.latencies.observe(time.perf_counter() - start)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, method: str, path: str, body: bytes) -> Tuple[int, str, bytes]:
+        """Return the status code, the content type and the body of the answer to the request"""
+        if path == '/metrics':
+            if method != 'GET':
+                return 405, 'application/json', _error_body('Use GET for /metrics')
+            return 200, 'text/plain; version=0.0.4', self.metrics().encode('utf-8')
+        elif path == '/score':
+            if method != 'POST':
+                return 405, 'application/json', _error_body('Use POST for /score')
+            try:
+                codes = parse_score_request(body)
+            except ValueError as error:
+                return 400, 'application/json', _error_body(str(error))
+            result = await self.batcher.score(codes)
+            return 200, 'application/json', json.dumps(result).encode('utf-8')
+        else:
+            return 404, 'application/json', _error_body(f'There is no endpoint at {path}')
+
+    def metrics(self) -> str:
+        """Return the histograms of the service in the Prometheus text format"""
+        return self.latencies.to_text(
+            'score_request_duration_seconds', 'The time taken to answer the requests to /score') + \
+            '\n' + self.batcher.batch_sizes.to_text(
+                'score_batch_size', 'The number of people scored together') + '\n'
+
+
+def parse_score_request(body: bytes) -> np.ndarray:
+    """Return the encoded identities sent in the body of a request to /score.
+
+    Raise ValueError if the body is not a JSON object with valid identities in the format of the
+    input of the User class.
+
+    >>> parse_score_request(b'{"identity": [18, "Female", "None", "Student", "Canada", "No", \
+"Single", "No", "Isolated", 3, 30]}').tolist()
+    [0, 1, 0, 1, 31, 1, 0, 1, 2, 3, 12]
+    >>> parse_score_request(b'{"identity": [17, "Female", "None", "Student", "Canada", "No", \
+"Single", "No", "Isolated", 3, 30]}')
+    Traceback (most recent call last):
+    ValueError: Age must be a whole number from 18 to 110
+    """
+    try:
+        request = json.loads(body)
+    except (UnicodeDecodeError, json.JSONDecodeError) as error:
+        raise ValueError(f'The body is not valid JSON: {error}') from error
+    if not isinstance(request, dict) or not isinstance(request.get('identity'), list):
+        raise ValueError('Expected a JSON object with a list of identities as "identity"')
+
+    validate_identity(request['identity'])
+    return encode_identity_table([request['identity']])[0]
+
+
+def load_service(json_file: str = constants.REAL_DATA_JSON_FILE) -> ScoringService:
+    """Return the service scoring with the data processed into the json file, and with the identity
+    cube and the distribution of the scores if they were processed.
+
+    Preconditions:
+      - os.path.isfile(json_file) or os.path.isfile(get_model_file_name(json_file))
+    """
+    return ScoringService(ScoreBatcher(*load_scoring_data(json_file)))
+
+
+async def start_service(service: ScoringService, host: str = '127.0.0.1',
+                        port: int = 8080) -> asyncio.AbstractServer:
+    """Start answering the connections to the host and port with the service, and return the
+    server. A port of 0 picks a free port, which can be found in the sockets of the server.
+
+    >>> service = ScoringService(ScoreBatcher(ScoreModel( \
+            [{option: float(i) for i, option in enumerate(options)} \
+             for options in constants.IDENTITY_GROUP_OPTIONS_LIST])))
+    >>> async def request_twice(body: bytes) -> List[bytes]:
+    ...     server = await start_service(service, port=0)
+    ...     reader, writer = await asyncio.open_connection(
+    ...         '127.0.0.1', server.sockets[0].getsockname()[1])
+    ...     # ACCUMULATOR status_lines: the status line of every answer so far
+    ...     status_lines = []
+    ...     for _ in range(2):
+    ...         writer.write(b'POST /score HTTP/1.1\\r\\nContent-Length: '
+    ...                      + str(len(body)).encode() + b'\\r\\n\\r\\n' + body)
+    ...         head = await reader.readuntil(b'\\r\\n\\r\\n')
+    ...         await reader.readexactly(int(head.split(b'Content-Length: ')[1].split()[0]))
+    ...         status_lines.append(head.split(b'\\r\\n')[0])
+    ...     writer.write_eof()
+    ...     await reader.read()
+    ...     writer.close()
+    ...     server.close()
+    ...     await server.wait_closed()
+    ...     return status_lines
+    >>> asyncio.run(request_twice(b'{"identity": [18, "Female", "None", "Student", "Canada", \
+"No", "Single", "No", "Isolated", 3, 30]}'))
+    [b'HTTP/1.1 200 OK', b'HTTP/1.1 200 OK']
+    """
+    return await asyncio.start_server(service.handle_connection, host, port)
+
+
+async def run_service(host: str = '127.0.0.1', port: int = 8080) -> None:
+    """Load the service from the processed data, and answer the connections to the host and port
+    until interrupted."""
+    server = await start_service(load_service(), host, port)
+    print(f'Serving on http://{host}:{port}')
+    async with server:
+        await server.serve_forever()
+
+
+async def _write_response(writer: asyncio.StreamWriter, status: int, content_type: str,
+                          payload: bytes, keep_alive: bool) -> None:
+    """Write the answer to a request to the connection"""
+    head = f'HTTP/1.1 {status} {_REASONS[status]}\r\n' \
+           f'Content-Type: {content_type}\r\n' \
+           f'Content-Length: {len(payload)}\r\n' \
+           f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'
+    writer.write(head.encode('iso-8859-1') + payload)
+    await writer.drain()
+
+
+def _parse_content_length(value: str) -> Union[int, None]:
+    """Return the length of the body given in the Content-Length header of a request, 0 if the
+    header is missing, or None if it is not a length.
+
+    >>> _parse_content_length('12'), _parse_content_length(''), _parse_content_length('abc')
+    (12, 0, None)
+    >>> _parse_content_length('-1') is None, _parse_content_length('\u00b2') is None
+    (True, True)
+    """
+    if value == '':
+        return 0
+    elif not (value.isascii() and value.isdigit()):
+        return None
+    return int(value)
+
+
+def _error_body(message: str) -> bytes:
+    """Return the body of an answer with the error message"""
+    return json.dumps({'error': message}).encode('utf-8')
+
+
+def main() -> None:
+    """Serve on the host and port given on the command line, 127.0.0.1 and 8080 by default.
+
+    Run this file with --self-test alone to check it with python_ta and run its doctests instead.
+    """
+    asyncio.run(run_service(sys.argv[1] if len(sys.argv) > 1 else '127.0.0.1',
+                            int(sys.argv[2]) if len(sys.argv) > 2 else 8080))
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] == ['--self-test']:
+        import python_ta
+
+        python_ta.check_all(config={
+            'extra-imports': ['python_ta.contracts', 'asyncio', 'bisect', 'json', 'sys', 'time',
+                              'numpy', 'constants', 'batch', 'cube', 'distribution',
+                              'user'],
+            'allowed-io': ['run_service'],
+            'max-line-length': 100,
+            # W0703 (broad-except): a failed batch is handed to every request waiting for it, and
+            # every failed request is answered with a 500
+            'disable': ['R1705', 'C0200', 'W0703']
+        })
+
+        import python_ta.contracts
+
+        python_ta.contracts.check_all_contracts()
+
+        import doctest
+
+        doctest.testmod()
+    else:
+        main()
@@ -0,0 +1,245 @@
+# -*- coding: <UTF-8> -*-
+"""Your Anxiety During COVID-19: sketch
+
+Module Description
+==================
+This module defines the QuantileSketch class -- a KLL quantile sketch that summarizes the
+distribution of a stream of scores in bounded memory. Sketches of different parts of a dataset,
+such as the shards read in parallel or the records appended since the last run, can be merged into
+the sketch of the whole dataset. RUNNING THIS FILE TAKES NO EFFECT. IT SHOULD ONLY BE IMPORTED.
+
+Copyright and Usage Information
+===============================
+This project is licensed under the GNU General Public License v3.0.
+    Permissions of this strong copyleft license are conditioned on making available complete source
+    code of licensed works and modifications, which include larger works using a licensed work,
+    under the same license. Copyright and license notices must be preserved. Contributors provide an
+    express grant of patent rights.
+
+Authors (by alphabetical order):
+  - Faruk, Fardin   https://github.com/Fard-Faru
+  - Hsieh, Sharon   https://github.com/SharonHsieh22
+  - Li, Sinan       https://github.com/LanceLi1416/
+  - Zhan, Jeffery   https://github.com/jeffzhan
+"""
+import struct
+from typing import List, Tuple
+
+import numpy as np
+
+# The number of items kept in the top level of a sketch when no size is given. The rank error of
+# the sketch is about 3.5 / size at most, and it keeps less than 2 * size items.
+DEFAULT_SKETCH_SIZE = 200
+# The capacity of every lower level is this fraction of the capacity of the level above it
+_CAPACITY_RATIO = 2 / 3
+# The smallest capacity of a level
+_MIN_LEVEL_CAPACITY = 8
+
+# The header of a serialized sketch: the magic bytes, the version of the format, the size, the
+# number of scores, the number of compactions so far and the number of levels, followed by the
+# number of items in every level and the items
+_SKETCH_MAGIC = b'KLLS'
+_SKETCH_VERSION = 1
+_SKETCH_HEADER_FORMAT = '<4sHxxIqqI'
+
+
+class QuantileSketch:
+    """A mergeable KLL quantile sketch of a stream of scores.
+
+    The scores are kept in levels, where every item at level h stands for 2 ** h scores. When a
+    level grows past its capacity, it is sorted and every other item is moved to the level above,
+    alternating between the odd and the even items, so the sketch is deterministic.
+
+    Instance Attributes:
+      - size: the capacity of the top level, which trades the accuracy of the sketch for its size
+      - count: the number of scores added to the sketch
+
+    Representation Invariants:
+      - self.size >= _MIN_LEVEL_CAPACITY
+      - self.count == sum(len(self._levels[h]) * 2 ** h for h in range(len(self._levels)))
+
+    >>> sketch = QuantileSketch(50)
+    >>> sketch.update(np.arange(10000.0))
+    >>> abs(sketch.quantile(0.5) - 5000) < 10000 * 0.05, abs(sketch.rank(2500.0) - 0.25) < 0.05
+    (True, True)
+    >>> sketch.count, sketch.item_count() < 300
+    (10000, True)
+    """
+    size: int
+    count: int
+    # The items kept at every level
+    _levels: List[np.ndarray]
+    # The number of compactions so far, deciding whether the odd or the even items move up next
+    _compactions: int
+
+    def __init__(self, size: int = DEFAULT_SKETCH_SIZE) -> None:
+        """Initialize an empty sketch
+
+        Preconditions:
+          - size >= _MIN_LEVEL_CAPACITY
+        """
+        self.size = size
+        self.count = 0
+        self._levels = [np.empty(0)]
+        self._compactions = 0
+
+    def update(self, scores: np.ndarray) -> None:
+        """Add the scores to the sketch"""
+        if len(scores) == 0:
+            return
+        self._levels[0] = np.concatenate([self._levels[0], np.asarray(scores, dtype=np.float64)])
+        self.count = self.count + len(scores)
+        self._compress()
+
+    def merge(self, other: 'QuantileSketch') -> None:
+        """Add all the scores summarized by the other sketch to this sketch.
+
+        Raise ValueError if the sketches have different sizes.
+
+        >>> first, second, whole = QuantileSketch(20), QuantileSketch(20), QuantileSketch(20)
+        >>> first.update(np.arange(0.0, 500.0))
+        >>> second.update(np.arange(500.0, 1000.0))
+        >>> whole.update(np.arange(0.0, 1000.0))
+        >>> first.merge(second)
+        >>> first.count, abs(first.quantile(0.9) - whole.quantile(0.9)) < 1000 * 0.1
+        (1000, True)
+        """
+        if other.size != self.size:
+            raise ValueError(f'Cannot merge a sketch of size {other.size} into one of size '
+                             f'{self.size}')
+        for h in range(len(other._levels)):
+            if h < len(self._levels):
+                self._levels[h] = np.concatenate([self._levels[h], other._levels[h]])
+            else:
+                self._levels.append(other._levels[h].copy())
+        self.count = self.count + other.count
+        self._compactions = self._compactions + other._compactions
+        self._compress()
+
+    def rank(self, score: float) -> float:
+        """Return the estimated fraction of the scores that are at most the given score, or 0.5 if
+        the sketch is empty.
+        """
+        if self.count == 0:
+            return 0.5
+        # ACCUMULATOR weight_so_far: the weight of the items at most the score in the levels so far
+        weight_so_far = 0
+        for h in range(len(self._levels)):
+            weight_so_far += int(np.count_nonzero(self._levels[h] <= score)) << h
+        return weight_so_far / self.count
+
+    def quantile(self, fraction: float) -> float:
+        """Return the estimated score below which the given fraction of the scores lie, or nan if
+        the sketch is empty.
+
+        Preconditions:
+          - 0 <= fraction <= 1
+        """
+        if self.count == 0:
+            return float('nan')
+        items, weights = self._weighted_items()
+        order = np.argsort(items, kind='stable')
+        cumulative_weights = np.cumsum(weights[order])
+        position = int(np.searchsorted(cumulative_weights, fraction * self.count, side='left'))
+        return float(items[order[min(position, len(items) - 1)]])
+
+    def item_count(self) -> int:
+        """Return the number of items kept by the sketch"""
+        return sum(len(level) for level in self._levels)
+
+    def to_bytes(self) -> bytes:
+        """Return the sketch serialized into bytes, which can be read back by from_bytes.
+
+        >>> sketch = QuantileSketch(20)
+        >>> sketch.update(np.arange(100.0))
+        >>> copy = QuantileSketch.from_bytes(sketch.to_bytes())[0]
+        >>> copy.count, copy.quantile(0.3) == sketch.quantile(0.3)
+        (100, True)
+        >>> copy.to_bytes() == sketch.to_bytes()
+        True
+        """
+        header = struct.pack(_SKETCH_HEADER_FORMAT, _SKETCH_MAGIC, _SKETCH_VERSION, self.size,
+                             self.count, self._compactions, len(self._levels))
+        level_sizes = np.array([len(level) for level in self._levels], dtype='<u4')
+        return header + level_sizes.tobytes() + \
+            b''.join(level.astype('<f8').tobytes() for level in self._levels)
+
+    @staticmethod
+    def from_bytes(buffer: bytes, offset: int = 0) -> Tuple['QuantileSketch', int]:
+        """Return the sketch serialized by to_bytes at the given offset of the buffer, and the
+        offset of the end of it.
+
+        Raise ValueError if there is no serialized sketch of the current version at the offset.
+        """
+        magic, version, size, count, compactions, level_count = \
+            struct.unpack_from(_SKETCH_HEADER_FORMAT, buffer, offset)
+        if magic != _SKETCH_MAGIC or version != _SKETCH_VERSION:
+            raise ValueError(f'There is no version {_SKETCH_VERSION} sketch at offset {offset}')
+        offset = offset + struct.calcsize(_SKETCH_HEADER_FORMAT)
+        level_sizes = np.frombuffer(buffer, dtype='<u4', count=level_count, offset=offset)
+        offset = offset + level_sizes.nbytes
+
+        sketch = QuantileSketch(size)
+        sketch.count, sketch._compactions, sketch._levels = count, compactions, []
+        for level_size in level_sizes:
+            sketch._levels.append(np.frombuffer(buffer, dtype='<f8', count=int(level_size),
+                                                offset=offset).astype(np.float64))
+            offset = offset + 8 * int(level_size)
+        return sketch, offset
+
+    def _weighted_items(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the items of all levels, and the number of scores every item stands for"""
+        items = np.concatenate(self._levels)
+        weights = np.concatenate([np.full(len(self._levels[h]), 1 << h, dtype=np.int64)
+                                  for h in range(len(self._levels))])
+        return items, weights
+
+    def _capacity(self, level: int) -> int:
+        """Return the capacity of the level, which depends on the number of levels"""
+        depth = len(self._levels) - 1 - level
+        return max(_MIN_LEVEL_CAPACITY, int(self.size * _CAPACITY_RATIO ** depth))
+
+    def _compress(self) -> None:
+        """Compact every level that is over its capacity, from the lowest level up"""
+        level = 0
+        while level < len(self._levels):
+            if len(self._levels[level]) > self._capacity(level):
+                self._compact(level)
+                # Adding a level lowers the capacity of the levels below, so start over
+                level = 0
+            else:
+                level = level + 1
+
+    def _compact(self, level: int) -> None:
+        """Move every other item of the sorted level to the level above, keeping one item at the
+        level if it has an odd number of items.
+        """
+        if level + 1 == len(self._levels):
+            self._levels.append(np.empty(0))
+
+        items = np.sort(self._levels[level])
+        kept, items = items[:len(items) % 2], items[len(items) % 2:]
+        self._levels[level + 1] = np.concatenate([self._levels[level + 1],
+                                                  items[self._compactions % 2::2]])
+        self._levels[level] = kept
+        self._compactions = self._compactions + 1
+
+
+if __name__ == '__main__':
+    import python_ta
+
+    python_ta.check_all(config={
+        'extra-imports': ['python_ta.contracts', 'struct', 'numpy'],
+        'allowed-io': [],
+        'max-line-length': 100,
+        # W0212 (protected-access): sketches of the same class read each other's levels
+        'disable': ['R1705', 'C0200', 'W0212']
+    })
+
+    import python_ta.contracts
+
+    python_ta.contracts.check_all_contracts()
+
+    import doctest
+
+    doctest.testmod()
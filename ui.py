@@ -22,16 +22,32 @@ Authors (by alphabetical order):
 """
 import os
 import platform
-from typing import Dict, List, Tuple, Union
+from collections import OrderedDict
+from typing import Callable, Dict, List, Tuple, Union
 
+import numpy as np
 import pyqtgraph as pg
 from PyQt5 import QtCore, QtWidgets, QtGui
 from PyQt5.QtGui import QPixmap
 
 import constants
-from data import load_json_data, calculate_extrema
+from bootstrap import get_interval_file_name, load_confidence_intervals
+from cube import get_cube_file_name, load_identity_cube, IdentityCube
+from data import load_json_data, load_binary_data, get_model_file_name
+from distribution import get_distribution_file_name, load_score_distribution, ScoreDistribution, \
+    get_population_file_name, load_population_distribution, PopulationDistribution
+from batch import sweep_identities
 from gauge import GaugeWidget
-from user import User, get_user_percentage
+from user import User, ScoreModel, get_user_percentage, get_user_percentile
+
+# The input fields of the identities drawn on the user's avatar
+_AVATAR_INPUTS = (0, 1, 2, 3, 4, 7, 8)
+# The number of identities changing the user's anxiety score the most shown as levers
+_LEVER_COUNT = 5
+# The shortest time between two updates of the output in milliseconds, which is a frame at 60 Hz
+_FRAME_INTERVAL = 16
+# The number of composited cartoon characters kept by the avatar cache
+_AVATAR_CACHE_SIZE = 64
 
 
 def _create_title_label() -> QtWidgets.QLabel:
@@ -46,6 +62,64 @@ def _create_title_label() -> QtWidgets.QLabel:
     return lbl_title
 
 
+class UpdateScheduler:
+    """Coalesces the requests to update the output of a window into at most one update per frame.
+
+    The first request after a quiet frame runs the update on the next turn of the event loop, with
+    a zero-delay timer, so nothing waits for a single change. The requests arriving before the
+    update runs, such as every step of a spin box being dragged, are coalesced into it, and the
+    next update waits until a frame has passed since the last one.
+
+    Instance Attributes:
+      - requests: the number of updates requested
+      - coalesced: the number of requests coalesced into an update that was already pending
+      - updates: the number of updates run
+      - skipped: the number of updates run that found that none of their inputs changed
+      - _update: the function updating the output, returning whether any of its inputs changed
+      - _timer: the single shot timer running the pending update
+      - _clock: the time since the last update ran
+
+    Representation Invariants:
+      - self.coalesced <= self.requests
+      - self.skipped <= self.updates
+    """
+    requests: int
+    coalesced: int
+    updates: int
+    skipped: int
+    _update: Callable[[], bool]
+    _timer: QtCore.QTimer
+    _clock: QtCore.QElapsedTimer
+
+    def __init__(self, update: Callable[[], bool], parent: QtCore.QObject) -> None:
+        self.requests, self.coalesced, self.updates, self.skipped = 0, 0, 0, 0
+        self._update = update
+        self._timer = QtCore.QTimer(parent)
+        self._timer.setSingleShot(True)
+        self._timer.setTimerType(QtCore.Qt.PreciseTimer)
+        self._timer.timeout.connect(self.flush)
+        self._clock = QtCore.QElapsedTimer()
+
+    def request(self) -> None:
+        """Request an update, which runs once the event loop is free and a frame has passed since
+        the last update, unless an update is already pending."""
+        self.requests += 1
+        if self._timer.isActive():
+            self.coalesced += 1
+        elif self._clock.isValid():
+            self._timer.start(max(_FRAME_INTERVAL - self._clock.elapsed(), 0))
+        else:
+            self._timer.start(0)
+
+    def flush(self) -> None:
+        """Run the pending update now, or an update if none is pending"""
+        self._timer.stop()
+        self._clock.start()
+        self.updates += 1
+        if not self._update():
+            self.skipped += 1
+
+
 class MainWindow(QtWidgets.QMainWindow):
     """The main window of the GUI interface.
 
@@ -60,25 +134,82 @@ class MainWindow(QtWidgets.QMainWindow):
                            order: User avatar (cartoon image), Gauge, Progress bar of user in
                            identity, Textual output
                        their identities, and the selection menus specifying the fields to output.
+      - _lbl_levers: the panel listing the identities that would change the user's anxiety score the
+                     most if the user had them instead
+      - _chk_real_percentile: the check box selecting whether the percentages shown are the real
+                              percentiles of the user among the respondents, instead of the user's
+                              position between the lowest and highest possible anxiety scores
+      - _chk_population_percentile: the check box selecting whether the percentages shown are the
+                                    percentiles of the user among the population, see
+                                    population_distribution, instead of the user's position between
+                                    the lowest and highest possible anxiety scores. At most one of
+                                    the percentile check boxes is checked.
       - _user: an instance of the User class from the user module that stores the user's identities
                and the corresponding logic
       - anxiety_data: the data processed from the data module
-      - extrema: the maximum and minimum anxiety score in the processed data
+      - anxiety_cube: the identity cube processed from the data module, or None if it has not been
+                      processed, in which case the user's anxiety score is estimated from
+                      anxiety_data alone
+      - score_distribution: the sorted scores of the respondents processed from the data module,
+                            or None if they have not been processed
+      - population_distribution: the distribution of the anxiety score over the population
+                                 processed from the data module, or None if it has not been
+                                 processed. It is not used with anxiety_cube, whose scores it does
+                                 not rank.
+      - anxiety_intervals: the confidence intervals of the averages in anxiety_data processed from
+                           the data module, drawn as error bars, or None if they have not been
+                           processed
+      - score_model: the model of anxiety_data, with the extrema and the lowest and highest score
+                     of every identity group precomputed, which can be shared with other callers
+      - _shown_percentages: the percentage shown on the gauge and the one shown on the progress
+                            bar, so they are only updated when they change
+      - _scored_codes: the user's encoded identities at the last update of the output, or None
+                       before the first update, so only the identities that changed are scored
+      - _contributions: the contribution of every identity group, or of every pair of identity
+                        groups with anxiety_cube, to the user's anxiety score at the last update of
+                        the output, or None before the first update, see User.get_contributions
+      - _compared: the compared identity group and the distribution of the percentages at the
+                   last update of the output
+      - update_scheduler: the scheduler coalescing the changes of the inputs into at most one
+                          update of the output per frame, counting the updates coalesced
+      - _avatar_cache: the least recently used cache of the composited cartoon characters, keyed
+                       by the images they are drawn from, with the most recently used last
+      - _avatar_layers: the decoded images the cartoon characters are drawn from, keyed by their
+                        paths relative to constants.IMAGE_PATH
+      - _shown_avatar: the images the cartoon character shown is drawn from, or None before the
+                       first one is drawn
 
     Representation Invariants:
       - len(self._graphical_output) == 4
       - len(self._id_group_labels) == constants.NUMBER_OF_IDENTITIES
       - len(self._input_fields) == constants.NUMBER_OF_IDENTITIES + 2
       - len(self.anxiety_data) == constants.NUMBER_OF_IDENTITIES
-      - self.extrema[0] < self.extrema[1]
+      - self.score_model.data is self.anxiety_data
+      - self.score_model.extrema[0] < self.score_model.extrema[1]
+      - len(self._avatar_cache) <= _AVATAR_CACHE_SIZE
     """
     _id_group_labels: List[QtWidgets.QLabel]
     _input_fields: List[Union[QtWidgets.QSpinBox, QtWidgets.QComboBox]]
     _plt_data: pg.GraphicsLayoutWidget
     _graphical_output: List[Union[QtWidgets.QLabel, GaugeWidget, QtWidgets.QProgressBar]]
+    _lbl_levers: QtWidgets.QLabel
+    _chk_real_percentile: QtWidgets.QCheckBox
+    _chk_population_percentile: QtWidgets.QCheckBox
     _user: User
     anxiety_data: List[Dict[str, float]]
-    extrema: Tuple[float, float]
+    anxiety_cube: Union[IdentityCube, None]
+    score_distribution: Union[ScoreDistribution, None]
+    population_distribution: Union[PopulationDistribution, None]
+    anxiety_intervals: Union[List[Dict[str, List[float]]], None]
+    score_model: ScoreModel
+    _shown_percentages: Tuple[float, float]
+    _scored_codes: Union[bytes, None]
+    _contributions: Union[List[float], None]
+    _compared: Tuple[str, Union[ScoreDistribution, PopulationDistribution, None]]
+    update_scheduler: UpdateScheduler
+    _avatar_cache: OrderedDict[Tuple[str, ...], QPixmap]
+    _avatar_layers: Dict[str, QtGui.QImage]
+    _shown_avatar: Union[Tuple[str, ...], None]
 
     def __init__(self, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
@@ -106,6 +237,9 @@ class MainWindow(QtWidgets.QMainWindow):
             QtWidgets.QComboBox(),  # 11 data visualization selection
             QtWidgets.QComboBox()  # 12 user visualization selection
         ]
+        self._lbl_levers = QtWidgets.QLabel()
+        self._chk_real_percentile = QtWidgets.QCheckBox('Real percentile')
+        self._chk_population_percentile = QtWidgets.QCheckBox('Population percentile')
         # Visualization -------------------------------------------------------------------------- |
         # Title of program
         lbl_title = _create_title_label()
@@ -121,8 +255,40 @@ class MainWindow(QtWidgets.QMainWindow):
         # Data storage --------------------------------------------------------------------------- |
         self._user = User([18, 'Male', 'None', 'Not employed', 'Afghanistan', 'Yes', 'Single',
                            'Yes', 'Life carries on as usual', 0, 0])
-        self.anxiety_data = load_json_data(constants.REAL_DATA_JSON_FILE)
-        self.extrema = calculate_extrema(self.anxiety_data)
+        if os.path.isfile(get_model_file_name(constants.REAL_DATA_JSON_FILE)):
+            self.anxiety_data = load_binary_data(get_model_file_name(constants.REAL_DATA_JSON_FILE))
+        else:
+            self.anxiety_data = load_json_data(constants.REAL_DATA_JSON_FILE)
+        cube_file_name = get_cube_file_name(constants.REAL_DATA_JSON_FILE)
+        if os.path.isfile(cube_file_name):
+            self.anxiety_cube = load_identity_cube(cube_file_name)
+        else:
+            self.anxiety_cube = None
+        distribution_file_name = get_distribution_file_name(constants.REAL_DATA_JSON_FILE)
+        if os.path.isfile(distribution_file_name):
+            self.score_distribution = load_score_distribution(distribution_file_name)
+        else:
+            self.score_distribution = None
+        population_file_name = get_population_file_name(constants.REAL_DATA_JSON_FILE)
+        if os.path.isfile(population_file_name):
+            self.population_distribution = load_population_distribution(population_file_name)
+        else:
+            self.population_distribution = None
+        interval_file_name = get_interval_file_name(constants.REAL_DATA_JSON_FILE)
+        if os.path.isfile(interval_file_name):
+            self.anxiety_intervals = load_confidence_intervals(interval_file_name)
+        else:
+            self.anxiety_intervals = None
+        self.score_model = ScoreModel(self.anxiety_data)
+        # Outside the range of the percentages, so the first update shows them
+        self._shown_percentages = (-1.0, -1.0)
+        self._scored_codes = None
+        self._contributions = None
+        self._compared = ('', None)
+        self.update_scheduler = UpdateScheduler(self._update_output, self)
+        self._avatar_cache = OrderedDict()
+        self._avatar_layers = {}
+        self._shown_avatar = None
 
         # --------------------------------------- Behaviour ----------------------------------------
         # Main Window ---------------------------------------------------------------------------- |
@@ -133,6 +299,11 @@ class MainWindow(QtWidgets.QMainWindow):
         self._graphical_output[0].setAlignment(QtCore.Qt.AlignCenter)
         self._graphical_output[2].setRange(0, 100)
         self._graphical_output[3].setWordWrap(True)
+        self._lbl_levers.setWordWrap(True)
+        self._lbl_levers.setAlignment(QtCore.Qt.AlignLeft | QtCore.Qt.AlignVCenter)
+        self._lbl_levers.setToolTip(
+            'The identities that would change your anxiety score the most if they were yours '
+            'instead, and how much your percentage in the population would change.')
         # Identity input ------------------------------------------------------------------------- |
         self._setup_id_group_labels()
         self._setup_intractable_values()
@@ -146,6 +317,21 @@ class MainWindow(QtWidgets.QMainWindow):
         lbl_status_bar.setFont(
             QtGui.QFont(constants.BODY_FONT_NAME, constants.BODY_FONT_SIZE))
         status_bar.addWidget(lbl_status_bar)
+        self._chk_real_percentile.setToolTip(
+            'Compare yourself with the real respondents of the survey, instead of with the lowest '
+            'and highest possible anxiety scores.')
+        self._chk_real_percentile.setFont(
+            QtGui.QFont(constants.BODY_FONT_NAME, constants.BODY_FONT_SIZE))
+        self._chk_real_percentile.setEnabled(self.score_distribution is not None)
+        status_bar.addPermanentWidget(self._chk_real_percentile)
+        self._chk_population_percentile.setToolTip(
+            'Compare yourself with a population where every identity is as common as among the '
+            'respondents, instead of with the lowest and highest possible anxiety scores.')
+        self._chk_population_percentile.setFont(
+            QtGui.QFont(constants.BODY_FONT_NAME, constants.BODY_FONT_SIZE))
+        self._chk_population_percentile.setEnabled(self.population_distribution is not None and
+                                                   self.anxiety_cube is None)
+        status_bar.addPermanentWidget(self._chk_population_percentile)
 
         # ------------------------------- Connect Signals and Slots --------------------------------
         self._setup_slots()
@@ -160,7 +346,8 @@ class MainWindow(QtWidgets.QMainWindow):
         # Main Layout ---------------------------------------------------------------------------- |
         grid_central.addWidget(frm_id, 0, 0, 3, 1)
         grid_central.addWidget(lbl_title, 0, 1, 1, 2)
-        grid_central.addWidget(self._graphical_output[0], 1, 1, 2, 2)
+        grid_central.addWidget(self._graphical_output[0], 1, 1, 2, 1)
+        grid_central.addWidget(self._lbl_levers, 1, 2, 2, 1)
         grid_central.addWidget(self._input_fields[11], 3, 0, 1, 1)
         grid_central.addWidget(self._graphical_output[1], 3, 1, 3, 1)
         grid_central.addWidget(self._input_fields[12], 3, 2, 1, 1)
@@ -179,7 +366,7 @@ class MainWindow(QtWidgets.QMainWindow):
         self._setup_color()
 
         self._plot_data()
-        self._update_output()
+        self.update_scheduler.flush()
 
     def _setup_id_group_labels(self) -> None:
         tool_tips = [
@@ -229,6 +416,8 @@ class MainWindow(QtWidgets.QMainWindow):
         # Textual output
         self._graphical_output[3].setFont(
             QtGui.QFont(constants.BODY_FONT_NAME, constants.BODY_FONT_SIZE))
+        self._lbl_levers.setFont(
+            QtGui.QFont(constants.BODY_FONT_NAME, constants.BODY_FONT_SIZE - 2))
 
     def _setup_color(self) -> None:
         """Setup color for all the widgets"""
@@ -286,7 +475,7 @@ class MainWindow(QtWidgets.QMainWindow):
         self._input_fields[10].valueChanged.connect(
             lambda: self._user.set_isolation_kids(self._input_fields[10].value()))
         for i in [0, 9, 10]:
-            self._input_fields[i].valueChanged.connect(self._update_output)
+            self._input_fields[i].valueChanged.connect(self.update_scheduler.request)
 
         # WARNING: Due to how Qt works with its signals and lots, the following block WILL NOT WORK
         # IN A LOOP, as every 'i' in the expression would be stuck with 8 after the initial setup,
@@ -309,24 +498,33 @@ class MainWindow(QtWidgets.QMainWindow):
         self._input_fields[8].currentIndexChanged.connect(lambda: self._user.identity.__setitem__(
             constants.IDENTITY_NAMES[8], self._input_fields[8].currentText()))
         for i in range(1, 9):
-            self._input_fields[i].currentIndexChanged.connect(self._update_output)
+            self._input_fields[i].currentIndexChanged.connect(self.update_scheduler.request)
 
         # Update visual
         self._input_fields[11].currentIndexChanged.connect(self._plot_data)
-        self._input_fields[12].currentIndexChanged.connect(self._update_output)
+        self._input_fields[12].currentIndexChanged.connect(self.update_scheduler.request)
+        self._chk_real_percentile.toggled.connect(lambda: self._select_percentile(
+            self._chk_real_percentile, self._chk_population_percentile))
+        self._chk_population_percentile.toggled.connect(lambda: self._select_percentile(
+            self._chk_population_percentile, self._chk_real_percentile))
+        self._chk_real_percentile.stateChanged.connect(self.update_scheduler.request)
+        self._chk_population_percentile.stateChanged.connect(self.update_scheduler.request)
         # self._cbo_data_graph.currentIndexChanged.connect(self._plot_data)
         # self._cbo_user_graph.currentIndexChanged.connect(self._update_output)
 
     def _plot_data(self) -> None:
-        """Plots the data from the csv file"""
+        """Plots the data from the csv file, with the confidence interval of every average as an
+        error bar if the intervals have been processed"""
         self._plt_data.clear()  # clear current graph
 
         id_index = self._input_fields[11].currentIndex()
+        options = constants.IDENTITY_GROUP_OPTIONS_LIST[id_index]
+        averages = [self.anxiety_data[id_index][option] for option in options]
 
         bar_graph = pg.BarGraphItem(
-            y=list(range(len(constants.IDENTITY_GROUP_OPTIONS_LIST[id_index]))),
+            y=list(range(len(options))),
             x0=0,
-            width=list(self.anxiety_data[id_index].values()),
+            width=averages,
             height=0.75, brush=constants.PLOT_FOREGROUND
         )
 
@@ -340,8 +538,50 @@ class MainWindow(QtWidgets.QMainWindow):
         # plot_item.setTitle(id_group)
         plot_item.addItem(bar_graph)
 
+        if self.anxiety_intervals is not None:
+            intervals = [self.anxiety_intervals[id_index][option] for option in options]
+            error_bars = pg.ErrorBarItem(
+                x=np.array(averages), y=np.arange(len(options)),
+                left=np.array([average - interval[0]
+                               for average, interval in zip(averages, intervals)]),
+                right=np.array([interval[1] - average
+                                for average, interval in zip(averages, intervals)]),
+                beam=0.3, pen=pg.mkPen((0, 0, 0, 255))
+            )
+            plot_item.addItem(error_bars)
+
     def _draw_user_avatar(self) -> None:
-        """Draws the user's cartoon character based on their input identity"""
+        """Draws the user's cartoon character based on their input identity.
+
+        The composited character is looked up in the avatar cache by the images it is drawn from,
+        and only composited from the decoded images when it is not cached.
+        """
+        layers = self._get_avatar_layers()
+        if layers == self._shown_avatar:
+            return
+
+        pixmap = self._avatar_cache.pop(layers, None)
+        if pixmap is None:
+            image = self._load_avatar_layer(layers[0]).convertToFormat(
+                QtGui.QImage.Format_ARGB32).copy()
+            painter = QtGui.QPainter()
+            painter.begin(image)
+            for layer in layers[1:]:
+                painter.drawImage(0, 0, self._load_avatar_layer(layer))
+            painter.end()
+            pixmap = QPixmap.fromImage(image)
+            if len(self._avatar_cache) >= _AVATAR_CACHE_SIZE:
+                self._avatar_cache.popitem(last=False)
+        # The most recently shown characters are at the end of the cache
+        self._avatar_cache[layers] = pixmap
+        self._shown_avatar = layers
+        self._graphical_output[0].setPixmap(pixmap)
+
+    def _get_avatar_layers(self) -> Tuple[str, ...]:
+        """Return the images the user's cartoon character is drawn from, in the order they are
+        drawn, as paths relative to constants.IMAGE_PATH. The first image is the flag the others
+        are drawn on. The character depends on nothing else, so these identify it.
+        """
         if self._user.identity[constants.IDENTITY_NAMES[4]] == 'Côte d’Ivoire':
             flag_name = 'Cote dIvoire'
         else:
@@ -360,62 +600,41 @@ class MainWindow(QtWidgets.QMainWindow):
         else:
             clothes_name = 'employed'
 
-        pxm_flag = QtGui.QImage(
-            constants.os.path.join(constants.IMAGE_PATH, f'Flags/{flag_name}.png')).convertToFormat(
-            QtGui.QImage.Format_ARGB32)
-        pxm_hair = QtGui.QImage(
-            constants.os.path.join(constants.IMAGE_PATH, f'Character/hair/{hair_name}.png'))
-        pxm_face = QtGui.QImage(
-            constants.os.path.join(constants.IMAGE_PATH, 'Character/face.png'))
-        pxm_cloth = QtGui.QImage(
-            constants.os.path.join(constants.IMAGE_PATH, f'Character/{clothes_name}.png'))
-        pmx_edu = []
+        layers = [f'Flags/{flag_name}.png', f'Character/{clothes_name}.png']
+        # retired vest
+        if self._user.identity[constants.IDENTITY_NAMES[3]] == constants.DEM_EMPLOYMENT[-1]:
+            layers.extend(['Character/retired.png', 'Character/face.png'])
+        # face and hair
+        layers.extend(['Character/face.png', f'Character/hair/{hair_name}.png'])
 
         index = constants.DEM_EDU.index(self._user.identity[constants.IDENTITY_NAMES[2]])
         # PhD
         if index > 5:
-            pmx_edu.append(QtGui.QImage(
-                constants.os.path.join(constants.IMAGE_PATH, 'Character/school4.png')))
+            layers.append('Character/school4.png')
         # college to ~
         if index > 4:
-            pmx_edu.append(QtGui.QImage(
-                constants.os.path.join(constants.IMAGE_PATH, 'Character/school3.png')))
+            layers.append('Character/school3.png')
         # 12 to some college to ~
         if index > 2:
-            pmx_edu.append(QtGui.QImage(
-                constants.os.path.join(constants.IMAGE_PATH, 'Character/school2.png')))
+            layers.append('Character/school2.png')
         # 6 to 9 to ~
         if index > 0:
-            pmx_edu.append(QtGui.QImage(
-                constants.os.path.join(constants.IMAGE_PATH, 'Character/school1.png')))
-
-        painter = QtGui.QPainter()
-
-        painter.begin(pxm_flag)
-        # cloth
-        painter.drawImage(0, 0, pxm_cloth)
-        # retired vest
-        if self._user.identity[constants.IDENTITY_NAMES[3]] == constants.DEM_EMPLOYMENT[-1]:
-            painter.drawImage(0, 0, QtGui.QImage(
-                constants.os.path.join(constants.IMAGE_PATH, 'Character/retired.png')))
-            painter.drawImage(0, 0, pxm_face)
-        # face
-        painter.drawImage(0, 0, pxm_face)
-        # hair
-        painter.drawImage(0, 0, pxm_hair)
-        # education
-        for pmx_edu_comp in pmx_edu:
-            painter.drawImage(0, 0, pmx_edu_comp)
+            layers.append('Character/school1.png')
 
         # risk group or under isolation
         if self._user.identity[constants.IDENTITY_NAMES[7]] != constants.RISK_GROUP[1] or \
                 self._user.identity[constants.IDENTITY_NAMES[8]] in constants.DEM_ISOLATION[2:]:
-            painter.drawImage(0, 0, QtGui.QImage(
-                constants.os.path.join(constants.IMAGE_PATH, 'Character/mask.png')))
-
-        painter.end()
-
-        self._graphical_output[0].setPixmap(QPixmap.fromImage(pxm_flag))
+            layers.append('Character/mask.png')
+        return tuple(layers)
+
+    def _load_avatar_layer(self, layer: str) -> QtGui.QImage:
+        """Return the decoded image at the path relative to constants.IMAGE_PATH, which is only
+        read from the disk the first time."""
+        image = self._avatar_layers.get(layer)
+        if image is None:
+            image = QtGui.QImage(os.path.join(constants.IMAGE_PATH, layer))
+            self._avatar_layers[layer] = image
+        return image
 
     def _update_gauge(self, percentage: float) -> None:
         """Calculate the user's anxiety score, then update the gauge
@@ -461,29 +680,103 @@ class MainWindow(QtWidgets.QMainWindow):
         textual_output = textual_output + f'of the population who chose "{id_group}" as their ' \
                                           f'"{self._input_fields[12].currentText().lower()}" ' \
                                           'identity.'
-        self._graphical_output[3].setText(textual_output)
-
-    def _update_output(self) -> None:
-        """Updates all the output (gauge, progress bar and textual)."""
-        self._user.estimate_anxiety_score(self.anxiety_data)
-
-        percentage = (self._user.get_anxiety_score() - self.extrema[0]) / \
-                     (self.extrema[1] - self.extrema[0]) * 100
-        id_percentage = get_user_percentage(self._user,
-                                            self._input_fields[12].currentText(),
-                                            self.anxiety_data)
-        self._update_gauge(percentage)
-        self._plot_user(id_percentage)
+        if textual_output != self._graphical_output[3].text():
+            self._graphical_output[3].setText(textual_output)
+
+    def _display_levers(self) -> None:
+        """Display the identities that would change the user's anxiety score the most, with the
+        change of the percentage shown on the gauge, from one sweep over every other identity."""
+        sweep = sweep_identities(list(self._user.codes), self._input_fields[12].currentText(),
+                                 self.score_model, self.anxiety_cube, self._get_distribution())
+
+        # The gauge shows the percentages clamped between 0 and 100, see _update_output
+        percentage = min(max(sweep.base[1], 0), 100)
+        text = '<b>Biggest levers</b>'
+        for id_group, identity, _, percentage_change in sweep.levers(_LEVER_COUNT):
+            percentage_change = min(max(sweep.base[1] + percentage_change, 0), 100) - percentage
+            text = text + f'<br>{id_group}: {identity} <b>{percentage_change:+.2f}%</b>'
+        if text != self._lbl_levers.text():
+            self._lbl_levers.setText(text)
+
+    def _select_percentile(self, selected: QtWidgets.QCheckBox,
+                           other: QtWidgets.QCheckBox) -> None:
+        """Uncheck the other percentile check box when the selected one is checked, so the
+        percentages shown are taken from at most one distribution."""
+        if selected.isChecked():
+            other.setChecked(False)
+
+    def _get_distribution(self) -> Union[ScoreDistribution, PopulationDistribution, None]:
+        """Return the distribution the percentages shown are taken from: the real respondents or
+        the population, depending on the percentile check box checked, or None if neither is
+        checked and the percentages are the user's position between the lowest and highest possible
+        anxiety scores."""
+        if self._chk_real_percentile.isChecked():
+            return self.score_distribution
+        elif self._chk_population_percentile.isChecked():
+            return self.population_distribution
+        else:
+            return None
+
+    def _update_output(self) -> bool:
+        """Updates the output (gauge, progress bar, textual and avatar) affected by the inputs that
+        changed since the last update, and return whether any of them changed. This is run by
+        update_scheduler, which coalesces the changes of the inputs.
+
+        Only the contributions of the identities that changed to the user's anxiety score are
+        replaced, and when only the compared identity group or the percentile check boxes changed,
+        the score is not estimated again. Nothing is updated when the changes of the inputs did not
+        change the user's identities, such as an age within the same age group.
+        """
+        codes = bytes(self._user.codes)
+        if self._scored_codes is None or self._contributions is None:
+            self._user.estimate_anxiety_score(self.anxiety_data, self.anxiety_cube)
+            self._contributions = self._user.get_contributions(self.anxiety_data,
+                                                               self.anxiety_cube)
+            changed = list(range(constants.NUMBER_OF_IDENTITIES))
+        else:
+            changed = [i for i in range(constants.NUMBER_OF_IDENTITIES)
+                       if codes[i] != self._scored_codes[i]]
+            for id_index in changed:
+                self._user.update_anxiety_score(id_index, self._contributions, self.anxiety_data,
+                                                self.anxiety_cube)
+
+        distribution = self._get_distribution()
+        compared = (self._input_fields[12].currentText(), distribution)
+        if changed == [] and compared[0] == self._compared[0] and \
+                compared[1] is self._compared[1]:
+            return False
+        self._scored_codes, self._compared = codes, compared
+
+        if distribution is not None:
+            percentage = get_user_percentile(self._user, None, distribution)
+            id_percentage = get_user_percentile(self._user, self._input_fields[12].currentText(),
+                                                distribution)
+        else:
+            percentage = self.score_model.percentage(self._user.get_anxiety_score())
+            id_percentage = get_user_percentage(self._user,
+                                                self._input_fields[12].currentText(),
+                                                self.score_model)
+        # The score estimated from the identity cube can fall outside the extrema of anxiety_data
+        percentage, id_percentage = min(max(percentage, 0), 100), min(max(id_percentage, 0), 100)
+        if percentage != self._shown_percentages[0]:
+            self._update_gauge(percentage)
+        if id_percentage != self._shown_percentages[1]:
+            self._plot_user(id_percentage)
+        self._shown_percentages = (percentage, id_percentage)
         self._display_textual_output(percentage, id_percentage)
-        self._draw_user_avatar()
+        self._display_levers()
+        if any(id_index in _AVATAR_INPUTS for id_index in changed):
+            self._draw_user_avatar()
+        return True
 
 
 if __name__ == '__main__':
     import python_ta
 
     python_ta.check_all(config={
-        'extra-imports': ['python_ta.contracts', 'os', 'platform', 'pyqtgraph', 'PyQt5',
-                          'PyQt5.QtGui', 'constants', 'data', 'gauge', 'user'],
+        'extra-imports': ['python_ta.contracts', 'os', 'platform', 'collections', 'numpy',
+                          'pyqtgraph', 'PyQt5', 'PyQt5.QtGui', 'constants', 'bootstrap', 'cube',
+                          'data', 'distribution', 'batch', 'gauge', 'user'],
         'allowed-io': [],
         'max-line-length': 100,
         # 'disable': ['R1705', 'C0200']
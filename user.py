@@ -3,7 +3,8 @@
 
 Module Description
 ==================
-This file defines the User class -- a class that stores the user's information. It also provides an
+This file defines the User class -- a class that stores the user's information, and the ScoreModel
+class -- a class that stores the processed data with the extrema precomputed. It also provides an
 interface for calculating the user's ranking in a specific identity group.
 
 Copyright and Usage Information
@@ -20,23 +21,133 @@ Authors (by alphabetical order):
   - Li, Sinan       https://github.com/LanceLi1416/
   - Zhan, Jeffery   https://github.com/jeffzhan
 """
-from typing import Dict, List, Union
+from typing import Dict, Iterator, List, Tuple, Union
 
 import constants
+from cube import IdentityCube
+from data import calculate_extrema
+from distribution import PopulationDistribution, ScoreDistribution
+
+# The index of every identity group in constants.IDENTITY_NAMES
+_NAME_INDICES = {name: i for i, name in enumerate(constants.IDENTITY_NAMES)}
+# The index of every identity in the options of its identity group, for every identity group
+_OPTION_INDICES = [{option: i for i, option in enumerate(options)}
+                   for options in constants.IDENTITY_GROUP_OPTIONS_LIST]
+
+
+class IdentityView:
+    """A dictionary-like view of the identities of a user, with the key being the name of the
+    identity group, and the value being the actual identity. Reading and updating the view reads
+    and updates the codes of the user.
+
+    Instance Attributes:
+      - codes: the index of every identity of the user in the options of its identity group
+
+    Representation Invariants:
+      - len(self.codes) == constants.NUMBER_OF_IDENTITIES
+
+    >>> view = IdentityView(bytearray(constants.NUMBER_OF_IDENTITIES))
+    >>> view['Gender'] = 'Female'
+    >>> view['Gender'], view.codes[1], len(view)
+    ('Female', 1, 11)
+    >>> view['Gender'] = 'Unknown'
+    Traceback (most recent call last):
+    ValueError: 'Unknown' is not an option of Gender
+    """
+    __slots__ = ('codes',)
+    codes: bytearray
+
+    def __init__(self, codes: bytearray) -> None:
+        """Initialize a view of the given codes"""
+        self.codes = codes
+
+    def __getitem__(self, id_group: str) -> str:
+        """Return the identity of the user in the identity group.
+
+        Raise KeyError if id_group is not the name of an identity group.
+        """
+        id_index = _NAME_INDICES[id_group]
+        return constants.IDENTITY_GROUP_OPTIONS_LIST[id_index][self.codes[id_index]]
+
+    def __setitem__(self, id_group: str, identity: str) -> None:
+        """Update the identity of the user in the identity group.
+
+        Raise KeyError if id_group is not the name of an identity group, and ValueError if the
+        identity is not an option of the identity group.
+        """
+        id_index = _NAME_INDICES[id_group]
+        if identity not in _OPTION_INDICES[id_index]:
+            raise ValueError(f'{identity!r} is not an option of {id_group}')
+        self.codes[id_index] = _OPTION_INDICES[id_index][identity]
+
+    def __contains__(self, id_group: object) -> bool:
+        """Return whether id_group is the name of an identity group"""
+        return id_group in _NAME_INDICES
+
+    def __iter__(self) -> Iterator[str]:
+        """Return an iterator over the names of the identity groups"""
+        return iter(constants.IDENTITY_NAMES)
+
+    def __len__(self) -> int:
+        """Return the number of identity groups"""
+        return constants.NUMBER_OF_IDENTITIES
+
+    def __eq__(self, other: object) -> bool:
+        """Return whether the other view or dictionary has the same identities as this view"""
+        if isinstance(other, IdentityView):
+            return self.codes == other.codes
+        return isinstance(other, dict) and dict(self.items()) == other
+
+    def __repr__(self) -> str:
+        """Return the identities of the user, in the same format as a dictionary"""
+        return repr(dict(self.items()))
+
+    def keys(self) -> List[str]:
+        """Return the names of the identity groups"""
+        return list(constants.IDENTITY_NAMES)
+
+    def values(self) -> List[str]:
+        """Return the identities of the user, in the order of the identity groups"""
+        return [options[code] for options, code in
+                zip(constants.IDENTITY_GROUP_OPTIONS_LIST, self.codes)]
+
+    def items(self) -> List[Tuple[str, str]]:
+        """Return the name of every identity group and the identity of the user in it"""
+        return list(zip(constants.IDENTITY_NAMES, self.values()))
+
+    def get(self, id_group: str, default: Union[str, None] = None) -> Union[str, None]:
+        """Return the identity of the user in the identity group, or default if id_group is not
+        the name of an identity group.
+        """
+        return self[id_group] if id_group in _NAME_INDICES else default
 
 
 class User:
     """The class storing the user's input
 
+    The identities are stored as the index of every identity in the options of its identity
+    group, one byte each, and the class has no instance dictionary, so millions of users fit in
+    memory.
+
     Instance Attributes:
-      - identity: a dictionary of identities, with the key being the name of the identity group, and
-                  the value being the actual identity
+      - codes: the index of every identity of the user in the options of its identity group, in
+               the order of constants.IDENTITY_NAMES
+      - identity: a dictionary-like view of the identities, with the key being the name of the
+                  identity group, and the value being the actual identity
       - _anxiety_score: the estimated anxiety score, calculated based on the given data
 
     Representation Invariants:
-      - all(key in constants.IDENTITY_GROUP_NAMES for key in self.identity.keys())
-      - all(self.identity[list(self.identity.keys())[i]] in
-            constants.IDENTITY_GROUP_OPTIONS_LIST[i] for i in range(len(self.identity)))
+      - len(self.codes) == constants.NUMBER_OF_IDENTITIES
+      - all(self.codes[i] < len(constants.IDENTITY_GROUP_OPTIONS_LIST[i])
+            for i in range(len(self.codes)))
+
+    >>> user = User([18, 'Female', 'None', 'Student', 'Canada', 'No', 'Single', 'No', \
+                     'Isolated', 3, 30])
+    >>> list(user.codes)
+    [0, 1, 0, 1, 31, 1, 0, 1, 2, 3, 12]
+    >>> user.identity['Gender'] = 'Male'
+    >>> user.identity['Gender'], user.codes[1]
+    ('Male', 0)
     """
     # dem_age: Age
     # - int
@@ -112,7 +223,8 @@ class User:
     # - int
     #     - 0 - 110
 
-    identity: Dict[str, str]
+    __slots__ = ('codes', '_anxiety_score')
+    codes: bytearray
 
     # The estimated anxiety score, calculated based on the given data
     _anxiety_score: float
@@ -120,10 +232,12 @@ class User:
     def __init__(self, identity: List[Union[int, str]]) -> None:
         """Constructor, initialized the data fields.
 
+        Raise ValueError if an identity is not an option of its identity group.
+
         Preconditions:
           - len(identity) == constants.NUMBER_OF_IDENTITIES
         """
-        self.identity = {}
+        self.codes = bytearray(constants.NUMBER_OF_IDENTITIES)
         self.set_age(identity[0])
         for i in range(1, 9):
             self.identity[constants.IDENTITY_NAMES[i]] = identity[i]
@@ -131,6 +245,13 @@ class User:
         self.set_isolation_kids(identity[10])
         self._anxiety_score = 0.0
 
+    @property
+    def identity(self) -> IdentityView:
+        """Return a dictionary-like view of the identities of the user, which updates the user
+        when it is updated.
+        """
+        return IdentityView(self.codes)
+
     def set_age(self, age: int) -> None:
         """Update the age of the user
 
@@ -152,9 +273,9 @@ class User:
         '65+'
         """
         if age < 65:
-            self.identity[constants.IDENTITY_NAMES[0]] = constants.DEM_AGE[(age - 15) // 10]
+            self.codes[0] = (age - 15) // 10
         else:
-            self.identity[constants.IDENTITY_NAMES[0]] = constants.DEM_AGE[-1]
+            self.codes[0] = len(constants.DEM_AGE) - 1
 
     def set_isolation_adults(self, isolation_adults: int) -> None:
         """Update the Dem_isolation_adults of the user.
@@ -171,10 +292,9 @@ class User:
         '21-30'
         """
         if isolation_adults <= 10:
-            self.identity[constants.IDENTITY_NAMES[9]] = str(isolation_adults)
+            self.codes[9] = isolation_adults
         else:
-            self.identity[constants.IDENTITY_NAMES[9]] = constants.DEM_ISOLATION_PEOPLE[
-                (isolation_adults - 11) // 10 + 11]
+            self.codes[9] = (isolation_adults - 11) // 10 + 11
 
     def set_isolation_kids(self, isolation_kids: int) -> None:
         """Update the Dem_isolation_adults of the user.
@@ -191,14 +311,18 @@ class User:
         '21-30'
         """
         if isolation_kids <= 10:
-            self.identity[constants.IDENTITY_NAMES[10]] = str(isolation_kids)
+            self.codes[10] = isolation_kids
         else:
-            self.identity[constants.IDENTITY_NAMES[10]] = constants.DEM_ISOLATION_PEOPLE[
-                (isolation_kids - 11) // 10 + 11]
+            self.codes[10] = (isolation_kids - 11) // 10 + 11
 
-    def estimate_anxiety_score(self, data: List[Dict[str, float]]) -> None:
+    def estimate_anxiety_score(self, data: List[Dict[str, float]],
+                               cube: Union[IdentityCube, None] = None) -> None:
         """Calculates the anxiety score of the user from the given data.
 
+        If an identity cube is given, the score is estimated from the average scores of the people
+        sharing each pair of the user's identities instead, falling back to the given data for the
+        pairs with too few people, see IdentityCube.estimate_anxiety_score.
+
         >>> user = User([18, 'Other/would rather not say', 'None', 'Not employed', 'Canada', 'No', \
                         'Single', 'No', 'Life carries on as usual', 10, 10])
         >>> sample_data = [{'18-24': 15}, {'Other/would rather not say': 10}, {'None': 15}, \
@@ -208,51 +332,223 @@ class User:
         >>> user.get_anxiety_score() == 15
         True
         """
+        contributions = self.get_contributions(data, cube)
+
         # ACCUMULATOR: anxiety score
         anxiety = 0
 
-        for i in range(constants.NUMBER_OF_IDENTITIES):
-            anxiety = anxiety + data[i][self.identity[constants.IDENTITY_NAMES[i]]]
+        for contribution in contributions:
+            anxiety = anxiety + contribution
+
+        self._anxiety_score = anxiety / len(contributions)
+
+    def get_contributions(self, data: List[Dict[str, float]],
+                          cube: Union[IdentityCube, None] = None) -> List[float]:
+        """Return the contribution of every identity group to the anxiety score of the user, or of
+        every pair of identity groups if an identity cube is given. The anxiety score is the
+        average of the contributions.
+
+        The contributions are not kept by the user. A caller re-scoring the same user many times
+        keeps them and passes them to update_anxiety_score.
+
+        >>> data = [{option: float(i) for option in options} \
+                    for i, options in enumerate(constants.IDENTITY_GROUP_OPTIONS_LIST)]
+        >>> user = User([18, 'Male', 'None', 'Student', 'Canada', 'No', 'Single', 'No', \
+                         'Isolated', 3, 30])
+        >>> user.get_contributions(data)
+        [0.0, 1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0, 9.0, 10.0]
+        """
+        if cube is not None:
+            return cube.pair_estimates(self.codes, data)
+        return [data[i][constants.IDENTITY_GROUP_OPTIONS_LIST[i][self.codes[i]]]
+                for i in range(constants.NUMBER_OF_IDENTITIES)]
+
+    def update_anxiety_score(self, id_index: int, contributions: List[float],
+                             data: List[Dict[str, float]],
+                             cube: Union[IdentityCube, None] = None) -> None:
+        """Update the anxiety score of the user after only the identity in the identity group at
+        id_index changed since the contributions were taken, by replacing the contribution of that
+        identity group instead of adding up every contribution again. With a cube, only the pairs
+        with that identity group are looked up again. The contributions are updated in place.
+
+        The score can differ from the one estimate_anxiety_score calculates by rounding errors.
+
+        Preconditions:
+          - 0 <= id_index < constants.NUMBER_OF_IDENTITIES
+          - contributions are the ones get_contributions returned with the same data and cube, for
+            the identities of the user before the change
+          - the anxiety score of the user was estimated from the same contributions
+
+        >>> data = [{option: float(i) for option in options} \
+                    for i, options in enumerate(constants.IDENTITY_GROUP_OPTIONS_LIST)]
+        >>> data[0]['35-44'] = 11.0
+        >>> user = User([18, 'Male', 'None', 'Student', 'Canada', 'No', 'Single', 'No', \
+                         'Isolated', 3, 30])
+        >>> user.estimate_anxiety_score(data)
+        >>> contributions = user.get_contributions(data)
+        >>> user.set_age(40)
+        >>> user.update_anxiety_score(0, contributions, data)
+        >>> user.get_anxiety_score(), contributions[0]
+        (6.0, 11.0)
+        """
+        if cube is not None:
+            change = cube.update_pair_estimates(contributions, self.codes, id_index, data)
+        else:
+            contribution = data[id_index][
+                constants.IDENTITY_GROUP_OPTIONS_LIST[id_index][self.codes[id_index]]]
+            change = contribution - contributions[id_index]
+            contributions[id_index] = contribution
 
-        self._anxiety_score = anxiety / 11
+        self._anxiety_score = self._anxiety_score + change / len(contributions)
 
     def get_anxiety_score(self) -> float:
         """Returns the anxiety score of the user"""
         return self._anxiety_score
 
 
-def get_user_percentage(user: User, id_group: str, data: List[Dict[str, float]]) -> float:
+class ScoreModel:
+    """The processed data, with the lowest and highest average anxiety score of every identity
+    group and their totals precomputed, so the percentages of a score take constant time.
+
+    A model is built once from the loaded data and shared by everything scoring with that data.
+
+    Instance Attributes:
+      - data: the average anxiety score of every identity, for every identity group
+      - minimums: the lowest average anxiety score of every identity group
+      - maximums: the highest average anxiety score of every identity group
+      - minimum_total: the total of minimums
+      - maximum_total: the total of maximums
+      - extrema: the minimum and maximum anxiety score for all combinations of identities, see
+                 data.calculate_extrema
+
+    Representation Invariants:
+      - len(self.data) == len(self.minimums) == len(self.maximums)
+      - self.extrema[0] <= self.extrema[1]
+
+    >>> model = ScoreModel([{'18-24': 1.0, '25-34': 3.0}, {'Male': -2.0, 'Female': 6.0}])
+    >>> model.minimums, model.maximums, model.extrema
+    ([1.0, -2.0], [3.0, 6.0], (-0.5, 4.5))
+    """
+    data: List[Dict[str, float]]
+    minimums: List[float]
+    maximums: List[float]
+    minimum_total: float
+    maximum_total: float
+    extrema: Tuple[float, float]
+
+    def __init__(self, data: List[Dict[str, float]]) -> None:
+        """Initialize the model of the given data
+
+        Preconditions:
+          - all(len(identity_group) > 0 for identity_group in data)
+        """
+        self.data = data
+        self.minimums = [min(identity_group.values()) for identity_group in data]
+        self.maximums = [max(identity_group.values()) for identity_group in data]
+        self.minimum_total = sum(self.minimums)
+        self.maximum_total = sum(self.maximums)
+        self.extrema = calculate_extrema(data)
+
+    def percentage(self, score: float) -> float:
+        """Return the position of the anxiety score between the extrema, as a percentage
+
+        >>> model = ScoreModel([{'18-24': 1.0, '25-34': 3.0}, {'Male': -2.0, 'Female': 6.0}])
+        >>> model.percentage(2.0)
+        50.0
+        """
+        return (score - self.extrema[0]) / (self.extrema[1] - self.extrema[0]) * 100
+
+    def group_percentage(self, score: float, id_group: str, identity: str) -> float:
+        """Return the position of the anxiety score between the lowest and highest anxiety score
+        of the people with the given identity in the identity group, as a percentage.
+
+        Preconditions:
+          - id_group in constants.IDENTITY_NAMES
+          - identity in self.data[constants.IDENTITY_NAMES.index(id_group)]
+
+        >>> data = [{option: 0.0 for option in options} \
+                    for options in constants.IDENTITY_GROUP_OPTIONS_LIST]
+        >>> data[1]['Female'], data[2]['None'] = 11.0, 5.5
+        >>> ScoreModel(data).group_percentage(1.25, 'Gender', 'Female')
+        50.0
+        """
+        id_index = constants.IDENTITY_NAMES.index(id_group)
+        average = self.data[id_index][identity]
+
+        lowest_score = (self.minimum_total - self.minimums[id_index] + average) / 11
+        highest_score = (self.maximum_total - self.maximums[id_index] + average) / 11
+
+        delta_score = highest_score - lowest_score
+        delta_user = score - lowest_score
+
+        return delta_user / delta_score * 100
+
+
+def get_user_percentage(user: User, id_group: str,
+                        data: Union[ScoreModel, List[Dict[str, float]]]) -> float:
     """Returns the user's ranking in the population with the selected identity group.
 
+    data is either the model of the processed data, which should be built once and shared, or the
+    processed data itself, from which a model is built for this call only.
+
+    The percentage is calculated from the totals precomputed by the model, so it can differ from
+    summing up the lowest and highest averages of the identity groups for every call by a rounding
+    error.
+
     Preconditions:
       - id_group in constants.IDENTITY_GROUP_NAMES
-    """
-    id_index = constants.IDENTITY_NAMES.index(id_group)
 
-    lowest_score = 0
-    highest_score = 0
-
-    for i in range(len(data)):
-        if i != id_index:
-            lowest_score = lowest_score + min(data[i].values())
-            highest_score = highest_score + max(data[i].values())
-        else:
-            lowest_score = lowest_score + data[i][user.identity[id_group]]
-            highest_score = highest_score + data[i][user.identity[id_group]]
+    >>> from data import load_json_data
+    >>> sample_data = load_json_data(constants.TEST_DATA_JSON_FILE)
+    >>> user = User([18, 'Female', 'None', 'Student', 'Canada', 'No', 'Single', 'No', \
+                     'Isolated', 3, 30])
+    >>> user.estimate_anxiety_score(sample_data)
+    >>> def summed_percentage(id_group: str) -> float:
+    ...     id_index = constants.IDENTITY_NAMES.index(id_group)
+    ...     lowest_score, highest_score = 0, 0
+    ...     for i in range(len(sample_data)):
+    ...         if i != id_index:
+    ...             lowest_score = lowest_score + min(sample_data[i].values())
+    ...             highest_score = highest_score + max(sample_data[i].values())
+    ...         else:
+    ...             lowest_score = lowest_score + sample_data[i][user.identity[id_group]]
+    ...             highest_score = highest_score + sample_data[i][user.identity[id_group]]
+    ...     lowest_score, highest_score = lowest_score / 11, highest_score / 11
+    ...     return (user.get_anxiety_score() - lowest_score) / (highest_score - lowest_score) * 100
+    >>> model = ScoreModel(sample_data)
+    >>> all(get_user_percentage(user, id_group, sample_data) == \
+            get_user_percentage(user, id_group, model) for id_group in constants.IDENTITY_NAMES)
+    True
+    >>> all(abs(get_user_percentage(user, id_group, model) - summed_percentage(id_group)) < 1e-9 \
+            for id_group in constants.IDENTITY_NAMES)
+    True
+    """
+    model = data if isinstance(data, ScoreModel) else ScoreModel(data)
+    return model.group_percentage(user.get_anxiety_score(), id_group, user.identity[id_group])
 
-    lowest_score, highest_score = lowest_score / 11, highest_score / 11
 
-    delta_score = highest_score - lowest_score
-    delta_user = user.get_anxiety_score() - lowest_score
+def get_user_percentile(user: User, id_group: Union[str, None],
+                        distribution: Union[ScoreDistribution, PopulationDistribution]) -> float:
+    """Returns the percentage of the real respondents whose anxiety score is at most the user's,
+    among the people sharing the user's identity in the selected identity group, or among the whole
+    population if id_group is None. With a PopulationDistribution, it is the percentage of the
+    population convolved from the populations of the identities instead.
 
-    return delta_user / delta_score * 100
+    Preconditions:
+      - id_group is None or id_group in constants.IDENTITY_NAMES
+    """
+    if id_group is None:
+        return distribution.percentile(user.get_anxiety_score())
+    else:
+        return distribution.identity_percentile(user.get_anxiety_score(), id_group,
+                                                user.identity[id_group])
 
 
 if __name__ == '__main__':
     import python_ta
 
     python_ta.check_all(config={
-        'extra-imports': ['python_ta.contracts', 'constants'],
+        'extra-imports': ['python_ta.contracts', 'constants', 'cube', 'data', 'distribution'],
         'allowed-io': [],
         'max-line-length': 100,
         'disable': ['R1705', 'C0200']